@@ -0,0 +1,243 @@
+from collections import deque
+from contextlib import ExitStack
+from queue import Full, Queue
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+
+
+# WMO weather codes of thunderstorms, shown as severe weather alerts
+SEVERE_WMO_CODES = range(95, 100)
+
+
+class Alert:
+    """
+    An urgent notification which interrupts the view on screen.
+
+    Parameters
+        - key (str):
+            identifies the event; alerts with the same key are only shown once
+            within the dedupe window of the channel
+        - lines (tuple): text of each row, cut to the width of the panel
+        - priority (int):
+            higher priority alerts are shown first
+            Default: 0
+        - duration (float):
+            seconds the alert stays on screen unless dismissed with a button
+            Default: 10
+    """
+    def __init__(self, key, lines, priority=0, duration=10):
+        self.key = key
+        self.lines = tuple(lines)
+        self.priority = priority
+        self.duration = duration
+        self.posted = monotonic()
+
+
+class AlertChannel:
+    """
+    A class to hand urgent alerts from their sources to the panels.
+
+    Alerts with a key seen within `dedupe_window` seconds are dropped. A
+    token bucket limits how many alerts are accepted: `burst` at once and
+    one more every `refill` seconds. Together with the pause every
+    `AlertPresenter` keeps between two alerts, a flood of alerts can't keep
+    the views off the screen.
+
+    Parameters
+        - dedupe_window (float):
+            seconds an alert key is remembered
+            Default: 1800
+        - burst (int):
+            alerts accepted back to back
+            Default: 3
+        - refill (float):
+            seconds until one more alert is accepted
+            Default: 120
+    """
+    channel = None
+    channel_lock = Lock()
+
+    def __init__(self, dedupe_window=1800, burst=3, refill=120):
+        self.dedupe_window = dedupe_window
+        self.burst = burst
+        self.refill = refill
+        self.tokens = burst
+        self.last_refill = monotonic()
+        self.seen = {}
+        self.subscribers = []
+        self.lock = Lock()
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.limited = 0
+
+    @classmethod
+    def default(cls):
+        """Return the channel shared by all sources and panels of the process."""
+        with cls.channel_lock:
+            if cls.channel is None:
+                cls.channel = cls()
+            return cls.channel
+
+    def subscribe(self, presenter):
+        """Deliver accepted alerts to a presenter."""
+        with self.lock:
+            self.subscribers.append(presenter)
+
+    def post(self, alert):
+        """
+        Post an alert.
+
+        Returns:
+            - bool: whether the alert was accepted
+        """
+        with self.lock:
+            now = monotonic()
+            self.seen = {key: time for key, time in self.seen.items()
+                         if now - time < self.dedupe_window}
+            if alert.key in self.seen:
+                self.duplicates += 1
+                return False
+
+            refills = int((now - self.last_refill) / self.refill)
+            if refills:
+                self.tokens = min(self.burst, self.tokens + refills)
+                self.last_refill += refills * self.refill
+            if self.tokens == 0:
+                self.limited += 1
+                return False
+
+            self.tokens -= 1
+            self.seen[alert.key] = now
+            self.accepted += 1
+            subscribers = list(self.subscribers)
+
+        for presenter in subscribers:
+            presenter.deliver(alert)
+        return True
+
+
+class AlertPresenter:
+    """
+    A thread showing the alerts of a channel on the panels of a process.
+
+    An alert takes every panel over with `LCD_Interface.preempt`, which
+    waits for the write in progress (a few milliseconds) and then holds
+    back every other writer. Once the alert is gone the frames it covered
+    are written back and the views continue where they stopped, including
+    a scroll in progress. At least `min_gap` seconds of normal rendering
+    pass between two alerts. Dismissing an alert takes it down on all
+    panels.
+
+    Parameters
+        - lcd (LCD_Interface):
+            the panel to show alerts on, more are added with `add_panel`
+            Default: None (no panel yet)
+        - channel (AlertChannel):
+            the channel to take alerts from
+            Default: None (the default channel)
+        - min_gap (float):
+            seconds between the end of an alert and the start of the next
+            Default: 20
+        - max_pending (int):
+            alerts waiting to be shown, later ones are dropped
+            Default: 4
+    """
+    # Latencies kept for reporting, the oldest ones are dropped
+    MAX_LATENCIES = 256
+
+    def __init__(self, lcd=None, channel=None, min_gap=20, max_pending=4):
+        self.panels = [lcd] if lcd is not None else []
+        self.channel = channel if channel is not None else AlertChannel.default()
+        self.min_gap = min_gap
+        self.queue = Queue(maxsize=max_pending)
+        self.dismissed = Event()
+        self.active = None
+        self.last_end = None
+
+        self.dropped = 0
+        # Seconds from posting to showing of the latest alerts
+        self.latencies = deque(maxlen=self.MAX_LATENCIES)
+
+        self.channel.subscribe(self)
+        self.thread = Thread(target=self.run, name="alerts", daemon=True)
+        self.thread.start()
+
+    def add_panel(self, lcd):
+        """Show the following alerts on one more panel."""
+        self.panels.append(lcd)
+
+    def deliver(self, alert):
+        """Queue an alert accepted by the channel."""
+        try:
+            self.queue.put_nowait(alert)
+        except Full:
+            self.dropped += 1
+
+    def dismiss(self):
+        """Take the alert on screen down early (e.g. on a button press)."""
+        self.dismissed.set()
+
+    def next_alert(self):
+        """Wait for the next alert, highest priority first."""
+        pending = [self.queue.get()]
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        pending.sort(key=lambda alert: -alert.priority)
+        for alert in pending[1:]:
+            self.deliver(alert)
+        return pending[0]
+
+    def run(self):
+        while True:
+            alert = self.next_alert()
+            if self.last_end is not None:
+                wait = self.min_gap - (monotonic() - self.last_end)
+                if wait > 0:
+                    sleep(wait)
+            self.show(alert)
+
+    def show(self, alert):
+        """Show an alert on every panel until it times out or is dismissed."""
+        self.dismissed.clear()
+        with ExitStack() as stack:
+            for lcd in list(self.panels):
+                stack.enter_context(lcd.preempt())
+                try:
+                    lcd.clear()
+                    for row, line in enumerate(alert.lines[:lcd.lcd.rows]):
+                        lcd.write_centered(row, line[:lcd.lcd.cols])
+                except OSError as e:
+                    # A faulty panel recovers on its own, the others show the alert
+                    print(f"Could not show alert on {lcd.display.name}: {e}")
+            self.active = alert
+            self.latencies.append(monotonic() - alert.posted)
+            self.dismissed.wait(alert.duration)
+            self.active = None
+        self.last_end = monotonic()
+
+
+def weather_alert(data, conditions):
+    """
+    Return a severe weather alert for Open Meteo data, if there is one.
+
+    Thunderstorms (WMO codes 95-99) now or later today raise an alert. The
+    key holds the code and the day, so the same storm isn't reported twice.
+
+    Parameters
+        - data (dict): the contents of weather_data.json
+        - conditions (dict): the contents of wmo_code.json
+
+    Returns:
+        - Alert: the alert, or None if the weather isn't severe
+    """
+    current = data.get("current", {})
+    daily = data.get("daily", {})
+    day = current.get("time", "")[:10]
+    for when, code in (("now", current.get("weathercode")),
+                       ("today", (daily.get("weathercode") or [None])[0])):
+        if code in SEVERE_WMO_CODES:
+            condition = conditions.get(str(code), "thunderstorm")
+            return Alert(f"wmo-{code}-{day}", ("Weather alert", f"{condition} {when}"),
+                         priority=1)
+    return None
@@ -0,0 +1,238 @@
+from threading import Lock
+from time import monotonic, sleep
+
+
+class Widget:
+    """
+    A widget owning a rectangular region of the LCD display.
+
+    The widget is redrawn every `interval` seconds by calling `source`, which
+    returns the text to show. Text is cut or padded to the width of the
+    region; a newline moves on to the next row of the region.
+
+    Parameters
+        - row (int): first row of the region
+        - col (int): first column of the region
+        - width (int): width of the region in cells
+        - source (callable): returns the text to show
+        - interval (float):
+            seconds between updates
+            Default: 1
+        - height (int):
+            height of the region in rows
+            Default: 1
+    """
+    def __init__(self, row, col, width, source, interval=1, height=1):
+        if width < 1 or height < 1:
+            raise ValueError('The ``width`` and ``height`` arguments must be at least 1')
+        self.row = row
+        self.col = col
+        self.width = width
+        self.height = height
+        self.source = source
+        self.interval = interval
+        self.next_update = 0
+
+    def cells(self):
+        """Return every (row, col) cell of the region."""
+        return {(row, col)
+                for row in range(self.row, self.row + self.height)
+                for col in range(self.col, self.col + self.width)}
+
+    def render(self, encode):
+        """
+        Return the encoded text of the widget, one entry per row of its region.
+
+        Parameters
+            - encode (callable): encodes a string for the LCD display
+
+        Returns:
+            - list: `height` byte strings, each `width` cells long
+        """
+        lines = str(self.source()).split("\n")[:self.height]
+        lines += [""] * (self.height - len(lines))
+        return [encode(line[:self.width].ljust(self.width)) for line in lines]
+
+
+class ScrollWidget(Widget):
+    """
+    A one row widget scrolling text through its region.
+
+    Each update moves the text one cell to the left. Text which fits in the
+    region is shown without scrolling.
+
+    Parameters
+        - row (int): row of the region
+        - col (int): first column of the region
+        - width (int): width of the region in cells
+        - source (callable): returns the text to scroll
+        - interval (float):
+            seconds between scroll steps
+            Default: 0.3
+    """
+    def __init__(self, row, col, width, source, interval=0.3):
+        super().__init__(row, col, width, source, interval)
+        self.text = None
+        self.encoded = b''
+        self.step = 0
+
+    def render(self, encode):
+        text = str(self.source())
+        if text != self.text:
+            # New text starts scrolling in from the right edge. It is encoded
+            # once and every step shows a slice of it.
+            self.text = text
+            self.step = 0
+            if len(text) <= self.width:
+                self.encoded = encode(text.ljust(self.width))
+            else:
+                self.encoded = encode(' ' * self.width + text + ' ' * self.width)
+
+        if len(self.encoded) <= self.width:
+            return [self.encoded]
+
+        window = self.encoded[self.step:self.step + self.width]
+        self.step = (self.step + 1) % (len(self.encoded) - self.width + 1)
+        return [window]
+
+
+class Compositor:
+    """
+    A class to share the LCD display between several widgets.
+
+    Widgets draw into a back buffer at their own interval. On every tick the
+    back buffer is compared with what is on the panel and the changed cells
+    are written in one pass. Changed cells on a row are grouped into runs so
+    a cursor move is only sent where it saves bus traffic.
+
+    The number of bytes sent to the LCD per tick (one per character, one per
+    cursor move) is capped by `budget`. Cells which don't fit stay dirty and
+    are sent on the following ticks, starting with the row that was cut off,
+    so no region is starved.
+
+    Parameters
+        - lcd (LCD_Interface):
+            the LCD display to draw on
+        - widgets (list):
+            the widgets; their regions must not overlap
+        - budget (int):
+            maximum bytes sent to the LCD per tick, at least 2 (a cursor
+            move and one character)
+            Default: 64
+    """
+    def __init__(self, lcd, widgets, budget=64):
+        if budget < 2:
+            raise ValueError('The ``budget`` argument must be at least 2')
+        self.lcd = lcd
+        self.budget = budget
+        self.rows = lcd.lcd.rows
+        self.cols = lcd.lcd.cols
+        self.widgets = []
+        self.owned = set()
+        self.back = [[0x20] * self.cols for _ in range(self.rows)]
+        self.first_row = 0
+        self.flush_lock = Lock()
+        for widget in widgets:
+            self.add(widget)
+
+    def add(self, widget):
+        """
+        Add a widget to the compositor.
+
+        Raises
+            - ValueError: if the region is off screen or overlaps another widget
+        """
+        cells = widget.cells()
+        if any(not (0 <= row < self.rows and 0 <= col < self.cols) for row, col in cells):
+            raise ValueError('The widget region must be inside of the display')
+        if cells & self.owned:
+            raise ValueError('The widget region overlaps with another widget')
+        self.owned |= cells
+        self.widgets.append(widget)
+
+    def update_widgets(self, now):
+        """Render the widgets which are due into the back buffer."""
+        for widget in self.widgets:
+            if now < widget.next_update:
+                continue
+            widget.next_update = now + widget.interval
+            for i, codes in enumerate(widget.render(self.lcd.encoding_cache.encode)):
+                codes = codes[:widget.width]
+                self.back[widget.row + i][widget.col:widget.col + len(codes)] = codes
+
+    def dirty_runs(self):
+        """
+        Find the cells which differ between the back buffer and the panel.
+
+        Returns:
+            - list: (row, col, codes) runs to write, starting at `first_row`
+        """
+        front = self.lcd.frame
+        runs = []
+        for i in range(self.rows):
+            row = (self.first_row + i) % self.rows
+            run = None
+            for col in range(self.cols):
+                if self.back[row][col] == front[row][col]:
+                    continue
+                # A cursor move costs one byte, so a single clean cell in
+                # between two dirty ones is cheaper to rewrite than to skip
+                if run is not None and col - (run[1] + len(run[2])) <= 1:
+                    run[2].extend(self.back[row][run[1] + len(run[2]):col + 1])
+                else:
+                    run = (row, col, [self.back[row][col]])
+                    runs.append(run)
+        return runs
+
+    def flush(self):
+        """
+        Write the dirty cells to the LCD display within the byte budget.
+
+        Returns:
+            - int: the number of bytes sent
+        """
+        with self.flush_lock, self.lcd.batch():
+            sent = 0
+            for row, col, codes in self.dirty_runs():
+                cost = 1 + len(codes)
+                if sent + cost > self.budget:
+                    # Continue with this row on the next tick
+                    self.first_row = row
+                    codes = codes[:self.budget - sent - 1]
+                    if not codes:
+                        break
+                    cost = 1 + len(codes)
+                self.lcd.cursor_pos = (row, col)
+                for code in codes:
+                    self.lcd.write(code)
+                sent += cost
+                if sent >= self.budget:
+                    break
+            else:
+                self.first_row = 0
+            return sent
+
+    def tick(self):
+        """Update the widgets which are due and flush the changes."""
+        self.update_widgets(monotonic())
+        return self.flush()
+
+    def next_due(self):
+        """Return the seconds until the next widget update is due."""
+        soonest = min((widget.next_update for widget in self.widgets), default=monotonic() + 1)
+        return max(0, soonest - monotonic())
+
+    def run(self, ticks=None):
+        """
+        Run the compositor, sleeping until the next widget is due.
+
+        Parameters
+            - ticks (int):
+                number of ticks to run
+                Default: None (run forever)
+        """
+        while ticks is None or ticks > 0:
+            self.tick()
+            sleep(self.next_due())
+            if ticks is not None:
+                ticks -= 1
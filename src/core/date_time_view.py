@@ -2,15 +2,66 @@ from datetime import datetime
 from src.core.lcd_interface import LCD_Interface
 
 
+def segment_glyph(top, bottom, left, right):
+    """
+    Build a custom character holding parts of a big digit.
+
+    Bars are one pixel high (rows 0 and 6), strokes two pixels wide.
+    """
+    rows = []
+    for row in range(8):
+        bits = 0
+        if (top and row == 0) or (bottom and row == 6):
+            bits = 0b11111
+        if row <= 6:
+            bits |= (0b11000 if left else 0) | (0b00011 if right else 0)
+        rows.append(bits)
+    return tuple(rows)
+
+
+# The 8 custom characters big digits are made of (top, bottom, left, right)
+BIG_GLYPHS = (
+    segment_glyph(1, 0, 1, 0),
+    segment_glyph(1, 1, 0, 0),
+    segment_glyph(0, 1, 1, 0),
+    segment_glyph(1, 1, 1, 0),
+    segment_glyph(1, 0, 0, 1),
+    segment_glyph(0, 0, 0, 1),
+    segment_glyph(1, 1, 0, 1),
+    segment_glyph(0, 1, 0, 1),
+)
+BLANK = 0x20
+# The ROM underscore is the one part which doesn't need a custom character
+BAR = 0x5F
+
+# Cells of each digit: top left, top right, bottom left, bottom right
+BIG_DIGITS = {
+    "0": (0, 4, 2, 7),
+    "1": (BLANK, 5, BLANK, 5),
+    "2": (1, 6, 2, BAR),
+    "3": (1, 6, BAR, 7),
+    "4": (2, 7, BLANK, 5),
+    "5": (3, 1, BAR, 7),
+    "6": (3, 1, 2, 7),
+    "7": (1, 6, BLANK, 5),
+    "8": (3, 6, 2, 7),
+    "9": (3, 6, BAR, 7),
+}
+
+
 class DateTime(LCD_Interface):
     """
     A class to display the current date and time view.
 
     LCD Line 1: Date (MMM. DD, YYYY)
-    LCD Line 2: Time (HH:MM:SS) updated every second.
+    LCD Line 2: Time (HH:MM:SS AM/PM) updated every second.
+
+    The alt screen shows the time in big digits two rows high
+    (`big_clock_display`). The view's spec ticks on second boundaries, so
+    every second is shown no matter how long a redraw takes.
     """
-    def __init__(self, verbosity):
-        super().__init__(verbosity)
+    def __init__(self, verbosity, display=None):
+        super().__init__(verbosity, display)
 
     def get_date_time(self):
         """
@@ -22,7 +73,7 @@ class DateTime(LCD_Interface):
         """
         current_datetime = datetime.now()
         date = current_datetime.strftime('%b %d, %Y')
-        time = current_datetime.strftime('%I:%M %p')
+        time = current_datetime.strftime('%I:%M:%S %p')
         return date, time
     
     def date_time_display(self):
@@ -31,10 +82,56 @@ class DateTime(LCD_Interface):
         self.write_centered(0, self.date)
         self.write_centered(1, self.time)
 
+    def big_clock_cells(self, now):
+        """
+        Lay out HH:MM:SS in big digits on the first two rows.
+
+        Each digit is 2x2 cells, a colon takes one column and AM/PM is
+        stacked in the last column: 16 columns in total.
+
+        Returns:
+            - list: (col, top codes, bottom codes) of every group of cells
+        """
+        cells = []
+        col = (self.lcd.cols - 16) // 2
+        for i, digit in enumerate(now.strftime('%I%M%S')):
+            top_left, top_right, bottom_left, bottom_right = BIG_DIGITS[digit]
+            cells.append((col, bytes((top_left, top_right)), bytes((bottom_left, bottom_right))))
+            col += 2
+            if i in (1, 3):
+                cells.append((col, b'.', b"'"))
+                col += 1
+        am_pm = now.strftime('%p').encode()
+        cells.append((col + 1, am_pm[:1], am_pm[1:]))
+        return cells
+
+    def big_clock_display(self):
+        """
+        Display the time in big digits.
+
+        Only the digits which changed since the last tick are written, so a
+        tick usually costs the two to four cells of the seconds. Panels
+        narrower than 16 columns or with a single row get the normal time.
+        """
+        if self.lcd.cols < 16 or self.lcd.rows < 2:
+            self.write_centered(0, self.get_date_time()[1][:self.lcd.cols])
+            return
+
+        self.ensure_chars(dict(enumerate(BIG_GLYPHS)))
+        frame = self.frame
+        with self.batch():
+            for col, top, bottom in self.big_clock_cells(datetime.now()):
+                for row, codes in ((0, top), (1, bottom)):
+                    if bytes(frame[row][col:col + len(codes)]) != codes:
+                        self.cursor_pos = (row, col)
+                        self.write_encoded(codes)
+            if self.lcd.rows == 4:
+                self.write_centered(3, self.get_date_time()[0])
+
         
 def main():
     date_time_view = DateTime(1)
     date_time_view.date_time_display()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,356 @@
+import argparse
+import csv
+from datetime import date, datetime, timedelta, timezone
+import json
+import os
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+class DinnerImportError(ValueError):
+    """Raised when a row of a meal calendar can not be turned into a plan."""
+
+
+class DinnerImporter:
+    """
+    A class to bulk import dinner plans from CSV or iCalendar (.ics) files.
+
+    Rows are read one at a time from the source file, validated and
+    normalized into the nested layout read by `Dinner.get_main_course` and
+    `Dinner.get_sides`:
+
+        "M/D" (monday of the week) -> weekday -> {"main", "side 1-3",
+                                                 "prep time", "cook time"}
+
+    Week keys don't include a year, so only rows falling inside a window of
+    `weeks` weeks (starting on the monday of `start`) can be stored without
+    colliding. Rows outside of that window are counted and skipped, invalid
+    rows are counted and only the first `MAX_ERRORS` of them are kept. Because
+    the window is bounded, memory use stays constant no matter how large the
+    source calendar is. The plan is written in one go at the end of the import
+    by replacing dinner_data.json atomically.
+
+    CSV files need a header row. Recognized columns (case insensitive):
+        - date: YYYY-MM-DD or MM/DD/YYYY (required)
+        - main: the main course (required)
+        - side 1, side 2, side 3: individual sides
+        - sides: sides separated by ";" (alternative to side 1-3)
+        - prep, cook: prep and cook time in minutes
+
+    iCalendar files are read event by event. DTSTART gives the date (times
+    in UTC or with a TZID are converted to local time first), SUMMARY the
+    main course. DESCRIPTION may hold "Sides: a, b", "Prep: 15" and
+    "Cook: 30" entries, one per line.
+
+    Parameters
+        - start (date):
+            first day of the import window.
+            Default: None (monday of the current week)
+        - weeks (int):
+            length of the import window in weeks (1-52).
+            Default: 52
+        - verbosity (int):
+            Changes how much information is displayed. Can be 0 or 1 or 2.
+            Default: 1
+    """
+    WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday",
+                "saturday", "sunday")
+    MAX_SIDES = 3
+    # Invalid rows whose line number and message are kept, the rest are only counted
+    MAX_ERRORS = 20
+
+    def __init__(self, start=None, weeks=52, verbosity=1):
+        if not 1 <= weeks <= 52:
+            raise ValueError('The ``weeks`` argument must be between 1 and 52')
+
+        if start is None:
+            start = datetime.now().date()
+        # Window always starts on a monday so whole weeks are imported
+        self.start = start - timedelta(days=start.weekday())
+        self.end = self.start + timedelta(weeks=weeks)
+        self.verbosity = verbosity
+
+        # Define the data directory's path relative to the current file
+        self.data_directory = Path(__file__).parent.parent / "data"
+
+        self.imported = 0
+        self.skipped = 0
+        self.invalid = 0
+        # (line number, message) of the first MAX_ERRORS invalid rows
+        self.errors = []
+
+    def week_key(self, day):
+        """
+        Gets the key the dinner plan is stored under for a given day.
+
+        Parameters
+            - day (date): the day of the meal
+
+        Returns:
+            - str: the date of that week's monday in M/D format
+            - str: the weekday (all lowercase)
+        """
+        monday = day - timedelta(days=day.weekday())
+        return f"{monday.month}/{monday.day}", self.WEEKDAYS[day.weekday()]
+
+    def parse_date(self, value):
+        """Parse a YYYY-MM-DD, YYYYMMDD or MM/DD/YYYY date string."""
+        value = value.strip()
+        for fmt in ("%Y-%m-%d", "%Y%m%d", "%m/%d/%Y"):
+            try:
+                return datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+        raise DinnerImportError(f"invalid date '{value}'")
+
+    def parse_dtstart(self, value, tzid=None):
+        """
+        Get the local day of an iCalendar DTSTART value.
+
+        Parameters
+            - value (str):
+                a date (20231016), a floating local time (20231016T180000)
+                or a UTC time (20231016T220000Z)
+            - tzid (str):
+                the TZID parameter of DTSTART, e.g. "America/New_York"
+                Default: None
+
+        Returns:
+            - date: the day the event starts on in local time
+        """
+        value = value.strip()
+        if "T" not in value:
+            return self.parse_date(value)
+
+        utc = value.upper().endswith("Z")
+        try:
+            start = datetime.strptime(value.rstrip("Zz"), "%Y%m%dT%H%M%S")
+        except ValueError:
+            raise DinnerImportError(f"invalid date '{value}'")
+        if utc:
+            start = start.replace(tzinfo=timezone.utc)
+        elif tzid:
+            try:
+                start = start.replace(tzinfo=ZoneInfo(tzid.strip('"')))
+            except (ZoneInfoNotFoundError, ValueError):
+                raise DinnerImportError(f"unknown time zone '{tzid}'")
+        else:
+            # Floating times are local already
+            return start.date()
+        return start.astimezone().date()
+
+    def parse_minutes(self, value, field):
+        """Parse a prep or cook time given in whole minutes."""
+        if value is None or value.strip() in ("", "None"):
+            return "None"
+        try:
+            minutes = int(value.strip())
+        except ValueError:
+            raise DinnerImportError(f"invalid {field} time '{value}'")
+        if minutes < 0:
+            raise DinnerImportError(f"{field} time can't be negative")
+        return minutes
+
+    def normalize(self, day, main, sides, prep=None, cook=None):
+        """
+        Validate a single meal and convert it to the dinner plan layout.
+
+        Returns:
+            - date: the day of the meal
+            - dict: the meal in the layout stored in dinner_data.json
+
+        Raises
+            - DinnerImportError: if the meal can not be stored
+        """
+        main = (main or "").strip()
+        if not main:
+            raise DinnerImportError("missing main course")
+
+        sides = [side.strip() for side in sides if side and side.strip() not in ("", "None")]
+        if len(sides) > self.MAX_SIDES:
+            raise DinnerImportError(
+                f"at most {self.MAX_SIDES} sides are supported, got {len(sides)}")
+
+        meal = {"main": main}
+        for i in range(self.MAX_SIDES):
+            meal[f"side {i+1}"] = sides[i] if i < len(sides) else "None"
+        meal["prep time"] = self.parse_minutes(prep, "prep")
+        meal["cook time"] = self.parse_minutes(cook, "cook")
+        return day, meal
+
+    def read_csv(self, file):
+        """Yield (line number, day, meal) for each row of a CSV file."""
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None:
+            return
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        if "date" not in reader.fieldnames or "main" not in reader.fieldnames:
+            raise DinnerImportError("CSV header must contain 'date' and 'main' columns")
+
+        for row in reader:
+            try:
+                if row.get("sides"):
+                    sides = row["sides"].split(";")
+                else:
+                    sides = [row.get(f"side {i+1}") for i in range(self.MAX_SIDES)]
+                yield (reader.line_num,) + self.normalize(
+                    self.parse_date(row["date"] or ""), row["main"], sides,
+                    row.get("prep"), row.get("cook"))
+            except DinnerImportError as e:
+                yield reader.line_num, e, None
+
+    def read_ics(self, file):
+        """Yield (line number, day, meal) for each VEVENT of an iCalendar file."""
+        def unfold(file):
+            # Long content lines are folded onto continuation lines which
+            # start with a space or tab (RFC 5545 section 3.1)
+            pending, pending_num = None, 0
+            for line_num, line in enumerate(file, 1):
+                line = line.rstrip("\r\n")
+                if line[:1] in (" ", "\t") and pending is not None:
+                    pending += line[1:]
+                    continue
+                if pending is not None:
+                    yield pending_num, pending
+                pending, pending_num = line, line_num
+            if pending is not None:
+                yield pending_num, pending
+
+        def unescape(value):
+            return (value.replace("\\n", "\n").replace("\\N", "\n")
+                    .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\"))
+
+        event = None
+        for line_num, line in unfold(file):
+            name, _, value = line.partition(":")
+            name, *params = name.split(";")
+            name = name.upper()
+
+            if name == "BEGIN" and value.upper() == "VEVENT":
+                event = {"line": line_num}
+            elif name == "END" and value.upper() == "VEVENT" and event is not None:
+                try:
+                    if "RRULE" in event:
+                        raise DinnerImportError("recurring events are not supported")
+                    if "DTSTART" not in event:
+                        raise DinnerImportError("event has no DTSTART")
+
+                    details = {}
+                    for entry in unescape(event.get("DESCRIPTION", "")).splitlines():
+                        key, sep, val = entry.partition(":")
+                        if sep:
+                            details[key.strip().lower()] = val.strip()
+
+                    sides = details.get("sides", "").split(",")
+                    day = self.parse_dtstart(event["DTSTART"], event.get("TZID"))
+                    yield (event["line"],) + self.normalize(
+                        day, unescape(event.get("SUMMARY", "")), sides,
+                        details.get("prep"), details.get("cook"))
+                except DinnerImportError as e:
+                    yield event["line"], e, None
+                event = None
+            elif event is not None and name in ("DTSTART", "SUMMARY", "DESCRIPTION", "RRULE"):
+                event[name] = value
+                if name == "DTSTART":
+                    for param in params:
+                        key, _, param_value = param.partition("=")
+                        if key.upper() == "TZID":
+                            event["TZID"] = param_value
+
+    def import_file(self, source, filename='dinner_data.json', replace=False, dry_run=False):
+        """
+        Import a CSV or .ics meal calendar into the dinner plan.
+
+        Parameters
+            - source (str or Path):
+                the CSV or .ics file to import
+            - filename (str):
+                the dinner plan file in the data directory
+                Default: 'dinner_data.json'
+            - replace (bool):
+                start from an empty plan instead of merging into the existing one
+                Default: False
+            - dry_run (bool):
+                validate the source without writing the plan
+                Default: False
+
+        Returns:
+            - dict: the resulting dinner plan
+
+        Raises
+            - ValueError: if the source file type is not supported
+        """
+        source = Path(source)
+        suffix = source.suffix.lower()
+        if suffix == ".csv":
+            reader = self.read_csv
+        elif suffix in (".ics", ".ical"):
+            reader = self.read_ics
+        else:
+            raise ValueError(f"Unsupported file type '{source.suffix}', expected .csv or .ics")
+
+        file_path = self.data_directory / filename
+        plan = {}
+        if not replace and file_path.exists():
+            with file_path.open('r') as f:
+                plan = json.load(f)
+
+        with source.open('r', newline='', encoding='utf-8') as f:
+            for line_num, day, meal in reader(f):
+                if isinstance(day, DinnerImportError):
+                    self.invalid += 1
+                    if len(self.errors) < self.MAX_ERRORS:
+                        self.errors.append((line_num, str(day)))
+                    if self.verbosity >= 1:
+                        print(f"{source.name}:{line_num}: {day}")
+                    continue
+
+                if not self.start <= day < self.end:
+                    self.skipped += 1
+                    continue
+
+                week, weekday = self.week_key(day)
+                plan.setdefault(week, {})[weekday] = meal
+                self.imported += 1
+
+        if not dry_run:
+            self.write_plan(plan, file_path)
+
+        if self.verbosity >= 1:
+            print(f"imported: {self.imported}, skipped (outside "
+                  f"{self.start} - {self.end - timedelta(days=1)}): {self.skipped}, "
+                  f"invalid: {self.invalid}")
+        return plan
+
+    def write_plan(self, plan, file_path):
+        """
+        Write the dinner plan in one go.
+
+        The plan is written to a temporary file first which then replaces the
+        original, so the dashboard never reads a half written file.
+        """
+        tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
+        with tmp_path.open('w') as f:
+            json.dump(plan, f, indent=4)
+        os.replace(tmp_path, file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import a CSV or iCalendar meal calendar into dinner_data.json")
+    parser.add_argument("source", help="the .csv or .ics file to import")
+    parser.add_argument("--start", type=date.fromisoformat, default=None,
+                        help="first day to import (YYYY-MM-DD), default: this week's monday")
+    parser.add_argument("--weeks", type=int, default=52,
+                        help="number of weeks to import (1-52), default: 52")
+    parser.add_argument("--replace", action="store_true",
+                        help="replace the existing plan instead of merging into it")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only validate the source file")
+    args = parser.parse_args()
+
+    importer = DinnerImporter(args.start, args.weeks)
+    importer.import_file(args.source, replace=args.replace, dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    main()
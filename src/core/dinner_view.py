@@ -6,8 +6,8 @@ class Dinner(LCD_Interface):
     """
     A class to display planned dinners.
     """
-    def __init__(self, verbosity):
-        super().__init__(verbosity)
+    def __init__(self, verbosity, display=None):
+        super().__init__(verbosity, display)
 
     def get_main_course(self, json_data, date, day_of_week):
         """
@@ -88,18 +88,40 @@ class Dinner(LCD_Interface):
         except KeyError:
             # Handle cases where the date or day_of_week is not found
             return "Data not found for the given date and day of the week."
-        
+
+    def get_prep_cook_times(self, json_data, date, day_of_week):
+        """
+        Fetches the prep and cook time (in minutes) of a planned dinner.
+
+        Prep and cook times are only stored for plans imported with
+        `DinnerImporter`. Hand written plans without them return None.
+
+        Parameters:
+        - json_data (dict): The JSON data containing the menu in nested dictionaries.
+        - date (str): The date (formatted as MM/DD) for which the times are to be fetched.
+        - day_of_week (str): The day of the week (all lowercase) for which the times are to be fetched.
+
+        Returns:
+        tuple: (prep time, cook time) as ints, either may be None if not planned.
+        """
+        day_data = json_data.get(date, {}).get(day_of_week, {})
+        times = []
+        for key in ("prep time", "cook time"):
+            value = day_data.get(key, "None")
+            times.append(None if value == "None" else value)
+        return tuple(times)
+
     def main_course_display(self, main_course):
         """
         Displays the main course to the first line of the LCD display.
 
-        If the main course is less than or equal to 16 characters, it will
-        use the `write_centered` function to write the main course to the LCD
-        display and center the string. If the main course is longer than 16
-        characters, it uses the `scroll_text` function to display the information.
+        If the main course fits on the display (16 characters on a 16x2), it
+        will use the `write_centered` function to write the main course to the LCD
+        display and center the string. If the main course is longer than that,
+        it uses the `scroll_text` function to display the information.
         """
         main_str = f"Main: {main_course}"
-        if len(main_str) <= 16:
+        if len(main_str) <= self.lcd.cols:
             self.write_centered(0, main_str)
         else:
             self.scroll_text(main_str, 0, 0.5)
@@ -119,10 +141,10 @@ class Dinner(LCD_Interface):
         "Sides: {side 1} + {side 2} + {side 3}". The " + {side 3}" is only
         included if it exists in the list.
 
-        If the full string is less than or equal to 16 characters, the 
-        `write_centered` function will be used to print the string to the LCD display.
+        If the full string fits on the display, the `write_centered` function
+        will be used to print the string to the LCD display.
 
-        If the full string is longer than 16 characters, the `scroll_text`
+        If the full string is longer than the display is wide, the `scroll_text`
         function will be used to print the string to the LCD display.
 
         Parameters:
@@ -152,7 +174,7 @@ class Dinner(LCD_Interface):
             return "Invalid list of sides"
 
         # Check the length of the final string and display accordingly
-        if len(sides_str) <= 16:
+        if len(sides_str) <= self.lcd.cols:
             self.write_centered(1, sides_str)
         else:
             self.scroll_text(sides_str, 1, 0.5)
@@ -202,6 +224,33 @@ class Dinner(LCD_Interface):
 
         return monday_date_str, current_weekday_str
 
+    def prep_cook_display(self):
+        """
+        Fetches the prep and cook time of the day's dinner and prints them to LCD display.
+
+        Line 1 shows the prep time and line 2 the cook time (both on one line
+        on a single row panel). Plans without times show "No times planned".
+        """
+        dinner_data = self.load_data('dinner_data.json')
+        monday_date, current_weekday = self.get_weekday_and_monday_date()
+        prep, cook = self.get_prep_cook_times(dinner_data, monday_date, current_weekday)
+
+        if prep is None and cook is None:
+            lines = ["No times planned", ""]
+        else:
+            lines = [f"Prep: {'-' if prep is None else prep} min",
+                     f"Cook: {'-' if cook is None else cook} min"]
+        if self.lcd.rows == 1:
+            lines = [" ".join(line for line in lines if line)]
+
+        cols = self.lcd.cols
+        with self.batch():
+            for row, line in enumerate(lines):
+                # Padded to the full width, so the longer text shown before is gone
+                line = line[:cols]
+                start = (cols - len(line)) // 2
+                self.write_centered(row, " " * start + line + " " * (cols - start - len(line)))
+
     def dinner_plan_display(self):
         """
         Fetches the dinner plan of the day and prints it to LCD display.
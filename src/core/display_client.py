@@ -0,0 +1,198 @@
+import argparse
+import socket
+from threading import Event, Lock
+from time import perf_counter
+
+from src.core.display_config import load_displays
+from src.core.frame_protocol import (CGRAM_TARGET, MSG_BUTTON, MSG_ERROR, MSG_FRAME,
+                                     MessageReader, decode_delta, pack, pack_hello,
+                                     parse_address)
+from src.core.lcd_interface import LCD_Interface
+
+
+# GPIO pins of the push buttons, as on a full dashboard (HomeDashboard.INP_PIN_MAP)
+INP_PIN_MAP = {
+    "main_btn" : 37,
+    "secondary_btn" : 36
+}
+
+
+class DisplayClient:
+    """
+    A thin client showing a display rendered by a `RenderServer`.
+
+    The client only drives its LCD and forwards the push buttons: it runs
+    no views, fetches no data and reads no data files. It says hello with
+    the name, size and view of its panel from config.ini and then writes
+    the frames it receives. Every frame holds only the cells and custom
+    characters which changed, and the content cache of `LCD_Interface`
+    skips cells already showing the right character.
+
+    When the connection drops, the last frame stays on the panel while the
+    client reconnects, waiting longer after every failed attempt.
+
+    Parameters
+        - server (str): HOST:PORT of the server, or the path of its Unix socket
+        - display (DisplayConfig):
+            the panel to drive
+            Default: None (the [display] section of config.ini)
+        - verbosity (int):
+            Changes how much information is displayed. Can be 0 or 1 or 2.
+            Default: 1
+        - buttons (bool):
+            whether to forward the push buttons
+            Default: True
+    """
+    # Seconds to wait before each attempt to reconnect
+    RECONNECT_DELAYS = (0.5, 1, 2, 5, 10)
+
+    def __init__(self, server, display=None, verbosity=1, buttons=True):
+        if display is None:
+            display = load_displays()[0]
+        self.family, self.address = parse_address(server)
+        self.display = display
+        self.verbosity = verbosity
+        self.lcd = LCD_Interface(verbosity, display)
+        self.sock = None
+        self.send_lock = Lock()
+        self.stopped = Event()
+
+        self.frames = 0
+        self.bytes_received = 0
+        self.pressed = None
+        # Seconds from a button press to the next frame
+        self.latencies = []
+
+        if buttons:
+            self.setup_gpio()
+
+    def setup_gpio(self):
+        """Forward presses of the push buttons to the server."""
+        import RPi.GPIO as GPIO
+        GPIO.setwarnings(False)
+        GPIO.setmode(GPIO.BOARD)
+        GPIO.setup(list(INP_PIN_MAP.values()), GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        for pin in INP_PIN_MAP.values():
+            GPIO.add_event_detect(pin, GPIO.RISING, callback=self.press, bouncetime=1000)
+
+    def press(self, channel):
+        """Send a button press (GPIO pin number) to the server."""
+        self.pressed = perf_counter()
+        with self.send_lock:
+            if self.sock is None:
+                return
+            try:
+                self.sock.sendall(pack(MSG_BUTTON, bytes((channel,))))
+            except OSError:
+                # The receiving loop notices and reconnects
+                pass
+
+    def connect(self):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.address)
+            if self.family != socket.AF_UNIX:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(pack_hello(self.display))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def run(self):
+        """Show the display until `stop` is called or the server refuses it."""
+        attempt = 0
+        while not self.stopped.is_set():
+            try:
+                sock = self.connect()
+            except OSError as e:
+                delay = self.RECONNECT_DELAYS[min(attempt, len(self.RECONNECT_DELAYS) - 1)]
+                attempt += 1
+                if self.verbosity >= 1:
+                    print(f"Connecting to the render server failed ({e}), retrying in {delay}s")
+                self.stopped.wait(delay)
+                continue
+
+            attempt = 0
+            with self.send_lock:
+                self.sock = sock
+            try:
+                self.receive(sock)
+            except OSError as e:
+                if self.verbosity >= 1:
+                    print(f"Lost the render server: {e}")
+            except ValueError as e:
+                print(f"Render server refused the display: {e}")
+                self.stopped.set()
+            finally:
+                with self.send_lock:
+                    self.sock = None
+                sock.close()
+
+    def stop(self):
+        """Disconnect and make `run` return."""
+        self.stopped.set()
+        with self.send_lock:
+            if self.sock is not None:
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def receive(self, sock):
+        """
+        Apply the frames sent by the server until it disconnects.
+
+        Raises
+            - ValueError: if the server sent an error or a malformed frame
+        """
+        reader = MessageReader()
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                return
+            self.bytes_received += len(data)
+            for kind, payload in reader.feed(data):
+                if kind == MSG_FRAME:
+                    self.apply(payload)
+                elif kind == MSG_ERROR:
+                    raise ValueError(payload.decode(errors="replace"))
+
+    def apply(self, payload):
+        """
+        Write a frame to the LCD, in one batch.
+
+        Raises
+            - ValueError: if a run is outside of the panel
+        """
+        lcd = self.lcd
+        with lcd.batch():
+            for target, start, data in decode_delta(payload):
+                if target == CGRAM_TARGET:
+                    lcd.upload_chars(start, [tuple(data[i:i + 8]) for i in range(0, len(data), 8)])
+                elif target < lcd.lcd.rows and start + len(data) <= lcd.lcd.cols:
+                    lcd.cursor_pos = (target, start)
+                    lcd.write_encoded(data)
+                else:
+                    raise ValueError(f'Run outside of the panel: row {target}, column {start}')
+        self.frames += 1
+        if self.pressed is not None:
+            self.latencies.append(perf_counter() - self.pressed)
+            self.pressed = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a display rendered by a render server")
+    parser.add_argument("server", help="HOST:PORT of the server, or the path of its Unix socket")
+    parser.add_argument("--no-buttons", action="store_true", help="don't forward the push buttons")
+    args = parser.parse_args()
+
+    client = DisplayClient(args.server, buttons=not args.no_buttons)
+    try:
+        client.run()
+    except KeyboardInterrupt:
+        print("\nExiting...")
+        client.stop()
+
+if __name__ == "__main__":
+    main()
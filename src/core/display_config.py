@@ -0,0 +1,87 @@
+import configparser
+from pathlib import Path
+
+
+class DisplayConfig:
+    """
+    A class holding the geometry and I2C addressing of one LCD panel.
+
+    Parameters
+        - name (str):
+            name of the panel, "main" for the panel with the push buttons
+        - port (int):
+            I2C bus number
+            Default: 1
+        - address (int):
+            I2C address of the backpack
+            Default: 0x27
+        - cols (int):
+            number of columns (e.g. 16, 20 or 40)
+            Default: 16
+        - rows (int):
+            number of rows (1, 2 or 4)
+            Default: 2
+        - view (str):
+            name of the view shown on a panel without buttons
+            Default: None (first view)
+        - simulated (bool):
+            drive a `SimulatedBus` instead of the I2C bus
+            Default: False
+    """
+    def __init__(self, name="main", port=1, address=0x27, cols=16, rows=2, view=None,
+                 simulated=False):
+        if rows not in (1, 2, 4):
+            raise ValueError('The ``rows`` argument must be either ``1`` or ``2`` or ``4``')
+        if not 8 <= cols <= 40 or cols * rows > 80:
+            raise ValueError('The ``cols`` argument must be between 8 and 40 '
+                             '(at most 80 characters per panel)')
+        self.name = name
+        self.port = port
+        self.address = address
+        self.cols = cols
+        self.rows = rows
+        self.view = view
+        self.simulated = simulated
+
+    @classmethod
+    def from_section(cls, name, section):
+        """Create a DisplayConfig from a section of config.ini."""
+        return cls(name=name,
+                   port=section.getint('port', 1),
+                   address=int(section.get('address', '0x27'), 0),
+                   cols=section.getint('cols', 16),
+                   rows=section.getint('rows', 2),
+                   view=section.get('view', None),
+                   simulated=section.getboolean('simulated', False))
+
+
+def load_displays(config_path=None):
+    """
+    Read the panels from config.ini.
+
+    The [display] section describes the main panel (the one with the push
+    buttons). Every [display.NAME] section adds another panel. Missing
+    sections or keys fall back to a 16x2 panel at address 0x27 on bus 1.
+
+    Parameters
+        - config_path (Path):
+            the config file to read
+            Default: None (src/core/config.ini)
+
+    Returns:
+        - list: DisplayConfig for every panel, the main panel first
+    """
+    if config_path is None:
+        config_path = Path(__file__).parent / 'config.ini'
+    config = configparser.ConfigParser()
+    config.read(config_path)
+
+    if config.has_section('display'):
+        displays = [DisplayConfig.from_section("main", config['display'])]
+    else:
+        displays = [DisplayConfig()]
+
+    for section in config.sections():
+        if section.startswith('display.'):
+            displays.append(DisplayConfig.from_section(section[len('display.'):], config[section]))
+    return displays
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class EncodingCache:
+    """
+    A least recently used cache of strings encoded for the LCD display.
+
+    RPLCD translates every character of every string through the character
+    map of the display. Many strings written to the dashboard repeat all the
+    time ("Main: ", month names, weather conditions...), so the encoded bytes
+    are kept for the `size` most recently used strings.
+
+    Strings containing newlines or carriage returns are not cached, since
+    RPLCD encodes them as cursor movements rather than bytes.
+
+    Parameters
+        - codec (RPLCD.codecs.Codec):
+            the character map of the display
+        - size (int):
+            maximum number of strings kept in the cache
+            Default: 256
+    """
+    def __init__(self, codec, size=256):
+        if size < 1:
+            raise ValueError('The ``size`` argument must be at least 1')
+        self.codec = codec
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, text):
+        """
+        Encode a string with the character map of the display.
+
+        Parameters
+            - text (str): the string to encode, without newlines
+
+        Returns:
+            - bytes: one byte per LCD cell
+
+        Raises
+            - ValueError: if the string contains a newline or carriage return
+        """
+        with self.lock:
+            encoded = self.entries.get(text)
+            if encoded is not None:
+                self.entries.move_to_end(text)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+
+        if '\n' in text or '\r' in text:
+            raise ValueError('Strings with newlines can not be pre-encoded')
+        encoded = bytes(self.codec.encode(text))
+
+        with self.lock:
+            self.entries[text] = encoded
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return encoded
+
+    def clear(self):
+        """Empty the cache."""
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,113 @@
+import os
+from pathlib import Path
+from threading import Event, Thread
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+class FileWatcher:
+    """
+    A class to report changed files in a few directories.
+
+    With the inotify_simple module the kernel reports writes as they
+    happen. Without it the directories are polled for changed modification
+    times every `interval` seconds.
+
+    Only files which are complete are reported: a file closed after
+    writing, or moved into place (as `LCD_Interface.save_data` does with
+    os.replace). Temporary and hidden files are ignored. Events arriving
+    within `debounce` seconds of each other are reported together, so an
+    editor saving a file in several steps causes a single callback.
+
+    Parameters
+        - directories (list): the directories to watch (not recursive)
+        - callback (callable):
+            called from the watcher thread with the set of changed file names
+        - interval (float):
+            seconds between two polls when inotify is unavailable
+            Default: 2
+        - debounce (float):
+            seconds to wait for more events before reporting
+            Default: 0.2
+    """
+    def __init__(self, directories, callback, interval=2, debounce=0.2):
+        self.directories = [Path(d) for d in directories]
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self.stopped = Event()
+        self.thread = None
+
+    @staticmethod
+    def ignored(name):
+        return name.startswith('.') or name.endswith(('.tmp', '~', '.swp'))
+
+    def start(self):
+        """Start watching in a daemon thread."""
+        target = self.run_inotify if INotify is not None else self.run_polling
+        self.thread = Thread(target=target, name="file-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop watching. The thread exits within a second."""
+        self.stopped.set()
+
+    def report(self, names):
+        names = {name for name in names if not self.ignored(name)}
+        if names:
+            try:
+                self.callback(names)
+            except Exception as e:
+                print(f"Error applying changes to {', '.join(sorted(names))}: {e}")
+
+    def run_inotify(self):
+        inotify = INotify()
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO
+        for directory in self.directories:
+            inotify.add_watch(str(directory), mask)
+
+        while not self.stopped.is_set():
+            events = inotify.read(timeout=1000)
+            if not events:
+                continue
+            names = {event.name for event in events}
+            # Collect the events belonging to the same save
+            while True:
+                more = inotify.read(timeout=int(self.debounce * 1000))
+                if not more:
+                    break
+                names.update(event.name for event in more)
+            self.report(names)
+        inotify.close()
+
+    def snapshot(self):
+        """Return (mtime, size) of every file in the watched directories."""
+        files = {}
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    pass
+        return files
+
+    def run_polling(self):
+        last = self.snapshot()
+        while not self.stopped.wait(self.interval):
+            current = self.snapshot()
+            if current != last:
+                # Give a writer which is still busy the chance to finish
+                self.stopped.wait(self.debounce)
+                current = self.snapshot()
+                self.report({os.path.basename(path) for path, stat in current.items()
+                             if last.get(path) != stat})
+            last = current
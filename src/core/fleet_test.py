@@ -0,0 +1,194 @@
+import argparse
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from threading import Thread
+from time import monotonic, sleep
+
+from src.core.display_client import INP_PIN_MAP, DisplayClient
+from src.core.display_config import DisplayConfig
+from src.core.frame_protocol import parse_address
+from src.core.lcd_interface import LCD_Interface
+from src.core.stub_weather import StubWeatherHandler, start_stub_weather
+from src.core.view_registry import DEFAULT_VIEWS
+from src.core.weather_cache import WeatherCache, start_weather_cache
+from src.web_interface.load_test import cpu_seconds
+
+
+def start_server(listen, cpus, data_directory, weather_url):
+    """
+    Start a render server in a child process.
+
+    Parameters
+        - listen (str): HOST:PORT or the path of a Unix socket
+        - cpus (int): CPU cores the server may use, None for all
+        - data_directory (Path): where the views keep their json files
+        - weather_url (str): forecast API the weather views fetch from
+
+    Returns:
+        - Popen: the server process, once it accepts connections
+    """
+    def pin():
+        if cpus is not None:
+            os.sched_setaffinity(0, set(range(cpus)))
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.core.render_server", "--listen", listen,
+         "--data-directory", str(data_directory), "--weather-url", weather_url],
+        preexec_fn=pin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    family, address = parse_address(listen)
+    for _ in range(100):
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.settimeout(0.1)
+                sock.connect(address)
+            return server
+        except OSError:
+            sleep(0.1)
+    server.kill()
+    raise RuntimeError("The render server didn't start")
+
+
+class FleetTest:
+    """
+    A class to drive a render server with many simulated thin clients.
+
+    Every client is a `DisplayClient` on a simulated panel of its own, in
+    this process, showing one of the views in turn. Now and then a random
+    client gets a button press. The server's CPU time is measured once all
+    clients show their first frame, so it covers rendering and streaming
+    only.
+
+    Parameters
+        - server (str): HOST:PORT of the server, or the path of its Unix socket
+        - clients (int): number of thin clients
+        - press_interval (float): seconds between two button presses
+    """
+    def __init__(self, server, clients, press_interval):
+        self.server = server
+        self.press_interval = press_interval
+        views = [spec.name for spec in DEFAULT_VIEWS]
+        self.clients = [
+            DisplayClient(server, DisplayConfig(name=f"fleet-{i}", address=i + 1, simulated=True,
+                                                view=views[i % len(views)]),
+                          verbosity=0, buttons=False)
+            for i in range(clients)]
+
+    def wait_for_frames(self, timeout):
+        """Wait until every client shows a frame. Returns whether they all do."""
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            if all(client.frames for client in self.clients):
+                return True
+            sleep(0.05)
+        return False
+
+    def run(self, duration, server_pid=None):
+        """
+        Run the clients for `duration` seconds.
+
+        Returns:
+            - dict: totals, per client rates, press to frame latencies and
+                the server CPU time (None without `server_pid`)
+        """
+        for client in self.clients:
+            Thread(target=client.run, name=f"client-{client.display.name}", daemon=True).start()
+        if not self.wait_for_frames(60):
+            raise RuntimeError("Not every client got a frame from the server")
+
+        frames = sum(client.frames for client in self.clients)
+        received = sum(client.bytes_received for client in self.clients)
+        cpu_start = cpu_seconds(server_pid) if server_pid else None
+        start = monotonic()
+        pins = list(INP_PIN_MAP.values())
+        while monotonic() - start < duration:
+            sleep(self.press_interval)
+            random.choice(self.clients).press(random.choice(pins))
+        elapsed = monotonic() - start
+        cpu = cpu_seconds(server_pid) - cpu_start if server_pid else None
+
+        for client in self.clients:
+            client.stop()
+        frames = sum(client.frames for client in self.clients) - frames
+        received = sum(client.bytes_received for client in self.clients) - received
+        latencies = sorted(latency for client in self.clients for latency in client.latencies)
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0
+        count = len(self.clients)
+        return {
+            "clients": count,
+            "elapsed": elapsed,
+            "frames_per_client_s": frames / count / elapsed,
+            "bytes_per_client_s": received / count / elapsed,
+            "bytes_per_frame": received / frames if frames else 0,
+            "presses": len(latencies),
+            "p50": percentile(0.50),
+            "p99": percentile(0.99),
+            "server_cpu": cpu,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive a render server with simulated thin clients")
+    parser.add_argument("--server", help="test a running server (HOST:PORT or a Unix socket path) "
+                                         "instead of starting one")
+    parser.add_argument("--listen", default="127.0.0.1:7070",
+                        help="address of the server started for the test (default: %(default)s)")
+    parser.add_argument("--server-cpus", type=int, default=1,
+                        help="CPU cores for the started server (Pi-class budget), 0 for all")
+    parser.add_argument("--clients", type=int, default=40, help="number of thin clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--press-interval", type=float, default=0.25,
+                        help="seconds between two button presses on random clients")
+    parser.add_argument("--weather-cache", action="store_true",
+                        help="fetch the started server's weather through a weather cache")
+    args = parser.parse_args()
+
+    server = None
+    data_directory = None
+    if args.server:
+        address = args.server
+    else:
+        address = args.listen
+        # Keep the test's frames out of src/data, like the soak does
+        data_directory = tempfile.mkdtemp(prefix="dashboard-fleet-")
+        for name in ("dinner_data.json", "wmo_code.json"):
+            source = LCD_Interface.DATA_DIRECTORY / name
+            if source.exists():
+                shutil.copy(source, data_directory)
+        weather_server = start_stub_weather()
+        weather_url = f"http://127.0.0.1:{weather_server.server_port}/v1/forecast"
+        cache_server = None
+        if args.weather_cache:
+            cache_server = start_weather_cache(WeatherCache(weather_url))
+            weather_url = f"http://127.0.0.1:{cache_server.server_port}/v1/forecast"
+        server = start_server(address, args.server_cpus or None, data_directory, weather_url)
+
+    try:
+        stats = FleetTest(address, args.clients, args.press_interval).run(
+            args.duration, server.pid if server else None)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(data_directory, ignore_errors=True)
+
+    print(f"{stats['clients']} clients for {stats['elapsed']:.0f}s: "
+          f"{stats['frames_per_client_s']:.1f} frames/s and {stats['bytes_per_client_s']:.0f} B/s "
+          f"per client, {stats['bytes_per_frame']:.1f} B per frame")
+    print(f"button press to frame: p50 {stats['p50'] * 1000:.1f}ms, p99 {stats['p99'] * 1000:.1f}ms "
+          f"({stats['presses']} presses)")
+    if stats["server_cpu"] is not None:
+        share = stats["server_cpu"] / stats["elapsed"]
+        print(f"server CPU: {share * 100:.1f}% of a core, "
+              f"{share / stats['clients'] * 100:.2f}% per client")
+        print(f"weather fetches: {StubWeatherHandler.requests}")
+        if cache_server is not None:
+            print(f"weather cache: {cache_server.cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import json
+import socket
+import struct
+
+
+# Every message starts with the length of its payload and its type
+HEADER = struct.Struct(">HB")
+MAX_PAYLOAD = 4096
+
+# Client to server: json with the name, rows, cols and view of the display
+MSG_HELLO = 1
+# Client to server: the GPIO pin of a pressed button (1 byte)
+MSG_BUTTON = 2
+# Server to client: runs of changed cells and custom characters
+MSG_FRAME = 3
+# Server to client: why the connection is closed (utf-8 text)
+MSG_ERROR = 4
+
+# Target of a run which holds custom characters instead of a row
+CGRAM_TARGET = 0x80
+RUN_HEADER = struct.Struct(">BBB")
+# Unchanged bytes between two changes cost less than a new run header
+MERGE_GAP = RUN_HEADER.size
+
+
+def pack(kind, payload=b""):
+    """
+    Frame a message for the socket.
+
+    Raises
+        - ValueError: if the payload is longer than MAX_PAYLOAD
+    """
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f'Message payloads are limited to {MAX_PAYLOAD} bytes')
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def pack_hello(display):
+    """Return the hello message of a thin client driving `display`."""
+    return pack(MSG_HELLO, json.dumps({
+        "name": display.name, "rows": display.rows, "cols": display.cols,
+        "view": display.view}).encode())
+
+
+class MessageReader:
+    """
+    A class to split the bytes received on a socket into messages.
+
+    Raises
+        - ValueError: from `feed` if a message is longer than MAX_PAYLOAD
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Add received bytes.
+
+        Returns:
+            - list: (type, payload) of every message completed by `data`
+        """
+        self.buffer += data
+        messages = []
+        while len(self.buffer) >= HEADER.size:
+            length, kind = HEADER.unpack_from(self.buffer)
+            if length > MAX_PAYLOAD:
+                raise ValueError(f'Message of {length} bytes is too long')
+            end = HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            messages.append((kind, bytes(self.buffer[HEADER.size:end])))
+            del self.buffer[:end]
+        return messages
+
+
+def changed_spans(old, new, unit=1):
+    """
+    Find the parts of `new` which differ from `old`.
+
+    Spans closer than MERGE_GAP units are merged into one.
+
+    Parameters
+        - old (bytes): the previous contents, None if there are none
+        - new (bytes): the current contents
+        - unit (int): bytes compared as one (e.g. 8 for custom characters)
+
+    Returns:
+        - list: (start, end) in units
+    """
+    count = len(new) // unit
+    spans = []
+    for i in range(count):
+        part = slice(i * unit, (i + 1) * unit)
+        if old is not None and old[part] == new[part]:
+            continue
+        if spans and i - spans[-1][1] <= MERGE_GAP:
+            spans[-1] = (spans[-1][0], i + 1)
+        else:
+            spans.append((i, i + 1))
+    return spans
+
+
+def encode_delta(old, new):
+    """
+    Encode the changes between two snapshots of a panel as a frame payload.
+
+    A snapshot is the rows and the CGRAM of a panel, as returned by
+    `SimulatedBus.snapshot`. Each run is a target (row number or
+    CGRAM_TARGET), a start (column or slot), a length (cells or slots) and
+    the new bytes.
+
+    Parameters
+        - old (tuple): the snapshot the client has, None for a full frame
+        - new (tuple): the current snapshot
+
+    Returns:
+        - bytes: the payload, empty if nothing changed
+    """
+    old_rows, old_cgram = old if old is not None else (None, None)
+    new_rows, new_cgram = new
+    payload = bytearray()
+    for start, end in changed_spans(old_cgram, new_cgram, 8):
+        payload += RUN_HEADER.pack(CGRAM_TARGET, start, end - start)
+        payload += new_cgram[start * 8:end * 8]
+    for row, codes in enumerate(new_rows):
+        for start, end in changed_spans(old_rows[row] if old_rows else None, codes):
+            payload += RUN_HEADER.pack(row, start, end - start)
+            payload += codes[start:end]
+    return bytes(payload)
+
+
+def decode_delta(payload):
+    """
+    Split a frame payload into its runs.
+
+    Returns:
+        - list: (target, start, data) of every run
+
+    Raises
+        - ValueError: if the payload is truncated
+    """
+    runs = []
+    offset = 0
+    while offset < len(payload):
+        if offset + RUN_HEADER.size > len(payload):
+            raise ValueError('Truncated frame')
+        target, start, length = RUN_HEADER.unpack_from(payload, offset)
+        offset += RUN_HEADER.size
+        size = length * 8 if target == CGRAM_TARGET else length
+        if offset + size > len(payload):
+            raise ValueError('Truncated frame')
+        runs.append((target, start, payload[offset:offset + size]))
+        offset += size
+    return runs
+
+
+def parse_address(text):
+    """
+    Parse the address of a render server.
+
+    Parameters
+        - text (str): HOST:PORT for TCP, or the path of a Unix socket
+
+    Returns:
+        - int: the socket family
+        - tuple or str: the address to bind or connect to
+    """
+    if "/" in text or ":" not in text:
+        return socket.AF_UNIX, text
+    host, _, port = text.rpartition(":")
+    return socket.AF_INET, (host or "0.0.0.0", int(port))
@@ -1,27 +1,115 @@
-import asyncio
-from time import sleep
+from importlib import import_module
+from threading import Event, Thread
+from time import monotonic, time
 
+from src.core.display_config import load_displays
 from src.core.lcd_interface import LCD_Interface
-from src.core.weather_view import Weather
-from src.core.date_time_view import DateTime
-
-import RPi.GPIO as GPIO
+from src.core.services import DashboardServices
+from src.core.startup_timer import StartupTimer
+from src.core.timeline import load_recorder
+from src.core.view_registry import DEFAULT_VIEWS, ViewRegistry
 
 
 
 
 class HomeDashboard():
-    def __init__(self):
-        self.lcd_interface = LCD_Interface(1)
-        self.weather_view = Weather(1)
-        self.date_time_view = DateTime(1)
-        GPIO.setwarnings(False)
-        GPIO.setmode(GPIO.BOARD)
-        self.setup_gpio()
+    """
+    A class to run the dashboard and switch views with the push buttons.
+
+    On startup the frame and view which were on screen before the last
+    shutdown are painted right after the LCD is initialized. Everything
+    else (GPIO, views and their heavy imports) comes after that, so the
+    display isn't left blank while the dashboard starts.
+
+    One HomeDashboard drives one panel. The main panel has the push buttons;
+    other panels configured in config.ini show the view named in their
+    config section and run their own HomeDashboard in a separate thread.
+    The weather fetch, the file watcher, the alert presenter and the web
+    interface run once per process, in the `DashboardServices` shared by
+    the dashboards.
+
+    Parameters
+        - timer (StartupTimer):
+            timer to record the startup steps in
+            Default: None (startup isn't timed)
+        - display (DisplayConfig):
+            the panel to drive
+            Default: None (the [display] section of config.ini)
+        - buttons (bool):
+            whether the push buttons control this panel
+            Default: True
+        - services (DashboardServices):
+            the background work shared with the other panels, started by
+            the caller
+            Default: None (the dashboard starts services of its own)
+    """
+    # Minimum seconds between saves of an unchanged view, to spare the SD card
+    SAVE_INTERVAL = 60
+
+    # Seconds a ticking view waits past its tick, see `next_refresh`
+    TICK_OFFSET = 0.005
+
+    # Modules imported in the background once the first frame is on screen
+    WARM_IMPORTS = ("requests",)
+
+    def __init__(self, timer=None, display=None, buttons=True, services=None):
+        if display is None:
+            display = load_displays()[0]
+        self.timer = timer
+        self.display = display
+        # Ticks are timed on the monotonic clock, in phase with the wall
+        # clock at startup (see `next_refresh`)
+        self.tick_phase = time() - monotonic()
+        self.lcd_interface = LCD_Interface(1, display)
+        self.mark("LCD init")
+
+        # Record frames, inputs and data updates if enabled in config.ini
+        self.recorder = load_recorder(display, data_directory=self.lcd_interface.data_directory)
+        self.lcd_interface.set_recorder(self.recorder)
+        if self.recorder is not None:
+            # A replay starts from the data files as they are now
+            self.record_data({path.name for path in self.lcd_interface.data_directory.glob('*.json')})
+
+        # Views are only imported and constructed once they are displayed
+        self.views = ViewRegistry(self.lcd_interface, 1, display)
+        for spec in DEFAULT_VIEWS:
+            self.views.register(spec)
         self.main_button = 0
         self.secondary_button = 0
+        self.last_saved = None
+        self.last_save_time = 0
+        if display.name == "main":
+            self.state_file = 'last_frame.json'
+        else:
+            self.state_file = f'last_frame_{display.name}.json'
+
+        # Paint the last frame before anything else is set up
+        self.restore_state()
+        self.mark("restore last frame")
+
+        # Set by the button callback to wake the refresh loop early
+        self.view_changed = Event()
+        if buttons:
+            self.setup_gpio()
+            self.mark("GPIO setup")
+        elif display.view is not None:
+            self.main_button = self.views.index_of(display.view)
+            self.secondary_button = 0
         self.refresh_LCD = True
 
+        Thread(target=self.warm_imports, daemon=True).start()
+
+        # Fetch the weather, apply edits to config.ini and the data files
+        # and serve the web interface while running
+        self.services = services
+        if services is None:
+            self.services = DashboardServices()
+        self.services.add(self)
+        if services is None:
+            self.services.start()
+        # Urgent alerts interrupt whatever view is on screen
+        self.alerts = self.services.alerts
+
     # Dictionary to hold the mapping of buttons to GPIO pins
     INP_PIN_MAP = {
         "main_btn" : 37,
@@ -33,6 +121,10 @@ class HomeDashboard():
         Sets up the GPIO pins used to interface with the buttons. Adds callback
         functions to the two input buttons.
         """
+        import RPi.GPIO as GPIO
+        GPIO.setwarnings(False)
+        GPIO.setmode(GPIO.BOARD)
+
         # Initialize the GPIO pins
         GPIO.setup(list(self.INP_PIN_MAP.values()), GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
 
@@ -42,6 +134,106 @@ class HomeDashboard():
         GPIO.add_event_detect(self.INP_PIN_MAP["secondary_btn"], GPIO.RISING,
                               callback=self.button_pressed_callback, bouncetime=1000)
         
+    def mark(self, label):
+        """Record a startup step if startup is being timed."""
+        if self.timer is not None:
+            self.timer.mark(label)
+
+    def restore_state(self):
+        """
+        Paint the frame and select the view saved by `save_state`.
+
+        A missing or unreadable state file leaves the display blank and
+        starts on the first view. The custom characters are uploaded before
+        the frame is written, since views reuse the CGRAM slots (e.g. the
+        big clock digits take the slot of the degree symbol). Custom
+        characters of a state file saved without them are left blank.
+        """
+        try:
+            state = self.lcd_interface.load_data(self.state_file)
+            frame = state["frame"]
+            if "chars" in state:
+                self.lcd_interface.ensure_chars({int(slot): bitmap
+                                                 for slot, bitmap in state["chars"].items()})
+            else:
+                frame = [[0x20 if code < 8 else code for code in row] for row in frame]
+            self.lcd_interface.restore_frame(frame)
+            self.main_button = state["main_button"] % len(self.views)
+            self.secondary_button = (state["secondary_button"]
+                                     % self.views.screen_count(self.main_button))
+            self.last_saved = state
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"No previous frame restored: {e}")
+
+    def save_state(self, force=False):
+        """
+        Save the frame on screen, its custom characters and the selected
+        view to the state file (last_frame.json for the main panel).
+
+        Parameters
+            - force (bool):
+                save even if the last save was less than `SAVE_INTERVAL`
+                seconds ago
+                Default: False
+        """
+        state = {
+            "main_button": self.main_button,
+            "secondary_button": self.secondary_button,
+            "frame": self.lcd_interface.frame,
+            "chars": {str(slot): list(bitmap)
+                      for slot, bitmap in sorted(self.lcd_interface.chars.items())},
+        }
+        if state == self.last_saved:
+            return
+        if not force and monotonic() - self.last_save_time < self.SAVE_INTERVAL:
+            return
+        self.lcd_interface.save_data(state, self.state_file)
+        self.last_saved = state
+        self.last_save_time = monotonic()
+
+    def warm_imports(self):
+        """Import the view modules and their heavy dependencies in the background."""
+        modules = [spec.module for spec in self.views.specs if spec.module is not None]
+        for module in modules + list(self.WARM_IMPORTS):
+            try:
+                import_module(module)
+            except ImportError as e:
+                print(f"Could not import {module}: {e}")
+
+    def files_changed(self, filenames):
+        """
+        Apply changed config and data files to the views reading them.
+
+        Only the views listing a changed file in their resources are told
+        about it, and the view on screen is only redrawn right away if it
+        is one of them. Display and timeline settings in config.ini are
+        read at startup and need a restart. Changed data files are
+        recorded when the timeline is enabled.
+
+        Parameters
+            - filenames (set): names of the changed files
+        """
+        if self.recorder is not None:
+            self.record_data(filenames)
+
+        affected = self.views.reload(filenames)
+        if self.main_button in affected:
+            if self.lcd_interface.verbosity >= 1:
+                print(f"reloading {', '.join(sorted(filenames))}")
+            self.view_changed.set()
+
+    def record_data(self, filenames):
+        """Record the contents of changed data files, except the saved frames."""
+        for name in sorted(filenames):
+            if not name.endswith('.json') or name.startswith('last_frame'):
+                continue
+            try:
+                content = (self.lcd_interface.data_directory / name).read_bytes()
+            except OSError:
+                # Not a data file, or already replaced again
+                continue
+            self.recorder.data(name, content)
+
     def button_pressed_callback(self, channel):
         """
         The function to be called when a button is pressed.
@@ -49,6 +241,14 @@ class HomeDashboard():
         Pauses the refresh of the LCD display. Clears the LCD display. Changes
         the "view" of the LCD display. Continues to refresh the LCD display.
         """
+        if self.recorder is not None:
+            self.recorder.input(channel)
+
+        # A press while an alert is up only dismisses the alert
+        if self.alerts.active is not None:
+            self.alerts.dismiss()
+            return
+
         # Pause the refresh of the LCD display
         self.refresh_LCD = None
 
@@ -61,71 +261,100 @@ class HomeDashboard():
             # when switching between the 4 main views
             self.secondary_button = 0
 
-            # Main btn count goes from 0 to 1 to 2 to 3 and then back to 0 (4 views)
-            if self.main_button < 3:
-                self.main_button += 1
-            else:
-                self.main_button = 0
+            # Main btn count goes from 0 to the last view and then back to 0
+            self.main_button = (self.main_button + 1) % len(self.views)
 
             print(f"self.main_button: {self.main_button}")
         
         # If secondary button is pressed -> switch to alt screen of same view
         elif channel == self.INP_PIN_MAP["secondary_btn"]:
 
-            # Scndry btn count goes from 0 to 1 and then back to 0 (only one alt screen / view)
-            if self.secondary_button < 1:
-                self.secondary_button += 1
-            else:
-                self.secondary_button = 0
+            # Scndry btn count goes through the screens of the current view
+            # and then back to 0
+            self.secondary_button = ((self.secondary_button + 1)
+                                     % self.views.screen_count(self.main_button))
 
             print(f"self.secondary_button: {self.secondary_button}")
 
         # Reset the flag so the display can continue to refresh
         self.refresh_LCD = True
+        self.view_changed.set()
+
+    def next_refresh(self, spec):
+        """
+        Return the seconds until a view is redrawn.
+
+        A ticking view waits for the next whole multiple of its refresh on
+        the wall clock, plus a few milliseconds so the clock has turned
+        over when it's read. A second is never skipped or shown twice, even
+        though every redraw takes a bit of time. The wall clock is only
+        read once at startup and the ticks follow the monotonic clock from
+        there, so a clock adjustment (e.g. by NTP) doesn't make a tick
+        fire early or late.
+        """
+        if not spec.tick:
+            return spec.refresh
+        return spec.refresh - (monotonic() + self.tick_phase) % spec.refresh + self.TICK_OFFSET
 
     def cycle_views(self):
         """
-        This function cycles through the 4 views.
+        This function cycles through the views.
+
+        The views are held in a `ViewRegistry` (date/time, weather, dinner,
+        and msg board by default). The user can cycle to the next "view" by
+        using the main button on the breadboard. Inside of a "view", the user
+        can press the secondary button to show additional information.
 
-        4 "views" exist in the project (date/time, weather, dinner, and msg board).
-        The user can cycle to the next "view" by using the main button on the
-        breadboard. Inside of a "view", the user can press the secondary button
-        to show additional information.
+        Each view is redrawn every `refresh` seconds of its spec, or right
+        away when a button is pressed. Views which stay hidden for longer
+        than their idle timeout are released. The frame on screen is saved
+        so it can be restored on the next startup.
         """
+        shown = None
         while self.refresh_LCD is not None:
             try:
-                if self.main_button == 0:
-                    if self.secondary_button == 0:
-                        self.date_time_view.date_time_display()
-                    elif self.secondary_button == 1:
-                        self.lcd_interface.write_centered(0, "alt view")
-
-                elif self.main_button == 1:
-                    if self.secondary_button == 0:
-                        #self.lcd_interface.write_centered(0, "current weather")
-                        asyncio.run(self.weather_view.current_weather_display())
-                    elif self.secondary_button == 1:
-                        self.lcd_interface.write_centered(0, "forecast")
-
-                elif self.main_button == 2:
-                    if self.secondary_button == 0:
-                        self.lcd_interface.write_centered(0, "dinner view")
-                    elif self.secondary_button == 1:
-                        self.lcd_interface.write_centered(0, "tmr dinner")
-
-                elif self.main_button == 3:
-                    if self.secondary_button == 0:
-                        self.lcd_interface.write_centered(0, "msg board")
-                    elif self.secondary_button == 1:
-                        self.lcd_interface.write_centered(0, "alt board")
-
-                sleep(1)
+                self.view_changed.clear()
+                current = (self.main_button, self.secondary_button)
+                if current != shown and self.recorder is not None:
+                    self.recorder.view(*current)
+                spec = self.views.show(*current)
+                if shown is None and self.timer is not None:
+                    self.timer.mark("first view")
+                    self.timer.report()
+
+                # Save right away when the view changed so a reboot comes back to it
+                self.save_state(force=current != shown)
+                shown = current
+
+                self.views.release_idle(self.main_button)
+                self.view_changed.wait(self.next_refresh(spec))
+
+            except OSError as e:
+                # The LCD recovers from bus errors on its own (see
+                # `LCD_Interface.recover`), keep the dashboard running
+                print(f"Error drawing {self.views.specs[self.main_button].name}: {e}")
+                self.view_changed.wait(1)
 
             except KeyboardInterrupt:
                 print("\nExiting...")
+                self.services.stop()
+                self.views.release_all()
                 return
         
 
+def main():
+    timer = StartupTimer()
+    displays = load_displays()
+    services = DashboardServices()
+    home_dashboard = HomeDashboard(timer, displays[0], services=services)
+    services.start()
+
+    # Every other panel shows its configured view from its own thread
+    for display in displays[1:]:
+        panel = HomeDashboard(display=display, buttons=False, services=services)
+        Thread(target=panel.cycle_views, name=f"panel-{display.name}", daemon=True).start()
+
+    home_dashboard.cycle_views()
+
 if __name__ == "__main__":
-    home_dashboard = HomeDashboard()
-    home_dashboard.cycle_views()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,324 @@
+import errno
+from functools import partial
+from queue import Queue
+from threading import Lock, Thread
+from time import perf_counter, sleep
+
+try:
+    from smbus2 import i2c_msg
+except ImportError:
+    i2c_msg = None
+
+
+# PCF8574 backpack pin mapping: D7 D6 D5 D4 BL EN RW RS
+PCF8574_E = 0x04
+RS_INSTRUCTION = 0x00
+RS_DATA = 0x01
+
+# Clear display and return home take up to 1.52 ms to execute
+SLOW_INSTRUCTIONS = (0x01, 0x02, 0x03)
+SLOW_INSTRUCTION_DELAY = 0.002
+
+# Seconds to wait before each retry of a failed transfer
+RETRY_DELAYS = (0.001, 0.004, 0.016)
+# The backpack didn't acknowledge its address, so none of the bytes were
+# latched and the transfer can simply be sent again
+SAFE_RETRY_ERRNOS = (errno.ENXIO, errno.EREMOTEIO)
+
+
+class BusWorker:
+    """
+    A thread doing all of the writes to one I2C bus.
+
+    Each bus gets its own worker, so a slow or busy panel only holds up the
+    panels on its own bus. Jobs run in the order they were submitted. The
+    queue is bounded, so a renderer which gets too far ahead of its bus
+    waits instead of piling up frames. A job which fails is counted in
+    `errors` and the worker carries on with the next one.
+
+    Parameters
+        - port (int): the I2C bus number
+        - max_pending (int):
+            maximum number of queued jobs
+            Default: 64
+    """
+    workers = {}
+    workers_lock = Lock()
+
+    def __init__(self, port, max_pending=64):
+        self.port = port
+        self.queue = Queue(maxsize=max_pending)
+        self.errors = 0
+        self.smbus2 = None
+        self.lock = Lock()
+        self.thread = Thread(target=self.run, name=f"i2c-{port}", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def for_port(cls, port):
+        """Return the worker of a bus, starting it if needed."""
+        with cls.workers_lock:
+            if port not in cls.workers:
+                cls.workers[port] = cls(port)
+            return cls.workers[port]
+
+    def bulk_bus(self, bus):
+        """
+        Return a bus of the port which can do long transfers.
+
+        The smbus C module can't do transfers longer than 32 bytes, so an
+        smbus2 bus is opened for it, once per port and shared by every
+        panel on it. Without smbus2 `bus` is returned.
+        """
+        if hasattr(bus, 'i2c_rdwr'):
+            return bus
+        with self.lock:
+            if self.smbus2 is None:
+                try:
+                    from smbus2 import SMBus
+                except ImportError:
+                    return bus
+                self.smbus2 = SMBus(self.port)
+            return self.smbus2
+
+    def submit(self, job):
+        """Queue a callable to run on the bus thread."""
+        self.queue.put(job)
+
+    def wait(self):
+        """Block until every queued job has run."""
+        self.queue.join()
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                job()
+            except OSError as e:
+                self.errors += 1
+                print(f"I2C bus {self.port} write failed: {e}")
+            except Exception as e:
+                # Any other failure is a bug in the job; the worker has to
+                # survive it, or every panel on the bus waits on it forever
+                self.errors += 1
+                print(f"I2C bus {self.port} job failed: {e!r}")
+            finally:
+                self.queue.task_done()
+
+
+class BatchedTransport:
+    """
+    A class to send HD44780 writes to a PCF8574 backpack in bulk transfers.
+
+    RPLCD sends every nibble as four single byte I2C transactions and sleeps
+    100us after each enable pulse. The PCF8574 latches every byte of a write
+    transaction onto its pins, so the same enable strobe can be sent as
+    three bytes (data, data + E, data) of one long transaction instead. The
+    time it takes to clock out the following bytes covers the 37us the
+    HD44780 needs to execute a write, even at 400kHz.
+
+    Writes are queued with `send` and go out with `flush`. With smbus2 a
+    whole frame is sent as a single `i2c_rdwr` transfer; with the plain
+    smbus module it is split into 32 byte block writes. When a `BusWorker`
+    is given, the transfers run on the worker thread of the bus and `flush`
+    returns right away.
+
+    Parameters
+        - bus (SMBus):
+            the I2C bus of the display
+        - address (int):
+            the I2C address of the backpack
+        - backlight (int):
+            the backlight bit to set on every byte (0x08 on, 0x00 off)
+        - max_transfer (int):
+            maximum bytes per bulk transfer
+            Default: 1024
+        - worker (BusWorker):
+            the worker thread of the bus
+            Default: None (write from the calling thread)
+        - on_fault (callable):
+            called with the OSError when the transport becomes faulted
+            Default: None
+    """
+    def __init__(self, bus, address, backlight, max_transfer=1024, worker=None,
+                 on_fault=None):
+        self.bus = bus
+        self.worker = worker
+        self.address = address
+        self.backlight = backlight
+        self.max_transfer = max_transfer
+        self.on_fault = on_fault
+        self.buffer = bytearray()
+        self.use_rdwr = i2c_msg is not None and hasattr(bus, "i2c_rdwr")
+        self.faulted = False
+
+        self.transfers = 0
+        self.bytes_sent = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def send(self, value, mode):
+        """
+        Queue an instruction or data byte.
+
+        Parameters
+            - value (int): the byte to send to the HD44780
+            - mode (int): RS_INSTRUCTION or RS_DATA
+        """
+        for nibble in (value & 0xF0, (value << 4) & 0xF0):
+            bits = nibble | mode | self.backlight
+            self.buffer += bytes((bits, bits | PCF8574_E, bits))
+
+        if mode == RS_INSTRUCTION and value in SLOW_INSTRUCTIONS:
+            self.flush()
+            if self.worker is None:
+                sleep(SLOW_INSTRUCTION_DELAY)
+            else:
+                self.worker.submit(partial(sleep, SLOW_INSTRUCTION_DELAY))
+
+    def flush(self):
+        """Send every queued byte to the backpack."""
+        if not self.buffer:
+            return
+        buffer, self.buffer = bytes(self.buffer), bytearray()
+        if self.worker is None:
+            self.write(buffer)
+        else:
+            self.worker.submit(partial(self.write, buffer))
+
+    def wait(self):
+        """Block until every flushed byte has been written to the bus."""
+        if self.worker is not None:
+            self.worker.wait()
+
+    def reset(self):
+        """
+        Send writes again after a fault.
+
+        Writes flushed before the reset are still dropped, the reset waits
+        for them in line on the worker thread.
+        """
+        if self.worker is None:
+            self.faulted = False
+        else:
+            self.worker.submit(partial(setattr, self, "faulted", False))
+
+    def probe(self):
+        """
+        Check whether the backpack answers on the bus.
+
+        Returns:
+            - bool: True if a single byte write was acknowledged
+        """
+        try:
+            self.bus.write_byte(self.address, self.backlight)
+            return True
+        except OSError:
+            return False
+
+    def write(self, buffer):
+        """Write bytes to the backpack in as few transfers as possible."""
+        if self.faulted:
+            self.dropped += len(buffer)
+            return
+        try:
+            if self.use_rdwr:
+                for i in range(0, len(buffer), self.max_transfer):
+                    self.transfer(partial(self.bus.i2c_rdwr,
+                                          i2c_msg.write(self.address, buffer[i:i + self.max_transfer])))
+            else:
+                # The command byte of a block write is latched like any other byte
+                for i in range(0, len(buffer), 33):
+                    chunk = buffer[i:i + 33]
+                    if len(chunk) == 1:
+                        self.transfer(partial(self.bus.write_byte, self.address, chunk[0]))
+                    else:
+                        self.transfer(partial(self.bus.write_i2c_block_data,
+                                              self.address, chunk[0], list(chunk[1:])))
+        except OSError as e:
+            self.faulted = True
+            if self.on_fault is None:
+                raise
+            self.on_fault(e)
+            return
+        self.bytes_sent += len(buffer)
+
+    def transfer(self, send):
+        """Run one bus transfer, retrying it while nothing was latched."""
+        for delay in RETRY_DELAYS + (None,):
+            try:
+                send()
+                self.transfers += 1
+                return
+            except OSError as e:
+                if delay is None or e.errno not in SAFE_RETRY_ERRNOS:
+                    raise
+                self.retries += 1
+                sleep(delay)
+
+
+def bus_clock(port=1):
+    """
+    Return the configured clock of an I2C bus in Hz.
+
+    On the Raspberry Pi the clock can't be changed at runtime; it is raised
+    with `dtparam=i2c_arm_baudrate=400000` in /boot/config.txt. Most PCF8574
+    backpacks run fine at 400kHz even though the datasheet lists 100kHz.
+
+    Returns:
+        - int: the clock frequency, or None if it can't be read
+    """
+    path = f"/sys/class/i2c-adapter/i2c-{port}/of_node/clock-frequency"
+    try:
+        with open(path, "rb") as f:
+            return int.from_bytes(f.read(4), "big")
+    except (OSError, ValueError):
+        return None
+
+
+def measure_throughput(lcd, redraws=20):
+    """
+    Measure how many characters per second a full screen redraw reaches.
+
+    Every redraw alternates between two screens of different characters so
+    RPLCD's content cache can't skip any cell.
+
+    Parameters
+        - lcd (LCD_Interface): the display to draw on
+        - redraws (int):
+            number of full screen redraws
+            Default: 20
+
+    Returns:
+        - float: characters written per second
+    """
+    cols, rows = lcd.lcd.cols, lcd.lcd.rows
+    screens = [bytes([fill] * cols) for fill in (ord('#'), ord('-'))]
+    start = perf_counter()
+    for i in range(redraws):
+        with lcd.batch():
+            for row in range(rows):
+                lcd.cursor_pos = (row, 0)
+                lcd.write_encoded(screens[i % 2])
+    lcd.wait_for_writes()
+    return redraws * cols * rows / (perf_counter() - start)
+
+
+def main():
+    from src.core.lcd_interface import LCD_Interface
+
+    lcd_interface = LCD_Interface(1)
+    clock = bus_clock(lcd_interface._port)
+    print(f"I2C bus clock: {clock if clock else 'unknown'} Hz")
+
+    lcd_interface.set_batched(False)
+    before = measure_throughput(lcd_interface)
+    lcd_interface.set_batched(True)
+    after = measure_throughput(lcd_interface)
+
+    full_screen = lcd_interface.lcd.cols * lcd_interface.lcd.rows
+    print(f"unbatched: {before:8.0f} chars/s ({full_screen / before * 1000:6.1f} ms per redraw)")
+    print(f"batched:   {after:8.0f} chars/s ({full_screen / after * 1000:6.1f} ms per redraw)")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 import json
+import os
 from pathlib import Path
-from time import sleep
+from threading import Event, Lock, RLock, Thread, get_ident
+from time import perf_counter, sleep
 
+from RPLCD import common
 from RPLCD.i2c import CharLCD
 
+from src.core.display_config import load_displays
+from src.core.encoding_cache import EncodingCache
+from src.core.i2c_transport import BatchedTransport, BusWorker, RS_DATA, RS_INSTRUCTION
+from src.core.simulated_display import SimulatedBus
+from src.core.smooth_scroll import CELL_PITCH, MAX_WIDTH, SmoothScroller
+
 
 class LCD_Interface(CharLCD):
     """
-    A class to interface with a 16*2 LCD display.
+    A class to interface with a character LCD display (16x2, 20x4, 40x2...).
 
     This class creates special printing functions which allow us to write info
     to the LCD display. `write_centered` takes a line number and a string and
@@ -17,19 +28,78 @@ class LCD_Interface(CharLCD):
     It also stores functionality for writing to and loading from json files.
     This functionality is used by multiple inherited classes.
 
+    Every view is its own LCD_Interface, but they all drive the same panel.
+    The content cache and cursor position RPLCD keeps per instance are
+    therefore shared by all instances on the same I2C port and address, so a
+    `clear` done by one view is seen by all others.
+
+    Only the first instance on a panel opens the I2C bus and initializes the
+    controller. Views created later, including views loaded again after
+    they were released, share that connection, so loading a view doesn't
+    reset the panel or open another bus.
+
+    On PCF8574 backpacks writes go through a `BatchedTransport` shared by the
+    panel. Writes done inside of `batch` (whole strings, frames, scroll
+    steps) are sent together in as few bulk I2C transfers as possible, on
+    the writer thread of the panel's I2C bus.
+
     Parameters
         - verbosity (int):
             Changes how much information is displayed. Can be 0 or 1 or 2.
             Default: 1
+        - display (DisplayConfig):
+            geometry and I2C address of the panel
+            Default: None (the [display] section of config.ini)
     """
-    def __init__(self, verbosity=1):
-        super().__init__(i2c_expander="PCF8574",
-                           address=0x27,
-                           port=1, 
-                           cols=16,
-                           rows=2, 
-                           dotsize=8)
-        self.clear()
+    # Shared state of each panel, keyed by (port, address)
+    panels = {}
+
+    # Encoded strings, one cache per character map
+    encoding_caches = {}
+
+    # Pack writes into bulk I2C transfers (PCF8574 backpacks only)
+    BATCHED_I2C = True
+
+    # Scroll long text pixel by pixel through a window of custom characters
+    SMOOTH_SCROLL = False
+
+    # Where the views keep their json files
+    DATA_DIRECTORY = Path(__file__).parent.parent / "data"
+
+    # Seconds between attempts to bring a panel back after a bus error
+    RECOVERY_DELAYS = (0.01, 0.05, 0.25, 1, 5)
+
+    # Recovery times kept per panel for `bus_health`, the oldest are dropped
+    MAX_RECOVERY_TIMES = 64
+
+    # What RPLCD sets up when it opens a panel, shared by the later instances
+    # on the same panel (the content cache and cursor are shared anyway)
+    CONNECTION_STATE = ("_address", "_port", "_i2c_expander", "_expander_params",
+                        "data_bus_mode", "_backlight", "codec", "lcd", "auto_linebreaks",
+                        "recent_auto_linebreak", "_display_mode", "_cursor_mode",
+                        "_text_align_mode", "_display_shift_mode", "bus")
+
+    def __init__(self, verbosity=1, display=None):
+        if display is None:
+            display = load_displays()[0]
+        self.display = display
+        # Nesting depth of `batch` blocks
+        self.batch_depth = 0
+        connection = LCD_Interface.panels.get((display.port, display.address), {}).get("connection")
+        if connection is None:
+            super().__init__(i2c_expander="PCF8574",
+                               address=display.address,
+                               port=display.port,
+                               cols=display.cols,
+                               rows=display.rows,
+                               dotsize=8)
+            self.clear()
+            self._panel()["connection"] = self
+        else:
+            # The panel is up already: share its bus instead of running the
+            # HD44780 init (and a clear) again for every view
+            for name in self.CONNECTION_STATE:
+                setattr(self, name, getattr(connection, name))
 
         if verbosity == 0 or verbosity == 1 or verbosity == 2:
             print(f"verbosity: {verbosity}")
@@ -40,8 +110,8 @@ class LCD_Interface(CharLCD):
         
         # Define the current file's path
         self.current_path = Path(__file__)
-        # Define the data directory's path relative to the current file
-        self.data_directory = self.current_path.parent.parent / "data"
+        # The data directory (src/data unless changed, e.g. for soak tests)
+        self.data_directory = self.DATA_DIRECTORY
         self.degree_symbol = (
             0b00000,
             0b00100,
@@ -52,24 +122,462 @@ class LCD_Interface(CharLCD):
             0b00000,
             0b00000
         )
-        self.create_char(0, self.degree_symbol)
-        
+        if connection is None:
+            self.create_char(0, self.degree_symbol)
+
+        self.encoding_cache = LCD_Interface.encoding_caches.setdefault(
+            type(self.codec).__name__, EncodingCache(self.codec))
+
+        if "transport" not in self._panel():
+            self.set_batched(self.BATCHED_I2C)
+
+    def _init_connection(self):
+        if self.display.simulated:
+            # Every view of the panel drives the same simulated controller
+            self.bus = self._panel().setdefault(
+                "bus", SimulatedBus(self.display.rows, self.display.cols))
+        else:
+            super()._init_connection()
+
+    def _panel(self):
+        panel = LCD_Interface.panels.get((self._port, self._address))
+        if panel is None:
+            # "resume" is cleared while an alert has taken the panel over
+            resume = Event()
+            resume.set()
+            panel = LCD_Interface.panels.setdefault((self._port, self._address), {
+                "lock": RLock(), "resume": resume, "cgram": {}, "fault_lock": Lock(),
+                "health": {"faults": 0, "recoveries": 0,
+                           "recovery_times": deque(maxlen=self.MAX_RECOVERY_TIMES)}})
+        return panel
+
+    @contextmanager
+    def _foreground(self):
+        """
+        Lock the panel, waiting first while an alert is on screen.
+
+        The thread showing the alert (see `preempt`) passes right through,
+        and so does the thread recovering the panel (see `recover`), which
+        has to repaint whatever is on screen, alert or not. Threads already
+        inside of a batch also pass, since an alert can only start while
+        nobody holds the lock.
+        """
+        panel = self._panel()
+        lock = panel["lock"]
+        ident = get_ident()
+        while True:
+            passes = panel.get("owner") == ident or panel.get("recovering") == ident
+            if not passes:
+                panel["resume"].wait()
+            lock.acquire()
+            if panel["resume"].is_set() or passes:
+                break
+            # An alert started between the wait and the lock
+            lock.release()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @contextmanager
+    def preempt(self):
+        """
+        Take the panel over for an urgent alert.
+
+        Waits for the batch in progress, then holds back writes from every
+        other thread until the block ends. The frame on the panel is kept
+        and written back at the end, so the views carry on where they were
+        interrupted. While the alert is up, `frame` still returns the
+        covered frame.
+        """
+        panel = self._panel()
+        with panel["lock"]:
+            panel["resume"].clear()
+            panel["owner"] = get_ident()
+            covered = self.frame
+            panel["covered"] = covered
+        try:
+            yield
+        finally:
+            with panel["lock"]:
+                del panel["covered"]
+                self.restore_frame(covered)
+                panel["owner"] = None
+                panel["resume"].set()
+
+    def set_batched(self, enabled):
+        """
+        Turn bulk I2C transfers on or off for the panel.
+
+        Parameters
+            - enabled (bool): whether to batch writes
+        """
+        transport = None
+        if enabled and self._i2c_expander == 'PCF8574':
+            worker = BusWorker.for_port(self._port)
+            transport = BatchedTransport(worker.bulk_bus(self.bus), self._address,
+                                         self._backlight, worker=worker,
+                                         on_fault=self.bus_fault)
+        with self._panel()["lock"]:
+            self._panel()["transport"] = transport
+
+    @contextmanager
+    def batch(self):
+        """
+        Queue every write made inside of the block and send them together.
+
+        The panel is locked for the duration of the block, so writes from
+        other threads (e.g. the button callback) don't end up in between.
+        """
+        with self._foreground():
+            self.batch_depth += 1
+            try:
+                yield
+            finally:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    transport = self._panel().get("transport")
+                    if transport is not None:
+                        transport.flush()
+                    self.record_frame()
+
+    def set_recorder(self, recorder):
+        """
+        Record every frame change of the panel.
+
+        Parameters
+            - recorder (Recorder): the timeline recorder, None stops recording
+        """
+        with self._panel()["lock"]:
+            self._panel()["recorder"] = recorder
+            if recorder is not None:
+                recorder.frame(self._content)
+
+    def record_frame(self):
+        """Hand the frame on the panel to the timeline recorder, if any."""
+        recorder = self._panel().get("recorder")
+        if recorder is not None:
+            recorder.frame(self._content)
+
+    def clear(self):
+        """Clear the LCD display."""
+        with self._foreground():
+            super().clear()
+            self.record_frame()
+
+    def _send(self, value, mode):
+        with self._panel()["lock"]:
+            transport = self._panel()["transport"]
+            transport.backlight = self._backlight
+            transport.send(value, mode)
+            if self.batch_depth == 0:
+                transport.flush()
+
+    def create_char(self, location, bitmap):
+        """Store a custom character in CGRAM, sent as one batch."""
+        with self.batch():
+            super().create_char(location, bitmap)
+        self._panel()["cgram"][location] = tuple(bitmap)
+        recorder = self._panel().get("recorder")
+        if recorder is not None:
+            recorder.cgram(location, bitmap)
+
+    def upload_chars(self, location, bitmaps):
+        """
+        Store several custom characters in consecutive CGRAM slots.
+
+        The CGRAM address increments after every row, so the slots are sent
+        after a single address instruction. Used for animations which
+        change custom characters many times a second.
+
+        Parameters
+            - location (int): the first slot (0-7)
+            - bitmaps (list): one tuple of 8 rows per slot
+        """
+        if location + len(bitmaps) > 8:
+            raise ValueError('Only locations 0-7 are valid.')
+        recorder = self._panel().get("recorder")
+        with self.batch():
+            pos = self.cursor_pos
+            self.command(0x40 | location << 3)
+            for offset, bitmap in enumerate(bitmaps):
+                for row in bitmap:
+                    self._send_data(row)
+                self._panel()["cgram"][location + offset] = tuple(bitmap)
+                if recorder is not None:
+                    recorder.cgram(location + offset, bitmap)
+            self.cursor_pos = pos
+
+    def ensure_chars(self, chars):
+        """
+        Make sure custom characters are in CGRAM, uploading only those which aren't.
+
+        Views share the 8 CGRAM slots (e.g. the big clock digits use all of
+        them), so a view drawing a custom character calls this first. When
+        the slots already hold the bitmaps nothing is sent.
+
+        Parameters
+            - chars (dict): bitmaps (8 rows) keyed by slot
+        """
+        cgram = self._panel()["cgram"]
+        changed = [location for location, bitmap in sorted(chars.items())
+                   if cgram.get(location) != tuple(bitmap)]
+        if not changed:
+            return
+        with self.batch():
+            start = 0
+            for i in range(1, len(changed) + 1):
+                # Consecutive slots go out after one address instruction
+                if i == len(changed) or changed[i] != changed[i - 1] + 1:
+                    run = changed[start:i]
+                    self.upload_chars(run[0], [chars[location] for location in run])
+                    start = i
+
+    def _send_data(self, value):
+        with self._foreground():
+            if self._panel().get("transport") is None:
+                self._send_direct(super()._send_data, value)
+            else:
+                self._send(value, RS_DATA)
+
+    def _send_instruction(self, value):
+        with self._foreground():
+            if self._panel().get("transport") is None:
+                self._send_direct(super()._send_instruction, value)
+            else:
+                self._send(value, RS_INSTRUCTION)
+
+    def _send_direct(self, send, value):
+        try:
+            send(value)
+        except OSError as e:
+            # Errors of the recovery itself are handled by `recover`
+            if self._panel().get("recovering") == get_ident():
+                raise
+            self.bus_fault(e)
+
+    def bus_fault(self, error):
+        """
+        Start bringing the panel back after a failed write.
+
+        Called from the bus worker thread or the writing thread. The
+        recovery runs in its own thread; views keep drawing into the content
+        cache meanwhile, and whatever they drew is repainted once the panel
+        answers again.
+
+        Parameters
+            - error (OSError): the error of the failed write
+        """
+        panel = self._panel()
+        # Not the panel lock: the worker thread reporting the error may be
+        # the one a writer holding the panel lock is waiting for
+        with panel["fault_lock"]:
+            if panel.get("recovering") is not None:
+                return
+            panel["recovering"] = "starting"
+            panel["health"]["faults"] += 1
+            panel["fault_time"] = perf_counter()
+        print(f"LCD at {self._address:#x} on bus {self._port} failed: {error}")
+        Thread(target=self.recover, name=f"lcd-recover-{self._address:#x}", daemon=True).start()
+
+    def reinitialize(self):
+        """
+        Run the HD44780 init sequence (Hitachi manual page 46) again.
+
+        Brings the controller back to 4 bit mode in nibble sync after a
+        broken transfer or a power loss. The display is cleared; the content
+        cache is left alone so `recover` knows what to repaint.
+        """
+        for value, delay in ((0x03, 0.0045), (0x03, 0.0045), (0x03, 0.0001), (0x02, 0)):
+            self.command(value)
+            self.wait_for_writes()
+            sleep(delay)
+
+        displayfunction = self.data_bus_mode | common.LCD_5x8DOTS
+        displayfunction |= common.LCD_1LINE if self.lcd.rows == 1 else common.LCD_2LINE
+        self.command(common.LCD_FUNCTIONSET | displayfunction)
+        self.command(common.LCD_DISPLAYCONTROL | self._display_mode | self._cursor_mode)
+        self.command(common.LCD_CLEARDISPLAY)
+        sleep(0.002)
+        self.command(common.LCD_ENTRYMODESET | self._text_align_mode | self._display_shift_mode)
+        self.wait_for_writes()
+
+    def recover(self):
+        """
+        Bring a faulted panel back and repaint it.
+
+        The panel is probed with a growing delay (see `RECOVERY_DELAYS`,
+        the last delay repeats) until it answers. Then the init sequence
+        runs again, the custom characters are uploaded and the frame of the
+        content cache is written back. Recovery times end up in
+        `bus_health`.
+        """
+        panel = self._panel()
+        transport = panel.get("transport")
+        # Lets this thread through while an alert holds the other writers back
+        panel["recovering"] = get_ident()
+        attempt = 0
+        while True:
+            sleep(self.RECOVERY_DELAYS[min(attempt, len(self.RECOVERY_DELAYS) - 1)])
+            attempt += 1
+            if transport is not None and not transport.probe():
+                continue
+
+            with self._foreground():
+                frame = [list(row) for row in self._content]
+                try:
+                    if transport is not None:
+                        transport.reset()
+                    self.reinitialize()
+                    for location, bitmap in sorted(panel["cgram"].items()):
+                        self.upload_chars(location, [bitmap])
+                    # The display is blank now, so every cell has to be written
+                    self._content = [[0x20] * self.lcd.cols for _ in range(self.lcd.rows)]
+                    self.restore_frame(frame)
+                    self.wait_for_writes()
+                except OSError:
+                    continue
+                if transport is not None and transport.faulted:
+                    continue
+
+                elapsed = perf_counter() - panel["fault_time"]
+                panel["health"]["recoveries"] += 1
+                panel["health"]["recovery_times"].append(elapsed)
+                panel["recovering"] = None
+            print(f"LCD at {self._address:#x} recovered after {elapsed * 1000:.0f}ms")
+            return
+
+    @property
+    def bus_health(self):
+        """Faults, recoveries and the latest recovery times (seconds) of the panel."""
+        health = dict(self._panel()["health"])
+        health["recovery_times"] = list(health["recovery_times"])
+        transport = self._panel().get("transport")
+        if transport is not None:
+            health.update(retries=transport.retries, dropped_bytes=transport.dropped)
+        return health
+
+    # RPLCD reads and assigns these two attributes internally
+    @property
+    def _content(self):
+        return self._panel()["content"]
+
+    @_content.setter
+    def _content(self, value):
+        self._panel()["content"] = value
+
+    @property
+    def _cursor_pos(self):
+        return self._panel()["cursor_pos"]
+
+    @_cursor_pos.setter
+    def _cursor_pos(self, value):
+        self._panel()["cursor_pos"] = value
+
+    @property
+    def frame(self):
+        """A copy of the characters on the panel as a list of rows of char codes."""
+        # An alert on screen is left out, see `preempt`
+        content = self._panel().get("covered", self._content)
+        return [list(row) for row in content]
+
+    @property
+    def chars(self):
+        """The custom characters in CGRAM, bitmaps (8 rows) keyed by slot."""
+        return dict(self._panel()["cgram"])
+
+    def restore_frame(self, frame):
+        """
+        Write a frame captured with `frame` back to the LCD display.
+
+        Only the cells which differ from what is on the panel are written.
+
+        Parameters
+            - frame (list):
+                rows of char codes, as returned by `frame`
+
+        Raises
+            - ValueError: if the frame doesn't match the size of the panel
+        """
+        if len(frame) != self.lcd.rows or any(len(row) != self.lcd.cols for row in frame):
+            raise ValueError(
+                f'The ``frame`` argument must be {self.lcd.rows} rows of {self.lcd.cols} chars')
+
+        with self.batch():
+            for row, codes in enumerate(frame):
+                self.cursor_pos = (row, 0)
+                for code in codes:
+                    self.write(code)
+
+    def wait_for_writes(self):
+        """Block until every write to the panel has reached the bus."""
+        transport = self._panel().get("transport")
+        if transport is not None:
+            transport.wait()
+
+    def write_string(self, value):
+        """
+        Write a string to the LCD display at the cursor position.
+
+        Strings without newlines are encoded through the shared encoding
+        cache. Strings with newlines are handed to RPLCD as is.
+        """
+        if '\n' in value or '\r' in value:
+            super().write_string(value)
+        else:
+            self.write_encoded(self.encoding_cache.encode(value))
+
+    def write_encoded(self, encoded):
+        """
+        Write already encoded bytes to the LCD display at the cursor position.
+
+        Parameters
+            - encoded (bytes): one byte per LCD cell
+        """
+        with self.batch():
+            for code in encoded:
+                self.write(code)
+
     def set_verbosity(self, verbosity):
         self.verbosity = verbosity
+
+    def release(self):
+        """
+        Stop any background work of the view.
+
+        Called by the view registry when a view has been idle for too long.
+        Views which start threads override this to stop them. The panel's
+        bus is shared with the other views and stays open.
+        """
+        pass
+
+    def reload(self, filename):
+        """
+        Apply a change to one of the files the view reads.
+
+        Called by the view registry when a file listed in the resources of
+        the view's spec changed on disk. Data files are read on every
+        redraw, so only views which keep values from a file (e.g. the
+        location from config.ini) override this.
+
+        Parameters
+            - filename (str): name of the changed file
+        """
+        pass
     
     def write_centered(self, line, msg):
         """
         Write a string to the center of a line on the LCD display.
 
-        This function expects an input string smaller than 16 characters. It
-        centers the string on the LCD display by subtracting the length of the
-        string from 16, and dividing the remaining cells by 2. This value is
-        the starting cell. If the string len is an odd number, it will be off
-        center by 1 cell.
+        This function expects an input string no longer than the width of the
+        display. It centers the string on the LCD display by subtracting the
+        length of the string from the width, and dividing the remaining cells
+        by 2. This value is the starting cell. If the string len is an odd
+        number, it will be off center by 1 cell.
 
         Parameters
             - line (int):
-                line to print to on LCD display (0 or 1)
+                line to print to on LCD display (0 to rows - 1)
                 Default: 0 (line 1)
             - msg (str):
                 the string to display
@@ -77,31 +585,30 @@ class LCD_Interface(CharLCD):
         Raises
             - ValueError: if the str is too long or the line num is incorrect
         """
-        if len(msg) <= 16:
-            # LCD is 16 cells long. To center a message, subtract message length from
-            # 16 and divide the remaining cells by 2 to get the starting position.
-            start_pos = (16 - len(msg)) / 2
+        cols = self.lcd.cols
+        if len(msg) <= cols:
+            # To center a message, subtract message length from the width
+            # and divide the remaining cells by 2 to get the starting position.
+            start_pos = (cols - len(msg)) / 2
             start_pos = int(start_pos)
         else:
             raise ValueError(
-                'The ``msg`` argument must be no longer than 16 characters')
+                f'The ``msg`` argument must be no longer than {cols} characters')
         
-        if line == 0:
-            self.cursor_pos = (0, start_pos)
-            self.write_string(msg)
-        elif line == 1:
-            self.cursor_pos = (1, start_pos)
-            self.write_string(msg)
+        if 0 <= line < self.lcd.rows:
+            with self.batch():
+                self.cursor_pos = (line, start_pos)
+                self.write_string(msg)
         else:
             raise ValueError(
-                'The ``line`` argument must be either ``0`` or ``1``')
+                f'The ``line`` argument must be between ``0`` and ``{self.lcd.rows - 1}``')
         
     def write_static_and_dynamic(self, bottom_line, top_line=None, cntr_static=0):
         """
         Write a static str to top line and scrolling text to bottom line.
 
-        This function expects an top line input string which is shorter than 16
-        characters. This top line will remain static. The bottom line is
+        This function expects an top line input string which is no longer than
+        the width of the display. This top line will remain static. The bottom line is
         capable of handling longer strings by scrolling the text on the bottom
         line.
 
@@ -120,7 +627,7 @@ class LCD_Interface(CharLCD):
                 'cntr_static' arg is not 0 or 1
         """
         # Handle top_line printing
-        if len(top_line) <= 16:
+        if len(top_line) <= self.lcd.cols:
             if (cntr_static==0):
                 self.write_string(top_line)
             elif (cntr_static==1):
@@ -131,38 +638,62 @@ class LCD_Interface(CharLCD):
             
         else:
             raise ValueError(
-                'The ``top_line`` arg must be no longer than 16 characters`')
+                f'The ``top_line`` arg must be no longer than {self.lcd.cols} characters`')
         
         # Handle bottom line scrolling
-        self.scroll_text(bottom_line, 1, 0.3)
+        self.scroll_text(bottom_line, self.lcd.rows - 1, 0.3)
 
 
-    def scroll_text(self, text, line, delay):
+    def scroll_text(self, text, line, delay, smooth=None):
         """
-        Scrolls the given text from left to right on the specified line of a 16x2 LCD display.
+        Scrolls the given text from left to right on the specified line of the LCD display.
+
+        In smooth mode the text moves one pixel column per step through a
+        window of custom characters in the middle of the line (at most 7
+        cells wide, see `SmoothScroller`). The text keeps the same speed,
+        `delay` is still the time it takes to move by one character.
 
         Parameters:
             - text (str): The text to be scrolled.
-            - line (int): The line number on which to scroll the text (0 for the first line, 1 for the second line).
+            - line (int): The line number on which to scroll the text (0 for the first line, 1 for the second line, ...).
             - delay (float): The delay in seconds between each step of scrolling.
+            - smooth (bool): Scroll pixel by pixel. Default: None (SMOOTH_SCROLL)
 
         Raises:
-            ValueError: If the line number is not 0 or 1.
+            ValueError: If the line number is not a line of the display.
         """
-        if line not in [0, 1]:
-            raise ValueError('Line number must be 0 or 1')
-        
-        text = ' ' * 16 + text + ' ' * 16  # Padding text with spaces
-        for i in range(len(text) - 15):
-            display_text = text[i:i + 16]
-            self.cursor_pos = (line, 0)
-            self.write_string(display_text)
+        cols = self.lcd.cols
+        if line not in range(self.lcd.rows):
+            raise ValueError(f'Line number must be between 0 and {self.lcd.rows - 1}')
+        if smooth is None:
+            smooth = self.SMOOTH_SCROLL
+
+        if smooth:
+            width = min(MAX_WIDTH, cols)
+            scroller = SmoothScroller(self.encoding_cache.encode(text), width,
+                                      custom={0: self.degree_symbol})
+            with self.batch():
+                self.cursor_pos = (line, 0)
+                self.write_encoded(b' ' * cols)
+            scroller.play(self, line, (cols - width) // 2, delay / CELL_PITCH)
+            return
+
+        text = ' ' * cols + text + ' ' * cols  # Padding text with spaces
+        # Encode the text once, every step writes a slice of it
+        encoded = self.encoding_cache.encode(text)
+        for i in range(len(encoded) - cols + 1):
+            with self.batch():
+                self.cursor_pos = (line, 0)
+                self.write_encoded(encoded[i:i + cols])
             sleep(delay)
 
     def save_data(self, data, filename):
         """
         Stores data to a json file.
 
+        The data is written to a temporary file which then replaces the
+        original, so readers never see a half written file.
+
         Parameters
             - data (json string):
                 the data to be stored in the json file
@@ -170,8 +701,11 @@ class LCD_Interface(CharLCD):
                 the file to store the json string to
         """
         file_path = self.data_directory / filename
-        with file_path.open('w') as f:
-            json.dump(data, f)
+        tmp_path = file_path.with_suffix(file_path.suffix + '.tmp')
+        content = json.dumps(data)
+        with tmp_path.open('w') as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
 
     def load_data(self, filename):
         """
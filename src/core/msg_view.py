@@ -1,32 +1,95 @@
+from datetime import datetime
+
 from src.core.lcd_interface import LCD_Interface
-from src.web_interface.web_interface import WebApp
-from time import sleep
 
 
 class Message(LCD_Interface):
     """
-    A class to display messages uploaded over a web page.
+    A class to display the messages uploaded over the web page.
+
+    The web interface served by the dashboard (see `DashboardServices`)
+    saves the last message of every burst of submissions to
+    message_data.json, with the time it was received. The view reads the
+    file on every redraw and is redrawn right away when it changes.
+
+    A message longer than the display is wide moves by one character on
+    every redraw instead of scrolling in one go, so the buttons keep
+    working while a long message is shown.
     """
-    def __init__(self, verbosity):
-        super().__init__(verbosity)
-        self.web_app = WebApp()
-        self.web_app.run()
+    # Space between the end of a scrolling message and its start
+    GAP = "   "
+
+    def __init__(self, verbosity, display=None):
+        super().__init__(verbosity, display)
+        self.message_filepath = self.data_directory / 'message_data.json'
+        self.scrolled = None
+        self.offset = 0
+
+    def get_message(self):
+        """
+        Gets the latest message from the message_data.json file.
+
+        Returns:
+            - str: the message, None if no message was received yet
+            - datetime: when it was received, None if no message was received yet
+        """
+        try:
+            data = self.load_data(self.message_filepath)
+        except FileNotFoundError:
+            return None, None
+        message = data.get("message") or None
+        received = data.get("received")
+        return message, datetime.fromisoformat(received) if received else None
+
+    def write_row(self, row, text):
+        """Write a whole row, padding it with spaces."""
+        with self.batch():
+            self.cursor_pos = (row, 0)
+            self.write_string(text[:self.lcd.cols].ljust(self.lcd.cols))
+
+    def write_row_centered(self, row, text):
+        """Write a whole row with the text centered."""
+        self.write_row(row, text[:self.lcd.cols].center(self.lcd.cols))
 
     def message_display(self):
         """
-        Grabs the message from the WebApp class and displays it on LCD.
+        Displays the latest message.
+
+        The message is shown on the bottom line, below a title on panels
+        with more than one line. A message which doesn't fit moves one
+        character to the left on every redraw.
         """
-        while True:
-            print("here")
-            self.message = self.web_app.message
+        message, _ = self.get_message()
+        rows, cols = self.lcd.rows, self.lcd.cols
+        line = rows - 1
+        if rows > 1:
+            self.write_row_centered(0, "Message" if message is not None else "")
+        for row in range(1, line):
+            self.write_row(row, "")
 
-            self.write_centered(0, self.message)
+        if message is None:
+            self.write_row_centered(line, "No messages")
+        elif len(message) <= cols:
+            self.write_row_centered(line, message)
+        else:
+            if message != self.scrolled:
+                self.scrolled = message
+                self.offset = 0
+            text = message + self.GAP
+            self.write_row(line, (text + text)[self.offset:self.offset + cols])
+            self.offset = (self.offset + 1) % len(text)
 
-            sleep(0.5)
+    def received_display(self):
+        """Displays when the latest message was received."""
+        message, received = self.get_message()
+        if received is None:
+            lines = ["No messages"]
+        else:
+            lines = ["Received", received.strftime("%b %d %I:%M %p")]
+        for row in range(self.lcd.rows):
+            self.write_row_centered(row, lines[row] if row < len(lines) else "")
 
 
 if __name__ == "__main__":
     msg_view = Message(1)
     msg_view.message_display()
-
-# TO-DO: Create seperate thread for hosting webpage!!!!!!
\ No newline at end of file
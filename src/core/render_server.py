@@ -0,0 +1,433 @@
+import argparse
+from collections import deque
+from functools import partial
+import json
+import os
+from pathlib import Path
+from queue import Queue
+import re
+import selectors
+import socket
+from threading import Lock, Thread
+from time import monotonic
+
+from src.core.display_config import DisplayConfig
+from src.core.frame_protocol import (MSG_BUTTON, MSG_ERROR, MSG_FRAME, MSG_HELLO,
+                                     MessageReader, encode_delta, pack, parse_address)
+from src.core.home_dashboard import HomeDashboard
+from src.core.lcd_interface import LCD_Interface
+from src.core.services import DashboardServices
+from src.core.view_registry import DEFAULT_VIEWS
+
+
+# Display names end up in file names (e.g. last_frame_NAME.json)
+NAME_PATTERN = re.compile(r"[\w-]{1,32}")
+
+
+class RemotePanel:
+    """
+    A display rendered by the server for its thin clients.
+
+    Parameters
+        - display (DisplayConfig): the simulated panel the views draw on
+        - dashboard (HomeDashboard): the dashboard driving it
+    """
+    def __init__(self, display, dashboard):
+        self.display = display
+        self.dashboard = dashboard
+        self.bus = dashboard.lcd_interface.bus
+        # The snapshot the connected clients show
+        self.sent = None
+        self.clients = []
+        self.last_flush = 0
+
+
+class Connection:
+    """A thin client connected to the server."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = MessageReader()
+        self.out = deque()
+        self.offset = 0
+        self.backlog = 0
+        self.panel = None
+        self.joining = False
+        self.closing = False
+
+
+class RenderServer:
+    """
+    A class to render many named displays for thin clients.
+
+    Each display runs a `HomeDashboard` on a simulated panel, exactly as it
+    would on a Pi. The simulated panels only note that they changed; one
+    thread sends the changes to the clients. At most every
+    `FRAME_INTERVAL` seconds the panel is compared with what its clients
+    were sent last and the changed cells and custom characters go out as a
+    single frame, encoded once for all clients of the display (see
+    `encode_delta`). A client gets a full frame when it connects, and
+    again instead of its queued frames when it falls `MAX_BACKLOG` bytes
+    behind.
+
+    The weather fetch, the file watcher and the alert presenter run once
+    for all displays (see `DashboardServices`), the dashboards only render
+    views. Displays are created when the first client says
+    hello, with the name, size and view the client sent. They keep rendering while no client is
+    connected, so a client coming back shows the current frame right away.
+    Button presses from the clients are handed to the dashboard of their
+    display, like the GPIO callback would on a Pi.
+
+    Every display costs a dashboard and a thread, so the server renders at
+    most `max_displays` of them and, given `allowed`, only the displays
+    named there. Hellos for any other display are refused.
+
+    Parameters
+        - address (str): HOST:PORT to listen on, or the path of a Unix socket
+        - max_displays (int):
+            displays rendered at most
+            Default: MAX_DISPLAYS
+        - allowed (set):
+            names of the displays clients may ask for
+            Default: None (any name)
+    """
+    # Minimum seconds between two frames of a display
+    FRAME_INTERVAL = 0.02
+
+    # Bytes queued for a client before its frames are replaced by a full frame
+    MAX_BACKLOG = 64 * 1024
+
+    # The displays are simulated panels on a bus of their own
+    VIRTUAL_PORT = -1
+
+    # Displays rendered at most unless configured otherwise
+    MAX_DISPLAYS = 64
+
+    def __init__(self, address, max_displays=MAX_DISPLAYS, allowed=None):
+        self.family, self.address = parse_address(address)
+        self.max_displays = max_displays
+        self.allowed = set(allowed) if allowed is not None else None
+        self.panels = {}
+        self.next_address = 1
+        self.selector = selectors.DefaultSelector()
+        self.lock = Lock()
+        self.dirty = set()
+        self.wake_pending = False
+        self.running = True
+        # Hellos and button presses, run in order on the jobs thread
+        self.jobs = Queue()
+        # Connections handed back by the jobs thread with their panel or error
+        self.joined = deque()
+
+        # The web interface stays with the dashboards on the Pis
+        self.services = DashboardServices(web=False)
+
+        self.frames = 0
+        self.bytes_sent = 0
+        self.resyncs = 0
+
+    def listen(self):
+        """
+        Open the listening socket.
+
+        Returns:
+            - tuple or str: the address the server listens on
+        """
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family != socket.AF_UNIX:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(self.address)
+        self.sock.listen(128)
+        self.sock.setblocking(False)
+        self.selector.register(self.sock, selectors.EVENT_READ, self.accept)
+
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, self.drain_wakeups)
+
+        Thread(target=self.run_jobs, name="render-jobs", daemon=True).start()
+        self.services.start()
+        return self.sock.getsockname()
+
+    def wake(self):
+        """Wake the server thread up, from any thread."""
+        with self.lock:
+            if self.wake_pending:
+                return
+            self.wake_pending = True
+        try:
+            self.wake_writer.send(b"\0")
+        except OSError:
+            # Full (a wakeup is pending anyway) or closed by `close`
+            pass
+
+    def drain_wakeups(self, mask):
+        with self.lock:
+            self.wake_pending = False
+        try:
+            while self.wake_reader.recv(512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def panel_changed(self, panel):
+        """Note a change of a panel (called on the bus worker thread)."""
+        with self.lock:
+            self.dirty.add(panel)
+        self.wake()
+
+    def serve_forever(self):
+        """Send frames and handle the clients until `shutdown` is called."""
+        while self.running:
+            timeout = self.send_frames()
+            for key, mask in self.selector.select(timeout):
+                key.data(mask)
+        self.close()
+
+    def shutdown(self):
+        """Stop `serve_forever` (from any thread)."""
+        self.running = False
+        self.wake()
+
+    def close(self):
+        for panel in self.panels.values():
+            panel.bus.on_change = None
+            for conn in list(panel.clients):
+                self.disconnect(conn)
+            panel.dashboard.refresh_LCD = None
+            panel.dashboard.view_changed.set()
+        self.services.stop()
+        self.jobs.put(None)
+        self.selector.close()
+        self.sock.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def send_frames(self):
+        """
+        Send the frames of changed displays and attach joining clients.
+
+        Returns:
+            - float: seconds until the next frame is due, None if none is
+        """
+        now = monotonic()
+        with self.lock:
+            dirty = list(self.dirty)
+        next_due = None
+        for panel in dirty:
+            due = panel.last_flush + self.FRAME_INTERVAL
+            if due <= now:
+                with self.lock:
+                    self.dirty.discard(panel)
+                self.flush(panel, now)
+            elif next_due is None or due < next_due:
+                next_due = due
+
+        while self.joined:
+            conn, panel, error = self.joined.popleft()
+            conn.joining = False
+            if error is not None:
+                conn.closing = True
+                self.send(conn, pack(MSG_ERROR, error.encode()[:256]))
+            elif conn.sock.fileno() != -1:
+                self.attach(conn, panel)
+        return None if next_due is None else max(next_due - now, 0)
+
+    def flush(self, panel, now=None):
+        """Send the changes of a display since its last frame to its clients."""
+        snapshot = panel.bus.snapshot()
+        payload = encode_delta(panel.sent, snapshot)
+        panel.sent = snapshot
+        panel.last_flush = now if now is not None else monotonic()
+        if not payload:
+            return
+        message = pack(MSG_FRAME, payload)
+        self.frames += 1
+        for conn in list(panel.clients):
+            self.send(conn, message)
+
+    def attach(self, conn, panel):
+        """Start streaming a display to a client, beginning with a full frame."""
+        self.flush(panel)
+        conn.panel = panel
+        panel.clients.append(conn)
+        self.send(conn, pack(MSG_FRAME, encode_delta(None, panel.sent)))
+
+    def accept(self, mask):
+        try:
+            sock, _ = self.sock.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        if self.family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = Connection(sock)
+        self.selector.register(sock, selectors.EVENT_READ, partial(self.service, conn))
+
+    def service(self, conn, mask):
+        if mask & selectors.EVENT_WRITE:
+            self.write(conn)
+        if mask & selectors.EVENT_READ and conn.sock.fileno() != -1:
+            self.read(conn)
+
+    def read(self, conn):
+        try:
+            data = conn.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.disconnect(conn)
+            return
+        try:
+            messages = conn.reader.feed(data)
+        except ValueError:
+            self.disconnect(conn)
+            return
+
+        for kind, payload in messages:
+            if kind == MSG_HELLO and conn.panel is None and not conn.joining:
+                conn.joining = True
+                self.jobs.put(partial(self.join, conn, payload))
+            elif kind == MSG_BUTTON and conn.panel is not None and len(payload) == 1:
+                if payload[0] in HomeDashboard.INP_PIN_MAP.values():
+                    self.jobs.put(partial(conn.panel.dashboard.button_pressed_callback, payload[0]))
+
+    def send(self, conn, message):
+        """Queue a message for a client and send what the socket takes."""
+        if conn.backlog + len(message) > self.MAX_BACKLOG and conn.panel is not None:
+            # The client can't keep up: skip to the current frame
+            head = conn.out[0] if conn.offset else None
+            conn.out.clear()
+            conn.backlog = 0
+            if head is not None:
+                conn.out.append(head)
+                conn.backlog = len(head) - conn.offset
+            message = pack(MSG_FRAME, encode_delta(None, conn.panel.sent))
+            self.resyncs += 1
+        conn.out.append(message)
+        conn.backlog += len(message)
+        self.write(conn)
+
+    def write(self, conn):
+        while conn.out:
+            head = conn.out[0]
+            try:
+                sent = conn.sock.send(memoryview(head)[conn.offset:])
+            except BlockingIOError:
+                self.selector.modify(conn.sock, selectors.EVENT_READ | selectors.EVENT_WRITE,
+                                     partial(self.service, conn))
+                return
+            except OSError:
+                self.disconnect(conn)
+                return
+            self.bytes_sent += sent
+            conn.backlog -= sent
+            conn.offset += sent
+            if conn.offset == len(head):
+                conn.out.popleft()
+                conn.offset = 0
+
+        if conn.closing:
+            self.disconnect(conn)
+            return
+        self.selector.modify(conn.sock, selectors.EVENT_READ, partial(self.service, conn))
+
+    def disconnect(self, conn):
+        if conn.sock.fileno() == -1:
+            return
+        self.selector.unregister(conn.sock)
+        conn.sock.close()
+        if conn.panel is not None:
+            conn.panel.clients.remove(conn)
+
+    def run_jobs(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                job()
+            except OSError as e:
+                print(f"Render job failed: {e}")
+
+    def join(self, conn, payload):
+        """Find or create the display a client said hello for (on the jobs thread)."""
+        try:
+            panel, error = self.panel(json.loads(payload)), None
+        except (ValueError, KeyError, TypeError) as e:
+            panel, error = None, str(e)
+        self.joined.append((conn, panel, error))
+        self.wake()
+
+    def panel(self, hello):
+        """
+        Return the display named in a client's hello, creating it if needed.
+
+        Raises
+            - ValueError: if the hello doesn't describe a valid display
+        """
+        name = hello["name"]
+        if not isinstance(name, str) or not NAME_PATTERN.fullmatch(name):
+            raise ValueError(f"Invalid display name {name!r}")
+        rows, cols, view = int(hello["rows"]), int(hello["cols"]), hello.get("view")
+
+        panel = self.panels.get(name)
+        if panel is not None:
+            if (panel.display.rows, panel.display.cols) != (rows, cols):
+                raise ValueError(f"Display {name} is {panel.display.cols}x{panel.display.rows} "
+                                 f"on the server")
+            return panel
+
+        if self.allowed is not None and name not in self.allowed:
+            raise ValueError(f"Display {name} isn't rendered by this server")
+        if len(self.panels) >= self.max_displays:
+            raise ValueError(f"The server renders at most {self.max_displays} displays")
+        if view is not None and view not in (spec.name for spec in DEFAULT_VIEWS):
+            raise ValueError(f"No view named '{view}'")
+        display = DisplayConfig(name=name, port=self.VIRTUAL_PORT, address=self.next_address,
+                                cols=cols, rows=rows, view=view, simulated=True)
+        self.next_address += 1
+        dashboard = HomeDashboard(display=display, buttons=False, services=self.services)
+        panel = RemotePanel(display, dashboard)
+        panel.bus.on_change = partial(self.panel_changed, panel)
+        self.panels[name] = panel
+        Thread(target=dashboard.cycle_views, name=f"panel-{name}", daemon=True).start()
+        print(f"rendering display {name} ({cols}x{rows})")
+        return panel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the dashboard for thin display clients")
+    parser.add_argument("--listen", default="0.0.0.0:7070",
+                        help="HOST:PORT or the path of a Unix socket (default: %(default)s)")
+    parser.add_argument("--data-directory", help="where the views keep their json files "
+                                                 "(default: src/data)")
+    parser.add_argument("--weather-url", help="forecast API the weather is fetched from")
+    parser.add_argument("--max-displays", type=int, default=RenderServer.MAX_DISPLAYS,
+                        help="displays rendered at most (default: %(default)s)")
+    parser.add_argument("--display", action="append", dest="displays", metavar="NAME",
+                        help="only render the displays with these names (repeat for each)")
+    args = parser.parse_args()
+
+    if args.data_directory:
+        LCD_Interface.DATA_DIRECTORY = Path(args.data_directory)
+    if args.weather_url:
+        from src.core.weather_fetcher import WeatherFetcher
+        WeatherFetcher.WEATHER_URL = args.weather_url
+
+    server = RenderServer(args.listen, args.max_displays, args.displays)
+    print(f"listening on {server.listen()}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExiting...")
+        server.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import configparser
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+from threading import Thread
+
+from src.core.alerts import AlertChannel, AlertPresenter, weather_alert
+from src.core.file_watcher import FileWatcher
+from src.core.lcd_interface import LCD_Interface
+from src.core.weather_fetcher import WeatherFetcher
+
+
+class DashboardServices:
+    """
+    The background work shared by every panel of a process.
+
+    The weather is fetched for as long as the process runs, whether or not
+    a weather view is loaded, and a thunderstorm in new weather data is
+    posted as an alert. One watcher applies edits to config.ini and the
+    data files to every dashboard, and one presenter shows the alerts on
+    every panel. The dashboards themselves only render views. With `web`
+    the message board web interface is served from the same process:
+    messages are saved to message_data.json for the message board view and
+    urgent messages reach the panels as alerts.
+
+    Parameters
+        - data_directory (Path):
+            where the views keep their json files
+            Default: None (LCD_Interface.DATA_DIRECTORY)
+        - fetch_weather (bool):
+            whether to fetch the weather
+            Default: True
+        - web (bool):
+            whether to serve the web interface (host and port from the
+            [web] section of config.ini)
+            Default: True
+    """
+    # Where the web interface listens unless config.ini says otherwise
+    WEB_HOST = "0.0.0.0"
+    WEB_PORT = 5000
+
+    def __init__(self, data_directory=None, fetch_weather=True, web=True):
+        self.data_directory = Path(data_directory or LCD_Interface.DATA_DIRECTORY)
+        self.config_path = Path(__file__).parent / 'config.ini'
+        self.dashboards = []
+        self.weather = None
+        if fetch_weather:
+            self.weather = WeatherFetcher(self.data_directory, self.config_path)
+        self.web = web
+        self.web_app = None
+
+        # Urgent alerts interrupt whatever view is on screen
+        self.alerts = AlertPresenter()
+
+        # Apply edits to config.ini and the data files while running
+        self.watcher = FileWatcher([self.config_path.parent, self.data_directory],
+                                   self.files_changed)
+
+    def add(self, dashboard):
+        """Apply changed files and show alerts on a dashboard as well."""
+        self.dashboards.append(dashboard)
+        self.alerts.add_panel(dashboard.lcd_interface)
+
+    def start(self):
+        """Start watching, fetching and serving in daemon threads."""
+        self.watcher.start()
+        if self.weather is not None:
+            self.weather.start()
+        if self.web:
+            Thread(target=self.serve_web, name="web", daemon=True).start()
+
+    def stop(self):
+        """Stop watching and fetching."""
+        self.watcher.stop()
+        if self.weather is not None:
+            self.weather.stop()
+
+    def files_changed(self, filenames):
+        """
+        Apply changed config and data files (called by the watcher).
+
+        Parameters
+            - filenames (set): names of the changed files
+        """
+        if self.weather is not None:
+            self.weather.reload(filenames)
+        if 'weather_data.json' in filenames:
+            self.check_weather()
+        for dashboard in list(self.dashboards):
+            dashboard.files_changed(filenames)
+
+    def check_weather(self):
+        """Post an alert if the latest weather data has a thunderstorm."""
+        try:
+            alert = weather_alert(self.load_data('weather_data.json'),
+                                  self.load_data('wmo_code.json'))
+        except (OSError, ValueError) as e:
+            print(f"Could not check the weather for alerts: {e}")
+            return
+        if alert is not None:
+            AlertChannel.default().post(alert)
+
+    def load_data(self, filename):
+        with (self.data_directory / filename).open() as f:
+            return json.load(f)
+
+    def save_message(self, message):
+        """Save a message from the web interface for the message board view."""
+        file_path = self.data_directory / 'message_data.json'
+        tmp_path = file_path.with_suffix('.json.tmp')
+        try:
+            tmp_path.write_text(json.dumps({"message": message,
+                                            "received": datetime.now().isoformat()}))
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            print(f"Could not save the message: {e}")
+
+    def serve_web(self):
+        """Serve the message board web interface until the process exits."""
+        config = configparser.ConfigParser()
+        config.read(self.config_path)
+        try:
+            host = config.get('web', 'host', fallback=self.WEB_HOST)
+            port = config.getint('web', 'port', fallback=self.WEB_PORT)
+            # Flask is slow to import, so it's imported on this thread
+            from src.web_interface.web_interface import WebApp
+            self.web_app = WebApp(on_message=self.save_message)
+            self.web_app.run(production=True, host=host, port=port)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Could not serve the web interface: {e}")
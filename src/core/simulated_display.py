@@ -0,0 +1,151 @@
+from threading import Lock
+
+from src.core.i2c_transport import PCF8574_E, RS_DATA
+
+
+class SimulatedBus:
+    """
+    An I2C bus with a simulated HD44780 panel behind a PCF8574 backpack.
+
+    Takes the place of the SMBus of a panel configured with
+    `simulated = yes`, so the dashboard runs without hardware (e.g. for
+    soak tests on a development machine). Every byte is decoded like the
+    real controller does: a nibble is latched on the falling edge of E and
+    two nibbles make an instruction or a data byte. DDRAM and CGRAM are
+    kept, so `text` shows what a real panel would.
+
+    `on_change` is called after every transfer which changed DDRAM or
+    CGRAM (e.g. to stream the panel to a remote display, see
+    `RenderServer`). It runs on the thread doing the transfer, so it
+    should only note the change.
+
+    Parameters
+        - rows (int): rows of the panel
+        - cols (int): columns of the panel
+        - on_change (callable):
+            called without arguments when the panel contents changed
+            Default: None
+    """
+    def __init__(self, rows, cols, on_change=None):
+        self.rows = rows
+        self.cols = cols
+        self.lock = Lock()
+        self.ddram = bytearray(b' ' * 128)
+        self.cgram = bytearray(64)
+        self.address = 0
+        self.in_cgram = False
+        self.last = 0
+        self.high_nibble = None
+        self.on_change = on_change
+        self.changed = False
+
+        self.bytes_written = 0
+        self.instructions = 0
+        self.data_writes = 0
+
+    # The SMBus methods used by RPLCD and BatchedTransport
+
+    def write_byte(self, address, value):
+        with self.lock:
+            self.latch(value)
+        self.notify()
+
+    def write_byte_data(self, address, register, value):
+        with self.lock:
+            self.latch(register)
+            self.latch(value)
+        self.notify()
+
+    def write_i2c_block_data(self, address, register, data):
+        with self.lock:
+            self.latch(register)
+            for value in data:
+                self.latch(value)
+        self.notify()
+
+    def i2c_rdwr(self, *messages):
+        with self.lock:
+            for message in messages:
+                for value in message:
+                    self.latch(value)
+        self.notify()
+
+    def close(self):
+        pass
+
+    def notify(self):
+        """Call `on_change` if the last transfer changed the panel contents."""
+        with self.lock:
+            changed, self.changed = self.changed, False
+        if changed and self.on_change is not None:
+            self.on_change()
+
+    def latch(self, value):
+        """Apply one byte put on the PCF8574 pins."""
+        self.bytes_written += 1
+        falling_edge = self.last & PCF8574_E and not value & PCF8574_E
+        if falling_edge:
+            nibble = self.last & 0xF0
+            if self.high_nibble is None:
+                self.high_nibble = nibble
+            else:
+                byte = self.high_nibble | nibble >> 4
+                self.high_nibble = None
+                if self.last & RS_DATA:
+                    self.data(byte)
+                else:
+                    self.instruction(byte)
+        self.last = value
+
+    def instruction(self, value):
+        self.instructions += 1
+        if value & 0x80:
+            self.address = value & 0x7F
+            self.in_cgram = False
+        elif value & 0x40:
+            self.address = value & 0x3F
+            self.in_cgram = True
+        elif value == 0x01:
+            self.ddram[:] = b' ' * 128
+            self.address = 0
+            self.in_cgram = False
+            self.changed = True
+        elif value in (0x02, 0x03):
+            self.address = 0
+            self.in_cgram = False
+
+    def data(self, value):
+        self.data_writes += 1
+        if self.in_cgram:
+            self.cgram[self.address] = value & 0x1F
+            self.address = (self.address + 1) % 64
+        else:
+            self.ddram[self.address] = value
+            self.address = (self.address + 1) % 128
+        self.changed = True
+
+    def text(self):
+        """
+        Return the rows shown on the panel as char codes.
+
+        Returns:
+            - list: one bytes object per row
+        """
+        with self.lock:
+            return self.rows_locked()
+
+    def snapshot(self):
+        """
+        Return the rows and the CGRAM of the panel, read at the same time.
+
+        Returns:
+            - list: one bytes object per row
+            - bytes: the 8 custom characters, 8 rows each
+        """
+        with self.lock:
+            return self.rows_locked(), bytes(self.cgram)
+
+    def rows_locked(self):
+        offsets = [0x00, 0x40, self.cols, 0x40 + self.cols]
+        return [bytes(self.ddram[offsets[row]:offsets[row] + self.cols])
+                for row in range(self.rows)]
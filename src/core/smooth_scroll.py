@@ -0,0 +1,255 @@
+from time import sleep
+
+from src.core.i2c_transport import bus_clock
+
+
+# 5x7 glyphs of the printable ASCII characters, as five columns of pixels
+# (bit 0 is the top row). Close to the A00 character ROM of the HD44780.
+FONT_5X8 = {
+    ' ': (0x00, 0x00, 0x00, 0x00, 0x00),
+    '!': (0x00, 0x00, 0x5F, 0x00, 0x00),
+    '"': (0x00, 0x07, 0x00, 0x07, 0x00),
+    '#': (0x14, 0x7F, 0x14, 0x7F, 0x14),
+    '$': (0x24, 0x2A, 0x7F, 0x2A, 0x12),
+    '%': (0x23, 0x13, 0x08, 0x64, 0x62),
+    '&': (0x36, 0x49, 0x55, 0x22, 0x50),
+    "'": (0x00, 0x05, 0x03, 0x00, 0x00),
+    '(': (0x00, 0x1C, 0x22, 0x41, 0x00),
+    ')': (0x00, 0x41, 0x22, 0x1C, 0x00),
+    '*': (0x14, 0x08, 0x3E, 0x08, 0x14),
+    '+': (0x08, 0x08, 0x3E, 0x08, 0x08),
+    ',': (0x00, 0x50, 0x30, 0x00, 0x00),
+    '-': (0x08, 0x08, 0x08, 0x08, 0x08),
+    '.': (0x00, 0x60, 0x60, 0x00, 0x00),
+    '/': (0x20, 0x10, 0x08, 0x04, 0x02),
+    '0': (0x3E, 0x51, 0x49, 0x45, 0x3E),
+    '1': (0x00, 0x42, 0x7F, 0x40, 0x00),
+    '2': (0x42, 0x61, 0x51, 0x49, 0x46),
+    '3': (0x21, 0x41, 0x45, 0x4B, 0x31),
+    '4': (0x18, 0x14, 0x12, 0x7F, 0x10),
+    '5': (0x27, 0x45, 0x45, 0x45, 0x39),
+    '6': (0x3C, 0x4A, 0x49, 0x49, 0x30),
+    '7': (0x01, 0x71, 0x09, 0x05, 0x03),
+    '8': (0x36, 0x49, 0x49, 0x49, 0x36),
+    '9': (0x06, 0x49, 0x49, 0x29, 0x1E),
+    ':': (0x00, 0x36, 0x36, 0x00, 0x00),
+    ';': (0x00, 0x56, 0x36, 0x00, 0x00),
+    '<': (0x08, 0x14, 0x22, 0x41, 0x00),
+    '=': (0x14, 0x14, 0x14, 0x14, 0x14),
+    '>': (0x00, 0x41, 0x22, 0x14, 0x08),
+    '?': (0x02, 0x01, 0x51, 0x09, 0x06),
+    '@': (0x32, 0x49, 0x79, 0x41, 0x3E),
+    'A': (0x7E, 0x11, 0x11, 0x11, 0x7E),
+    'B': (0x7F, 0x49, 0x49, 0x49, 0x36),
+    'C': (0x3E, 0x41, 0x41, 0x41, 0x22),
+    'D': (0x7F, 0x41, 0x41, 0x22, 0x1C),
+    'E': (0x7F, 0x49, 0x49, 0x49, 0x41),
+    'F': (0x7F, 0x09, 0x09, 0x09, 0x01),
+    'G': (0x3E, 0x41, 0x49, 0x49, 0x7A),
+    'H': (0x7F, 0x08, 0x08, 0x08, 0x7F),
+    'I': (0x00, 0x41, 0x7F, 0x41, 0x00),
+    'J': (0x20, 0x40, 0x41, 0x3F, 0x01),
+    'K': (0x7F, 0x08, 0x14, 0x22, 0x41),
+    'L': (0x7F, 0x40, 0x40, 0x40, 0x40),
+    'M': (0x7F, 0x02, 0x0C, 0x02, 0x7F),
+    'N': (0x7F, 0x04, 0x08, 0x10, 0x7F),
+    'O': (0x3E, 0x41, 0x41, 0x41, 0x3E),
+    'P': (0x7F, 0x09, 0x09, 0x09, 0x06),
+    'Q': (0x3E, 0x41, 0x51, 0x21, 0x5E),
+    'R': (0x7F, 0x09, 0x19, 0x29, 0x46),
+    'S': (0x46, 0x49, 0x49, 0x49, 0x31),
+    'T': (0x01, 0x01, 0x7F, 0x01, 0x01),
+    'U': (0x3F, 0x40, 0x40, 0x40, 0x3F),
+    'V': (0x1F, 0x20, 0x40, 0x20, 0x1F),
+    'W': (0x3F, 0x40, 0x38, 0x40, 0x3F),
+    'X': (0x63, 0x14, 0x08, 0x14, 0x63),
+    'Y': (0x07, 0x08, 0x70, 0x08, 0x07),
+    'Z': (0x61, 0x51, 0x49, 0x45, 0x43),
+    '[': (0x00, 0x7F, 0x41, 0x41, 0x00),
+    '\\': (0x02, 0x04, 0x08, 0x10, 0x20),
+    ']': (0x00, 0x41, 0x41, 0x7F, 0x00),
+    '^': (0x04, 0x02, 0x01, 0x02, 0x04),
+    '_': (0x40, 0x40, 0x40, 0x40, 0x40),
+    '`': (0x00, 0x01, 0x02, 0x04, 0x00),
+    'a': (0x20, 0x54, 0x54, 0x54, 0x78),
+    'b': (0x7F, 0x48, 0x44, 0x44, 0x38),
+    'c': (0x38, 0x44, 0x44, 0x44, 0x20),
+    'd': (0x38, 0x44, 0x44, 0x48, 0x7F),
+    'e': (0x38, 0x54, 0x54, 0x54, 0x18),
+    'f': (0x08, 0x7E, 0x09, 0x01, 0x02),
+    'g': (0x0C, 0x52, 0x52, 0x52, 0x3E),
+    'h': (0x7F, 0x08, 0x04, 0x04, 0x78),
+    'i': (0x00, 0x44, 0x7D, 0x40, 0x00),
+    'j': (0x20, 0x40, 0x44, 0x3D, 0x00),
+    'k': (0x7F, 0x10, 0x28, 0x44, 0x00),
+    'l': (0x00, 0x41, 0x7F, 0x40, 0x00),
+    'm': (0x7C, 0x04, 0x18, 0x04, 0x78),
+    'n': (0x7C, 0x08, 0x04, 0x04, 0x78),
+    'o': (0x38, 0x44, 0x44, 0x44, 0x38),
+    'p': (0x7C, 0x14, 0x14, 0x14, 0x08),
+    'q': (0x08, 0x14, 0x14, 0x18, 0x7C),
+    'r': (0x7C, 0x08, 0x04, 0x04, 0x08),
+    's': (0x48, 0x54, 0x54, 0x54, 0x20),
+    't': (0x04, 0x3F, 0x44, 0x40, 0x20),
+    'u': (0x3C, 0x40, 0x40, 0x20, 0x7C),
+    'v': (0x1C, 0x20, 0x40, 0x20, 0x1C),
+    'w': (0x3C, 0x40, 0x30, 0x40, 0x3C),
+    'x': (0x44, 0x28, 0x10, 0x28, 0x44),
+    'y': (0x0C, 0x50, 0x50, 0x50, 0x3C),
+    'z': (0x44, 0x64, 0x54, 0x4C, 0x44),
+    '{': (0x00, 0x08, 0x36, 0x41, 0x00),
+    '|': (0x00, 0x00, 0x7F, 0x00, 0x00),
+    '}': (0x00, 0x41, 0x36, 0x08, 0x00),
+    '~': (0x10, 0x08, 0x08, 0x10, 0x08),
+}
+
+# Drawn for characters without a glyph in FONT_5X8
+UNKNOWN_GLYPH = (0x7F, 0x41, 0x41, 0x41, 0x7F)
+
+# Horizontal pitch of a cell: 5 pixel columns plus the gap between cells
+CELL_PITCH = 6
+
+# CGRAM slot 0 holds the degree symbol, the tiles use the other seven
+FIRST_SLOT = 1
+MAX_WIDTH = 7
+
+# PCF8574 bytes per HD44780 write and bits per byte on the bus (incl. ACK)
+WIRE_BYTES_PER_WRITE = 6
+BITS_PER_BYTE = 9
+
+
+def glyph_columns(code, custom=None):
+    """
+    Return the five pixel columns of a character code.
+
+    Parameters
+        - code (int): the character code, as encoded for the LCD
+        - custom (dict):
+            bitmaps (8 rows) of custom characters, keyed by CGRAM slot
+            Default: None
+
+    Returns:
+        - tuple: five ints, bit 0 is the top row
+    """
+    if custom and code in custom:
+        rows = custom[code]
+        return tuple(sum(((row >> (4 - col)) & 1) << r for r, row in enumerate(rows))
+                     for col in range(5))
+    return FONT_5X8.get(chr(code), UNKNOWN_GLYPH)
+
+
+def tile_bitmap(columns):
+    """Turn five pixel columns into the eight rows `create_char` expects."""
+    return tuple(sum(((column >> row) & 1) << (4 - col) for col, column in enumerate(columns))
+                 for row in range(8))
+
+
+class SmoothScroller:
+    """
+    A class to scroll text through a window one pixel column per step.
+
+    The HD44780 can only show whole characters, but the characters in
+    CGRAM can be changed at any time and the panel redraws them right away.
+    The window is filled with custom characters once; every step then
+    only re-uploads the CGRAM tiles whose pixels changed.
+
+    There are only 8 CGRAM slots and slot 0 holds the degree symbol, so a
+    window is at most 7 cells wide. All tiles of a message are computed up
+    front, so a step only compares and sends bitmaps.
+
+    Parameters
+        - encoded (bytes): the text, encoded for the LCD
+        - width (int):
+            cells in the window
+            Default: 7
+        - custom (dict):
+            bitmaps of custom characters used in the text, keyed by slot
+            Default: None
+
+    Raises
+        - ValueError: if the window is wider than the free CGRAM slots
+    """
+    def __init__(self, encoded, width=MAX_WIDTH, custom=None):
+        if not 1 <= width <= MAX_WIDTH:
+            raise ValueError(f'The ``width`` argument must be between 1 and {MAX_WIDTH}')
+        self.width = width
+
+        # One blank window in front of and behind the text, so the text
+        # scrolls in from the right edge and all the way out on the left
+        blank = [0] * (width * CELL_PITCH)
+        strip = list(blank)
+        for code in encoded:
+            strip.extend(glyph_columns(code, custom))
+            strip.append(0)
+        strip.extend(blank)
+
+        # The gap between two cells hides the sixth column of every pitch
+        self.frames = []
+        for step in range(len(strip) - width * CELL_PITCH + 1):
+            self.frames.append(tuple(
+                tile_bitmap(strip[step + cell * CELL_PITCH:step + cell * CELL_PITCH + 5])
+                for cell in range(width)))
+
+    def changed_runs(self, frame, loaded):
+        """
+        Return (start, end) of every run of tiles which differ from `loaded`.
+
+        Consecutive slots are uploaded with a single CGRAM address
+        instruction, since the address increments after every row.
+        """
+        runs = []
+        cell = 0
+        while cell < self.width:
+            if frame[cell] == loaded[cell]:
+                cell += 1
+                continue
+            start = cell
+            while cell < self.width and frame[cell] != loaded[cell]:
+                cell += 1
+            runs.append((start, cell))
+        return runs
+
+    def min_step_delay(self, bus_hz):
+        """
+        Return how long the bus needs for a step which changes every tile.
+
+        Parameters
+            - bus_hz (int): clock of the I2C bus
+        """
+        writes = 2 + 8 * self.width  # CGRAM address, tile rows, cursor
+        return writes * WIRE_BYTES_PER_WRITE * BITS_PER_BYTE / bus_hz
+
+    def play(self, lcd, row, col, step_delay):
+        """
+        Scroll the text through the window at (row, col).
+
+        Parameters
+            - lcd (LCD_Interface): the display to draw on
+            - row (int): row of the window
+            - col (int): first column of the window
+            - step_delay (float):
+                seconds per pixel step, raised to what the I2C bus can keep up with
+
+        Returns:
+            - int: bytes of CGRAM data sent
+        """
+        step_delay = max(step_delay, self.min_step_delay(bus_clock(lcd._port) or 100000))
+        loaded = [None] * self.width
+        sent = 0
+        for i, frame in enumerate(self.frames):
+            with lcd.batch():
+                for start, end in self.changed_runs(frame, loaded):
+                    lcd.upload_chars(FIRST_SLOT + start, frame[start:end])
+                    loaded[start:end] = frame[start:end]
+                    sent += 8 * (end - start)
+                if i == 0:
+                    # Point the window at the tiles once they hold the first frame
+                    lcd.cursor_pos = (row, col)
+                    lcd.write_encoded(bytes(range(FIRST_SLOT, FIRST_SLOT + self.width)))
+            sleep(step_delay)
+
+        # The slots are reused by the next window, don't leave them on screen
+        with lcd.batch():
+            lcd.cursor_pos = (row, col)
+            lcd.write_encoded(b' ' * self.width)
+        return sent
@@ -0,0 +1,284 @@
+import argparse
+from contextlib import ExitStack, contextmanager
+import http.client
+import json
+import os
+from pathlib import Path
+import random
+import shutil
+import tempfile
+from threading import Thread, active_count
+from time import monotonic, sleep
+import tracemalloc
+from urllib.parse import urlencode
+
+from src.core.display_config import DisplayConfig
+from src.core.home_dashboard import HomeDashboard
+from src.core.lcd_interface import LCD_Interface
+from src.core.services import DashboardServices
+from src.core.stub_weather import StubWeatherHandler, start_stub_weather
+from src.core.view_registry import scaled_spec
+from src.core.weather_fetcher import WeatherFetcher
+
+
+# Limits a soak run has to stay within
+DEFAULT_BUDGETS = {
+    "rss_growth_mb": 8.0,
+    "traced_growth_mb": 2.0,
+    "max_threads": 32,
+    "fd_growth": 8,
+    "wakeups_per_minute": 600,
+}
+
+
+def read_proc_status(path="/proc/self/status"):
+    status = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.split()[0] if value.split() else ""
+    return status
+
+
+def context_switches():
+    """Return the voluntary context switches of all threads, i.e. the times they slept and woke."""
+    total = 0
+    for task in os.listdir("/proc/self/task"):
+        try:
+            total += int(read_proc_status(f"/proc/self/task/{task}/status")["voluntary_ctxt_switches"])
+        except (OSError, KeyError, ValueError):
+            pass
+    return total
+
+
+def sample():
+    """Take one sample of the resources used by the process."""
+    return {
+        "time": monotonic(),
+        "rss_mb": int(read_proc_status()["VmRSS"]) / 1024,
+        "traced_mb": tracemalloc.get_traced_memory()[0] / 2**20,
+        "threads": active_count(),
+        "fds": len(os.listdir("/proc/self/fd")),
+        "switches": context_switches(),
+    }
+
+
+@contextmanager
+def overridden(cls, **values):
+    """Set class attributes for the duration of the block, then put the old values back."""
+    saved = {name: getattr(cls, name) for name in values}
+    for name, value in values.items():
+        setattr(cls, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(cls, name, value)
+
+
+class Soak:
+    """
+    A class to run the dashboard for a long time and watch its resources.
+
+    The dashboard drives a simulated panel and fetches its weather from a
+    local stub server. The web interface runs in production mode and gets
+    a message now and then. Time runs `speed` times faster: view
+    refreshes, idle timeouts, weather fetches, state saves, the simulated
+    button presses and messages all happen that much more often. Data files are copied to a
+    temporary directory so src/data is left alone. The class settings
+    changed for the soak are put back once it ends.
+
+    The process is sampled every `sample_interval` seconds. Growth is
+    measured from the first sample after the warm up, so imports and
+    caches filling up don't count as leaks. Wakeups are the voluntary
+    context switches of all threads, per simulated minute.
+
+    Parameters
+        - duration (float): seconds to run
+        - speed (float): how much faster time runs
+        - sample_interval (float): seconds between samples
+        - warmup (float): seconds before the baseline sample
+        - budgets (dict): limits, see DEFAULT_BUDGETS
+    """
+    def __init__(self, duration, speed, sample_interval, warmup, budgets):
+        self.duration = duration
+        self.speed = speed
+        self.sample_interval = sample_interval
+        self.warmup = warmup
+        self.budgets = budgets
+        self.samples = []
+        # Restores the overridden class settings, see `setup`
+        self.overrides = ExitStack()
+
+    def setup(self):
+        self.data_directory = Path(tempfile.mkdtemp(prefix="dashboard-soak-"))
+        for name in ("dinner_data.json", "wmo_code.json"):
+            source = LCD_Interface.DATA_DIRECTORY / name
+            if source.exists():
+                shutil.copy(source, self.data_directory / name)
+        self.overrides.enter_context(
+            overridden(LCD_Interface, DATA_DIRECTORY=self.data_directory))
+
+        self.weather_server = start_stub_weather()
+        self.overrides.enter_context(overridden(
+            WeatherFetcher,
+            WEATHER_URL=f"http://127.0.0.1:{self.weather_server.server_port}/v1/forecast",
+            FETCH_INTERVAL=WeatherFetcher.FETCH_INTERVAL / self.speed))
+        self.overrides.enter_context(
+            overridden(HomeDashboard, SAVE_INTERVAL=HomeDashboard.SAVE_INTERVAL / self.speed))
+
+        display = DisplayConfig(name="soak", simulated=True)
+        # The soak serves the web interface itself, on a free port
+        services = DashboardServices(web=False)
+        self.dashboard = HomeDashboard(display=display, buttons=False, services=services)
+        services.start()
+        self.dashboard.alerts.min_gap /= self.speed
+        self.dashboard.views.specs = [scaled_spec(spec, self.speed)
+                                      for spec in self.dashboard.views.specs]
+        # Imports would otherwise show up as growth after the baseline
+        self.dashboard.warm_imports()
+
+        from werkzeug.serving import make_server
+        from src.web_interface.web_interface import WebApp
+        self.web_app = WebApp()
+        self.web_app.routes()
+        self.web_app.prepare()
+        self.web_server = make_server("127.0.0.1", 0, self.web_app.app, threaded=True)
+        Thread(target=self.web_server.serve_forever, name="soak-web", daemon=True).start()
+
+    def post_message(self):
+        """Submit a message through the web interface, like a phone would."""
+        conn = http.client.HTTPConnection("127.0.0.1", self.web_server.server_port, timeout=10)
+        try:
+            conn.request("POST", "/save_text", body=urlencode({"message": f"soak {random.randrange(100)}"}),
+                         headers={"Content-Type": "application/x-www-form-urlencoded"})
+            conn.getresponse().read()
+        except (OSError, http.client.HTTPException) as e:
+            print(f"Posting a message failed: {e}")
+        finally:
+            conn.close()
+
+    def press_buttons(self, deadline):
+        """Press a button every 30 simulated seconds and post a message every 5 minutes."""
+        pins = list(self.dashboard.INP_PIN_MAP.values())
+        presses = 0
+        while monotonic() < deadline:
+            sleep(30 / self.speed)
+            self.dashboard.button_pressed_callback(random.choice(pins))
+            presses += 1
+            if presses % 10 == 0:
+                self.post_message()
+
+    def run(self):
+        """
+        Run the soak.
+
+        Returns:
+            - dict: the report, see `report`
+        """
+        tracemalloc.start(10)
+        with self.overrides:
+            self.setup()
+            start = monotonic()
+            deadline = start + self.duration
+            Thread(target=self.dashboard.cycle_views, name="soak-dashboard", daemon=True).start()
+            Thread(target=self.press_buttons, args=(deadline,), name="soak-buttons",
+                   daemon=True).start()
+
+            baseline = None
+            while monotonic() < deadline:
+                sleep(min(self.sample_interval, max(deadline - monotonic(), 0)))
+                if baseline is None and monotonic() - start >= self.warmup:
+                    # The snapshot itself takes memory, so sample after it
+                    baseline = tracemalloc.take_snapshot()
+                    self.baseline_index = len(self.samples)
+                self.samples.append(sample())
+
+            final = tracemalloc.take_snapshot()
+            self.dashboard.refresh_LCD = None
+            self.dashboard.view_changed.set()
+            self.dashboard.services.stop()
+            self.weather_server.shutdown()
+            self.web_server.shutdown()
+        if baseline is None:
+            baseline = final
+            self.baseline_index = len(self.samples) - 1
+
+        top = final.compare_to(baseline, "lineno")[:10]
+        tracemalloc.stop()
+        shutil.rmtree(self.data_directory, ignore_errors=True)
+        return self.report(top)
+
+    def report(self, top):
+        """
+        Compare the samples with the budgets.
+
+        Returns:
+            - dict: the measured values, the top allocators and the budgets
+                which were exceeded (empty if the soak passed)
+        """
+        first, last = self.samples[self.baseline_index], self.samples[-1]
+        simulated_minutes = (last["time"] - first["time"]) * self.speed / 60
+        measured = {
+            "rss_growth_mb": last["rss_mb"] - first["rss_mb"],
+            "traced_growth_mb": last["traced_mb"] - first["traced_mb"],
+            "max_threads": max(s["threads"] for s in self.samples),
+            "fd_growth": last["fds"] - first["fds"],
+            "wakeups_per_minute": ((last["switches"] - first["switches"]) / simulated_minutes
+                                   if simulated_minutes else 0),
+        }
+        failed = {key: value for key, value in measured.items()
+                  if key in self.budgets and value > self.budgets[key]}
+        return {
+            "duration": self.duration,
+            "speed": self.speed,
+            "measured": measured,
+            "budgets": self.budgets,
+            "failed": failed,
+            "weather_requests": StubWeatherHandler.requests,
+            "rss_mb": [round(s["rss_mb"], 2) for s in self.samples],
+            "top_allocators": [
+                {"where": str(stat.traceback[0]), "size_diff_kb": stat.size_diff / 1024,
+                 "count_diff": stat.count_diff}
+                for stat in top],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak the dashboard on a simulated panel")
+    parser.add_argument("--duration", type=float, default=600, help="seconds to run")
+    parser.add_argument("--speed", type=float, default=60, help="how much faster time runs")
+    parser.add_argument("--sample-interval", type=float, default=10, help="seconds between samples")
+    parser.add_argument("--warmup", type=float, help="seconds before the baseline (default: 10%% of the run)")
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=VALUE",
+                        help=f"override a budget ({', '.join(DEFAULT_BUDGETS)})")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in args.budget:
+        name, _, value = item.partition("=")
+        if name not in budgets:
+            parser.error(f"unknown budget {name}")
+        budgets[name] = float(value)
+
+    warmup = args.warmup if args.warmup is not None else args.duration / 10
+    report = Soak(args.duration, args.speed, args.sample_interval, warmup, budgets).run()
+
+    print(f"soaked {report['duration']:.0f}s at {report['speed']:.0f}x "
+          f"({report['duration'] * report['speed'] / 3600:.1f} simulated hours), "
+          f"{report['weather_requests']} weather fetches")
+    for name, value in report["measured"].items():
+        status = "FAIL" if name in report["failed"] else "ok"
+        print(f"  {name:20s} {value:10.2f}  (budget {budgets[name]:g})  {status}")
+    print("top allocators since the warm up:")
+    for entry in report["top_allocators"]:
+        print(f"  {entry['size_diff_kb']:+9.1f} KiB {entry['count_diff']:+6d}  {entry['where']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    raise SystemExit(1 if report["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
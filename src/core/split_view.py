@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from src.core.compositor import Compositor, ScrollWidget, Widget
+from src.core.lcd_interface import LCD_Interface
+
+
+class SplitView(LCD_Interface):
+    """
+    A class to display several widgets side by side.
+
+    LCD Line 1: Clock (left) and current temperature (right)
+    LCD Last line: Scrolling message
+
+    The message is the last one received by the web interface (see
+    `Message`). The temperature is left out on panels too narrow to show it
+    next to the clock, and a single line panel only scrolls the message.
+
+    Every widget has its own update interval. `split_display` is meant to be
+    called often (see the refresh of its ViewSpec); each call only redraws
+    the widgets which are due and sends the changed cells in one pass.
+    """
+    # Shown until a message is received
+    DEFAULT_MESSAGE = "Welcome home!"
+
+    # Cells of the clock (HH:MM AM/PM and a space) and the temperature
+    CLOCK_WIDTH = 8
+    TEMPERATURE_WIDTH = 7
+
+    def __init__(self, verbosity, display=None):
+        super().__init__(verbosity, display)
+        self.message = self.read_message()
+        rows, cols = self.lcd.rows, self.lcd.cols
+        widgets = []
+        self.temperature = None
+        if rows > 1:
+            widgets.append(Widget(0, 0, self.CLOCK_WIDTH, self.clock_text, interval=1))
+            if cols >= self.CLOCK_WIDTH + self.TEMPERATURE_WIDTH:
+                self.temperature = Widget(0, cols - self.TEMPERATURE_WIDTH,
+                                          self.TEMPERATURE_WIDTH, self.temperature_text,
+                                          interval=60)
+                widgets.append(self.temperature)
+        widgets.append(ScrollWidget(rows - 1, 0, cols, lambda: self.message, interval=0.3))
+        self.compositor = Compositor(self, widgets)
+
+    def clock_text(self):
+        """Return the current time (HH:MM AM/PM)."""
+        return datetime.now().strftime('%I:%M%p')
+
+    def temperature_text(self):
+        """Return the last fetched temperature, right aligned."""
+        try:
+            data = self.load_data('weather_data.json')
+            return f"{data['current']['temperature_2m']}\x00F".rjust(self.TEMPERATURE_WIDTH)
+        except (OSError, ValueError, KeyError):
+            return "--\x00F".rjust(self.TEMPERATURE_WIDTH)
+
+    def read_message(self):
+        """Return the last message from the web interface, or the default message."""
+        try:
+            message = self.load_data('message_data.json').get("message")
+        except (OSError, ValueError, AttributeError):
+            message = None
+        return message or self.DEFAULT_MESSAGE
+
+    def reload(self, filename):
+        """Pick up new weather data and messages on the next tick."""
+        if filename == 'weather_data.json' and self.temperature is not None:
+            self.temperature.next_update = 0
+        elif filename == 'message_data.json':
+            self.message = self.read_message()
+
+    def split_display(self):
+        """Redraw the widgets which are due."""
+        self.ensure_chars({0: self.degree_symbol})
+        self.compositor.tick()
+
+
+def main():
+    split_view = SplitView(1)
+    split_view.compositor.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from os import sysconf
+from time import perf_counter
+
+
+def process_age():
+    """
+    Return the seconds since the current process was started.
+
+    Uses /proc so interpreter startup and module imports are included in the
+    startup report (with the 10 ms resolution of /proc/uptime). Returns None
+    when /proc isn't available.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks since boot. The command
+            # name (field 2) may contain spaces, so split after its ')'.
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """
+    A class to time the steps of the dashboard startup.
+
+    Each call to `mark` records the time spent since the previous mark.
+    `report` prints the breakdown, including the time spent before the timer
+    was created (interpreter startup and imports) when it can be measured.
+    """
+    def __init__(self):
+        self.before_start = process_age()
+        self.start = perf_counter()
+        self.last = self.start
+        self.steps = []
+
+    def mark(self, label):
+        """Record the time spent since the previous mark under `label`."""
+        now = perf_counter()
+        self.steps.append((label, now - self.last))
+        self.last = now
+
+    def elapsed(self):
+        """Return the seconds since the timer was created."""
+        return perf_counter() - self.start
+
+    def report(self):
+        """
+        Print the time spent in every step of the startup.
+
+        Returns:
+            - list: (label, seconds) tuples of every step
+        """
+        steps = list(self.steps)
+        if self.before_start is not None:
+            steps.insert(0, ("interpreter + imports", self.before_start))
+
+        print("startup timing:")
+        total = 0
+        for label, seconds in steps:
+            total += seconds
+            print(f"  {label:<24}{seconds * 1000:8.1f} ms  (at {total * 1000:8.1f} ms)")
+        return steps
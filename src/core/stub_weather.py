@@ -0,0 +1,43 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+from threading import Thread
+from time import sleep
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    """
+    Answers like the Open Meteo forecast API, with a new reading every request.
+
+    `requests` counts the requests answered, `delay` is the seconds each
+    answer takes (e.g. to let requests overlap).
+    """
+    requests = 0
+    delay = 0
+
+    def do_GET(self):
+        StubWeatherHandler.requests += 1
+        if self.delay:
+            sleep(self.delay)
+        # Now and then a thunderstorm, so the alert path is soaked as well
+        code = random.choice((0, 1, 2, 3, 61, 63, 71, 95))
+        body = json.dumps({
+            "current": {"time": "2024-01-01T12:00", "temperature_2m": round(random.uniform(-5, 30), 1),
+                        "weathercode": code},
+            "daily": {"temperature_2m_max": [20.0, 21.5], "weathercode": [code, 3]},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_weather():
+    """Serve the stub weather API on a free local port and return the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWeatherHandler)
+    Thread(target=server.serve_forever, name="stub-weather", daemon=True).start()
+    return server
@@ -0,0 +1,552 @@
+import argparse
+import configparser
+from itertools import chain
+import os
+from pathlib import Path
+import shutil
+import struct
+import tempfile
+from threading import Lock, Thread
+from time import monotonic, perf_counter, sleep, time
+import zlib
+
+from src.core.view_registry import scaled_spec
+
+
+# Record types
+HEADER = 0
+KEYFRAME = 1
+FRAME = 2
+INPUT = 3
+DATA = 4
+CGRAM = 5
+VIEW = 6
+
+MAGIC = b'LCDT'
+# Version 1 segments hold no data file contents and no views, they still replay
+VERSION = 2
+
+# type (u8), milliseconds since the segment started (u32), payload length (u16)
+RECORD = struct.Struct('<BIH')
+# magic, version, rows, cols, wall clock and monotonic time at segment start
+HEADER_PAYLOAD = struct.Struct('<4sBBBdd')
+# CRC32 and size of a data file, length of its name; followed by the name
+# and the zlib compressed content (nothing if it didn't fit)
+DATA_PAYLOAD = struct.Struct('<IIB')
+# main button and secondary button of the view on screen
+VIEW_PAYLOAD = struct.Struct('<BB')
+
+
+class Recorder:
+    """
+    A class to record everything shown on a panel to an append-only log.
+
+    Every record carries the milliseconds since the start of its segment
+    file, taken from the monotonic clock. Frame changes are stored as runs
+    of changed cells, so a clock tick costs a handful of bytes. Button
+    presses, the view on screen and the contents of updated data files
+    (zlib compressed, up to an eighth of a segment each) are recorded too,
+    so a replay can drive the views again (see `Replayer.redrive`).
+
+    The log is split into segment files. Each segment starts with a header,
+    a full keyframe, the view on screen and the latest contents of the
+    data files, so replay can start at any segment. When the segments take
+    up more than `budget` bytes the oldest ones are deleted.
+
+    Parameters
+        - directory (Path):
+            the directory holding the segment files
+        - rows (int): rows of the panel
+        - cols (int): columns of the panel
+        - budget (int):
+            maximum bytes used by all segments together
+            Default: 1048576 (1 MiB)
+        - segments (int):
+            number of segments the budget is split into
+            Default: 4
+    """
+    def __init__(self, directory, rows, cols, budget=1 << 20, segments=4):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.rows = rows
+        self.cols = cols
+        self.budget = budget
+        self.segment_size = max(budget // segments, 1024)
+        self.lock = Lock()
+        self.last_frame = [[0x20] * cols for _ in range(rows)]
+        self.last_view = None
+        # Latest DATA payload of every data file, repeated in each new segment
+        self.last_data = {}
+        self.max_data = min(self.segment_size // 8,
+                            0xFFFF - DATA_PAYLOAD.size - 0xFF)
+
+        existing = self.segments()
+        self.next_index = int(existing[-1].stem.split('-')[1]) + 1 if existing else 0
+        self.file = None
+        self.start_segment()
+
+    def segments(self):
+        """Return the segment files, oldest first."""
+        return sorted(self.directory.glob('timeline-*.bin'))
+
+    def start_segment(self):
+        """Close the current segment and start a new one with a keyframe."""
+        if self.file is not None:
+            self.file.close()
+
+        path = self.directory / f"timeline-{self.next_index:06d}.bin"
+        self.next_index += 1
+        self.file = path.open('ab')
+        self.segment_start = monotonic()
+        self.write_record(HEADER, HEADER_PAYLOAD.pack(
+            MAGIC, VERSION, self.rows, self.cols, time(), self.segment_start))
+        self.write_record(KEYFRAME, bytes(code for row in self.last_frame for code in row))
+        if self.last_view is not None:
+            self.write_record(VIEW, self.last_view)
+        repeated = 0
+        for payload in self.last_data.values():
+            repeated += len(payload)
+            if repeated > self.segment_size // 2:
+                break
+            self.write_record(DATA, payload)
+
+        # Drop the oldest segments once the budget is used up
+        segments = self.segments()
+        while len(segments) > 1 and sum(s.stat().st_size for s in segments) > self.budget:
+            segments.pop(0).unlink()
+
+    def write_record(self, kind, payload):
+        elapsed = int((monotonic() - self.segment_start) * 1000)
+        self.file.write(RECORD.pack(kind, elapsed, len(payload)) + payload)
+        self.file.flush()
+
+    def record(self, kind, payload):
+        """Append a record, starting a new segment when the current one is full."""
+        with self.lock:
+            if self.file is None:
+                return
+            if self.file.tell() + RECORD.size + len(payload) > self.segment_size:
+                self.start_segment()
+            self.write_record(kind, payload)
+
+    def frame(self, frame):
+        """
+        Record the cells which changed since the last recorded frame.
+
+        Parameters
+            - frame (list): rows of char codes, as returned by `LCD_Interface.frame`
+        """
+        payload = bytearray()
+        for row, codes in enumerate(frame):
+            col = 0
+            while col < self.cols:
+                if codes[col] == self.last_frame[row][col]:
+                    col += 1
+                    continue
+                start = col
+                while col < self.cols and codes[col] != self.last_frame[row][col]:
+                    col += 1
+                payload += bytes((row, start, col - start)) + bytes(codes[start:col])
+        if payload:
+            self.last_frame = [list(row) for row in frame]
+            self.record(FRAME, bytes(payload))
+
+    def input(self, channel):
+        """Record a button press on a GPIO channel."""
+        self.record(INPUT, struct.pack('<H', channel))
+
+    def data(self, filename, content):
+        """
+        Record that a data file was updated.
+
+        Its name, size and CRC32 are always recorded, its content only if
+        it compresses to `max_data` bytes or less.
+        """
+        name = str(filename).encode('utf-8')[:0xFF]
+        compressed = zlib.compress(content)
+        if len(compressed) > self.max_data:
+            compressed = b''
+        payload = (DATA_PAYLOAD.pack(zlib.crc32(content), len(content), len(name))
+                   + name + compressed)
+        with self.lock:
+            self.last_data[name] = payload
+        self.record(DATA, payload)
+
+    def view(self, main_button, secondary_button):
+        """Record the view shown on the panel."""
+        payload = VIEW_PAYLOAD.pack(main_button, secondary_button)
+        with self.lock:
+            self.last_view = payload
+        self.record(VIEW, payload)
+
+    def cgram(self, location, bitmap):
+        """Record a custom character stored in CGRAM."""
+        self.record(CGRAM, bytes([location]) + bytes(bitmap))
+
+    def close(self):
+        """Close the current segment. Later records are dropped."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class Replayer:
+    """
+    A class to replay a log written by `Recorder`.
+
+    `replay` plays the recorded frames back: they are rebuilt in memory and
+    optionally written to an LCD display, at the recorded pace scaled by
+    `speed`, or as fast as possible when `speed` is None, which makes the
+    log usable as a repeatable rendering benchmark. `redrive` runs the
+    views again with the recorded button presses and data files and
+    compares what they draw with the recorded frames, as a regression test.
+
+    Parameters
+        - directory (Path):
+            the directory holding the segment files
+    """
+    # Seconds a re-driven panel may lag behind a recorded frame
+    TOLERANCE = 0.5
+
+    # Frames followed by another this many seconds later are a step of one
+    # redraw, `redrive` only compares the last one
+    SETTLE = 0.05
+
+    # Mismatches kept for the report of `redrive`
+    MAX_MISMATCHES = 10
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.frame = None
+        self.version = VERSION
+
+    def records(self):
+        """
+        Yield (seconds, type, payload) for every record of every segment.
+
+        Seconds are counted from the start of the first segment. A segment
+        recorded after a reboot continues right where the previous one ended.
+        """
+        offset = None
+        last = 0
+        for path in sorted(self.directory.glob('timeline-*.bin')):
+            with path.open('rb') as f:
+                base = None
+                while True:
+                    head = f.read(RECORD.size)
+                    if len(head) < RECORD.size:
+                        break
+                    kind, elapsed, length = RECORD.unpack(head)
+                    payload = f.read(length)
+                    if len(payload) < length:
+                        # The last record was cut off by a power loss
+                        break
+
+                    if kind == HEADER:
+                        magic, version, rows, cols, wall, mono = HEADER_PAYLOAD.unpack(payload)
+                        if magic != MAGIC or version not in (1, VERSION):
+                            raise ValueError(f"{path.name} is not a timeline segment")
+                        self.version = version
+                        if offset is None or mono < offset + last:
+                            offset = mono - last
+                        base = mono - offset
+                        self.rows, self.cols = rows, cols
+
+                    if base is None:
+                        raise ValueError(f"{path.name} doesn't start with a header")
+                    last = base + elapsed / 1000
+                    yield last, kind, payload
+
+    def apply(self, kind, payload):
+        """Apply a frame record to the in memory frame."""
+        if kind == KEYFRAME:
+            self.frame = [list(payload[row * self.cols:(row + 1) * self.cols])
+                          for row in range(self.rows)]
+        elif kind == FRAME:
+            i = 0
+            while i < len(payload):
+                row, col, length = payload[i:i + 3]
+                self.frame[row][col:col + length] = payload[i + 3:i + 3 + length]
+                i += 3 + length
+
+    def data_record(self, payload):
+        """
+        Split the payload of a DATA record.
+
+        Returns:
+            - str: the file name
+            - int: the CRC32 of the content
+            - int: the size of the content
+            - bytes: the content, None if it wasn't recorded
+        """
+        if self.version == 1:
+            crc, size = struct.unpack_from('<II', payload)
+            return payload[8:].decode('utf-8', 'replace'), crc, size, None
+        crc, size, length = DATA_PAYLOAD.unpack_from(payload)
+        name = payload[DATA_PAYLOAD.size:DATA_PAYLOAD.size + length].decode('utf-8', 'replace')
+        compressed = payload[DATA_PAYLOAD.size + length:]
+        return name, crc, size, zlib.decompress(compressed) if compressed else None
+
+    def replay(self, lcd=None, speed=1.0, on_event=None):
+        """
+        Replay the log.
+
+        Parameters
+            - lcd (LCD_Interface):
+                display to write the frames to
+                Default: None (only rebuild the frames in memory)
+            - speed (float):
+                replay speed, 2.0 is twice as fast as recorded
+                Default: 1.0 (None replays as fast as possible)
+            - on_event (callable):
+                called with (seconds, type, payload) for every record
+                Default: None
+
+        Returns:
+            - dict: number of frames, replay time and time spent drawing
+        """
+        frames = 0
+        draw_times = []
+        start = perf_counter()
+        for seconds, kind, payload in self.records():
+            if speed is not None:
+                delay = seconds / speed - (perf_counter() - start)
+                if delay > 0:
+                    sleep(delay)
+
+            self.apply(kind, payload)
+            if kind in (KEYFRAME, FRAME):
+                frames += 1
+                if lcd is not None:
+                    draw_start = perf_counter()
+                    lcd.restore_frame(self.frame)
+                    draw_times.append(perf_counter() - draw_start)
+            elif kind == CGRAM and lcd is not None:
+                lcd.create_char(payload[0], tuple(payload[1:9]))
+
+            if on_event is not None:
+                on_event(seconds, kind, payload)
+
+        draw_times.sort()
+        return {
+            "frames": frames,
+            "elapsed": perf_counter() - start,
+            "draw_p50": draw_times[len(draw_times) // 2] if draw_times else 0,
+            "draw_max": draw_times[-1] if draw_times else 0,
+        }
+
+
+    def redrive(self, speed=1.0, tolerance=None, on_event=None):
+        """
+        Drive the views again with the recorded inputs and data, and compare
+        their frames with the recorded ones.
+
+        A dashboard runs on a simulated panel, from a temporary copy of the
+        data directory and without fetching the weather or serving the web
+        interface. It starts on the first recorded view; recorded button
+        presses are pressed and recorded data files are written and
+        reloaded at their recorded times. Each recorded frame has to show
+        up on the simulated panel within `tolerance` seconds, except the
+        intermediate steps of a redraw (see `SETTLE`).
+
+        Views showing the time of day differ from a recording made at
+        another time, and data recorded without its content (too large,
+        or a version 1 log) can't be written back.
+
+        Parameters
+            - speed (float):
+                replay speed; refreshes and idle timeouts are scaled too
+                Default: 1.0
+            - tolerance (float):
+                seconds a recorded frame may take to show up
+                Default: None (TOLERANCE)
+            - on_event (callable):
+                called with (seconds, type, payload) for every record
+                Default: None
+
+        Returns:
+            - dict: frames compared, frames matching, the first
+                mismatches (seconds, recorded rows, re-driven rows) and
+                data files which couldn't be written back
+        """
+        # The dashboard imports this module for its recorder
+        from src.core.display_config import DisplayConfig
+        from src.core.home_dashboard import HomeDashboard
+        from src.core.lcd_interface import LCD_Interface
+        from src.core.services import DashboardServices
+
+        if tolerance is None:
+            tolerance = self.TOLERANCE
+        records = self.records()
+        first = next(records, None)
+        if first is None:
+            raise ValueError(f"No timeline segments in {self.directory}")
+
+        data_directory = LCD_Interface.DATA_DIRECTORY
+        copy = Path(tempfile.mkdtemp(prefix="dashboard-redrive-"))
+        for path in data_directory.glob('*.json'):
+            if not path.name.startswith('last_frame'):
+                shutil.copy(path, copy / path.name)
+        LCD_Interface.DATA_DIRECTORY = copy
+
+        services = DashboardServices(fetch_weather=False, web=False)
+        display = DisplayConfig(name="redrive", port=-1, address=0x7f,
+                                rows=self.rows, cols=self.cols, simulated=True)
+        dashboard = HomeDashboard(display=display, buttons=False, services=services)
+        # Don't record the replay itself
+        if dashboard.recorder is not None:
+            dashboard.lcd_interface.set_recorder(None)
+            dashboard.recorder.close()
+            dashboard.recorder = None
+        dashboard.views.specs = [scaled_spec(spec, speed) for spec in dashboard.views.specs]
+        bus = dashboard.lcd_interface.bus
+        started = False
+
+        compared = 0
+        matched = 0
+        mismatches = []
+        missing = set()
+        start = perf_counter()
+        try:
+            stream = chain((first,), records)
+            upcoming = next(stream)
+            while upcoming is not None:
+                seconds, kind, payload = upcoming
+                upcoming = next(stream, None)
+                delay = seconds / speed - (perf_counter() - start)
+                if delay > 0:
+                    sleep(delay)
+                self.apply(kind, payload)
+
+                if kind == VIEW:
+                    main_button, secondary_button = VIEW_PAYLOAD.unpack(payload)
+                    if (main_button, secondary_button) != (dashboard.main_button,
+                                                           dashboard.secondary_button):
+                        dashboard.main_button = main_button % len(dashboard.views)
+                        dashboard.secondary_button = (
+                            secondary_button % dashboard.views.screen_count(dashboard.main_button))
+                        dashboard.view_changed.set()
+                elif kind == INPUT:
+                    dashboard.button_pressed_callback(struct.unpack('<H', payload)[0])
+                elif kind == DATA:
+                    name, crc, size, content = self.data_record(payload)
+                    if content is None:
+                        missing.add(name)
+                    elif Path(name).name == name:
+                        tmp_path = copy / (name + '.tmp')
+                        tmp_path.write_bytes(content)
+                        os.replace(tmp_path, copy / name)
+                        services.files_changed({name})
+                if kind in (FRAME, INPUT) and not started:
+                    # The view and data files of the segment start are in place
+                    Thread(target=dashboard.cycle_views, name="redrive", daemon=True).start()
+                    started = True
+                settled = (upcoming is None or upcoming[1] != FRAME
+                           or upcoming[0] - seconds >= self.SETTLE)
+                if kind == FRAME and settled:
+                    expected = [bytes(row) for row in self.frame]
+                    deadline = perf_counter() + tolerance
+                    while True:
+                        rows = bus.snapshot()[0]
+                        if rows == expected or perf_counter() >= deadline:
+                            break
+                        sleep(0.01)
+                    compared += 1
+                    if rows == expected:
+                        matched += 1
+                    elif len(mismatches) < self.MAX_MISMATCHES:
+                        mismatches.append((seconds, expected, rows))
+
+                if on_event is not None:
+                    on_event(seconds, kind, payload)
+        finally:
+            dashboard.refresh_LCD = None
+            dashboard.view_changed.set()
+            LCD_Interface.DATA_DIRECTORY = data_directory
+            shutil.rmtree(copy, ignore_errors=True)
+
+        return {
+            "compared": compared,
+            "matched": matched,
+            "mismatches": mismatches,
+            "missing_data": sorted(missing),
+        }
+
+
+def load_recorder(display, config_path=None, data_directory=None):
+    """
+    Create a Recorder for a panel if recording is enabled in config.ini.
+
+    The [timeline] section turns recording on (enabled = yes) and sets the
+    disk budget in KiB (budget_kb). Each panel records into its own
+    directory below the timeline directory of the data directory
+    (src/data/timeline by default).
+
+    Returns:
+        - Recorder: the recorder, or None when recording is disabled
+    """
+    if config_path is None:
+        config_path = Path(__file__).parent / 'config.ini'
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    if not config.has_section('timeline') or not config['timeline'].getboolean('enabled', False):
+        return None
+
+    if data_directory is None:
+        data_directory = Path(__file__).parent.parent / "data"
+    directory = Path(data_directory) / "timeline" / display.name
+    return Recorder(directory, display.rows, display.cols,
+                    budget=config['timeline'].getint('budget_kb', 1024) * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded LCD timeline")
+    parser.add_argument("directory", help="directory holding the timeline segments")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed (e.g. 10 for ten times faster), 0 for as fast as possible")
+    parser.add_argument("--lcd", action="store_true", help="draw the frames on the LCD display")
+    parser.add_argument("--redrive", action="store_true",
+                        help="drive the views with the recorded inputs and data and compare "
+                             "their frames with the recorded ones")
+    parser.add_argument("--tolerance", type=float, default=Replayer.TOLERANCE,
+                        help="seconds a re-driven frame may lag behind (default: %(default)s)")
+    args = parser.parse_args()
+
+    names = {INPUT: "input", CGRAM: "cgram", VIEW: "view"}
+    replayer = Replayer(args.directory)
+
+    def print_event(seconds, kind, payload):
+        if kind in (KEYFRAME, FRAME):
+            rows = " | ".join(bytes(row).decode('latin-1') for row in replayer.frame)
+            print(f"{seconds:10.3f}  {rows}")
+        elif kind == DATA:
+            name, crc, size, content = replayer.data_record(payload)
+            stored = "" if content is not None else ", content not recorded"
+            print(f"{seconds:10.3f}  data: {name} ({size} bytes{stored})")
+        elif kind in names:
+            print(f"{seconds:10.3f}  {names[kind]}: {payload!r}")
+
+    if args.redrive:
+        if not args.speed:
+            parser.error("--redrive runs at the recorded pace, --speed must be more than 0")
+        stats = replayer.redrive(args.speed, args.tolerance, print_event)
+        for seconds, expected, rows in stats["mismatches"]:
+            print(f"{seconds:10.3f}  mismatch: recorded "
+                  f"{' | '.join(row.decode('latin-1') for row in expected)}, re-driven "
+                  f"{' | '.join(row.decode('latin-1') for row in rows)}")
+        if stats["missing_data"]:
+            print(f"not recorded, left as they are: {', '.join(stats['missing_data'])}")
+        print(f"{stats['matched']} of {stats['compared']} frames match")
+        return
+
+    lcd = None
+    if args.lcd:
+        from src.core.lcd_interface import LCD_Interface
+        lcd = LCD_Interface(1)
+    stats = replayer.replay(lcd, args.speed or None, print_event)
+    print(f"{stats['frames']} frames in {stats['elapsed']:.3f}s, "
+          f"draw p50 {stats['draw_p50'] * 1000:.2f}ms, max {stats['draw_max'] * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+from importlib import import_module
+from time import monotonic
+
+
+class ViewSpec:
+    """
+    A declarative description of a dashboard view.
+
+    A view is only imported and constructed the first time one of its screens
+    is displayed, so declaring a view costs nothing at startup.
+
+    Parameters
+        - name (str):
+            name of the view, used in log output
+        - module (str):
+            dotted path of the module holding the view class. None draws the
+            screens on the dashboard's own LCD_Interface (placeholder views).
+        - class_name (str):
+            name of the view class inside of `module`
+        - screens (tuple):
+            one entry per secondary button position. Each entry is a tuple of
+            the method to call on the view followed by its arguments
+            e.g. ("write_centered", 0, "forecast")
+        - refresh (float):
+            seconds between redraws of the view
+            Default: 1
+        - resources (tuple):
+            config and data files the view reads (e.g. "weather_data.json")
+            Default: ()
+        - idle_timeout (float):
+            seconds the view may stay hidden before it is released. None
+            keeps the view loaded once it has been displayed.
+            Default: None
+        - tick (bool):
+            redraw on whole multiples of `refresh` on the wall clock (e.g.
+            right after every second) instead of `refresh` seconds after the
+            last redraw, so the time a redraw takes doesn't add up
+            Default: False
+    """
+    def __init__(self, name, module, class_name, screens, refresh=1,
+                 resources=(), idle_timeout=None, tick=False):
+        if len(screens) == 0:
+            raise ValueError('The ``screens`` argument must contain at least one screen')
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.screens = tuple(screens)
+        self.refresh = refresh
+        self.resources = tuple(resources)
+        self.idle_timeout = idle_timeout
+        self.tick = tick
+
+
+def scaled_spec(spec, speed):
+    """Return a copy of a view spec with its timings divided by `speed`."""
+    return ViewSpec(spec.name, spec.module, spec.class_name, spec.screens,
+                    refresh=max(spec.refresh / speed, 0.01),
+                    resources=spec.resources,
+                    idle_timeout=None if spec.idle_timeout is None else spec.idle_timeout / speed,
+                    tick=spec.tick)
+
+
+class ViewRegistry:
+    """
+    A class to hold the dashboard views and dispatch the buttons to them.
+
+    Views are stored in the order the main button cycles through them, so
+    looking up the screen for a (main_button, secondary_button) pair is a
+    plain index into two tuples. View instances are created lazily by
+    `load` and dropped by `release_idle` once they have been hidden for
+    longer than their `idle_timeout`.
+
+    Parameters
+        - base_view (LCD_Interface):
+            the view used for specs which don't have a module
+        - verbosity (int):
+            Changes how much information is displayed. Can be 0 or 1 or 2.
+            Default: 1
+        - display (DisplayConfig):
+            the panel views are created for
+            Default: None (the [display] section of config.ini)
+    """
+    def __init__(self, base_view, verbosity=1, display=None):
+        self.base_view = base_view
+        self.verbosity = verbosity
+        self.display = display
+        self.specs = []
+        self.instances = {}
+        self.last_shown = {}
+
+    def __len__(self):
+        return len(self.specs)
+
+    def register(self, spec):
+        """Add a view to the end of the main button cycle and return its index."""
+        self.specs.append(spec)
+        return len(self.specs) - 1
+
+    def index_of(self, name):
+        """
+        Return the main button position of a view.
+
+        Raises
+            - ValueError: if no view has that name
+        """
+        for index, spec in enumerate(self.specs):
+            if spec.name == name:
+                return index
+        raise ValueError(f"No view named '{name}'")
+
+    def screen_count(self, index):
+        """Return the number of screens (secondary button positions) of a view."""
+        return len(self.specs[index].screens)
+
+    def load(self, index):
+        """
+        Return the instance of a view, importing and constructing it if needed.
+
+        Parameters
+            - index (int): the main button position of the view
+        """
+        spec = self.specs[index]
+        if spec.module is None:
+            return self.base_view
+
+        view = self.instances.get(index)
+        if view is None:
+            if self.verbosity >= 1:
+                print(f"loading view: {spec.name}")
+            view_class = getattr(import_module(spec.module), spec.class_name)
+            view = view_class(self.verbosity, self.display)
+            self.instances[index] = view
+        return view
+
+    def show(self, main_button, secondary_button):
+        """
+        Display a screen of a view.
+
+        Parameters
+            - main_button (int): the main button position (view index)
+            - secondary_button (int): the secondary button position (screen index)
+
+        Returns:
+            - ViewSpec: the spec of the displayed view
+        """
+        spec = self.specs[main_button]
+        method, *args = spec.screens[secondary_button % len(spec.screens)]
+        view = self.load(main_button)
+        self.last_shown[main_button] = monotonic()
+        getattr(view, method)(*args)
+        return spec
+
+    def release_idle(self, current):
+        """
+        Release views which have been hidden for longer than their idle timeout.
+
+        Parameters
+            - current (int): index of the view on screen, never released
+        """
+        now = monotonic()
+        for index, view in list(self.instances.items()):
+            timeout = self.specs[index].idle_timeout
+            if index == current or timeout is None:
+                continue
+            if now - self.last_shown.get(index, now) > timeout:
+                if self.verbosity >= 1:
+                    print(f"releasing view: {self.specs[index].name}")
+                view.release()
+                del self.instances[index]
+
+    def reload(self, filenames):
+        """
+        Hand changed files to the loaded views which read them.
+
+        Parameters
+            - filenames (set): names of the changed files
+
+        Returns:
+            - set: indices of the views whose resources changed, loaded or not
+        """
+        affected = set()
+        for index, spec in enumerate(self.specs):
+            changed = filenames.intersection(spec.resources)
+            if not changed:
+                continue
+            affected.add(index)
+            view = self.instances.get(index)
+            if view is not None:
+                for filename in sorted(changed):
+                    view.reload(filename)
+        return affected
+
+    def release_all(self):
+        """Release every loaded view."""
+        for view in self.instances.values():
+            view.release()
+        self.instances.clear()
+
+
+# Views in the order the main button cycles through them
+DEFAULT_VIEWS = (
+    ViewSpec("date/time", "src.core.date_time_view", "DateTime",
+             screens=(("date_time_display",),
+                      ("big_clock_display",)),
+             tick=True),
+    ViewSpec("weather", "src.core.weather_view", "Weather",
+             screens=(("current_weather_display",),
+                      ("forecast_display",)),
+             refresh=30,
+             resources=("weather_data.json", "wmo_code.json"),
+             idle_timeout=900),
+    ViewSpec("dinner", "src.core.dinner_view", "Dinner",
+             screens=(("dinner_plan_display",),
+                      ("prep_cook_display",)),
+             refresh=5,
+             resources=("dinner_data.json",),
+             idle_timeout=300),
+    ViewSpec("message board", "src.core.msg_view", "Message",
+             screens=(("message_display",),
+                      ("received_display",)),
+             refresh=0.4,
+             resources=("message_data.json",),
+             idle_timeout=300),
+    ViewSpec("overview", "src.core.split_view", "SplitView",
+             screens=(("split_display",),),
+             refresh=0.1,
+             resources=("weather_data.json", "message_data.json"),
+             idle_timeout=300),
+)
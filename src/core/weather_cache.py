@@ -0,0 +1,244 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Event, Lock, Thread
+from time import monotonic
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+
+# The forecast API the cache sits in front of (WeatherFetcher.WEATHER_URL)
+UPSTREAM_URL = "https://api.open-meteo.com/v1/forecast"
+
+
+class Flight:
+    """A fetch from the upstream API which several requests wait for."""
+    def __init__(self):
+        self.done = Event()
+        self.body = None
+        self.error = None
+
+
+class WeatherCache:
+    """
+    A class to share forecast API responses between the dashboards of a site.
+
+    Requests are keyed by their coordinates, rounded to `precision`
+    decimals (2 decimals is about 1 km), and their other parameters. The
+    upstream API is asked for the rounded coordinates, so every dashboard
+    sharing a key gets the same answer. Answers are kept for `ttl` seconds.
+
+    Requests for a key which is already being fetched wait for that fetch
+    instead of starting their own, so any number of dashboards asking at
+    the same moment cost a single upstream call (counted as one miss, the
+    others as coalesced). When the upstream API fails, an answer up to
+    `max_stale` seconds old is served instead.
+
+    Parameters
+        - upstream (str):
+            the forecast endpoint
+            Default: UPSTREAM_URL
+        - ttl (float):
+            seconds an answer is served from the cache
+            Default: 300
+        - max_stale (float):
+            seconds an answer may be served while the upstream API fails
+            Default: 3600
+        - precision (int):
+            decimals the coordinates are rounded to
+            Default: 2
+        - max_entries (int):
+            keys kept, the oldest answers are dropped first
+            Default: 256
+        - timeout (float):
+            seconds to wait for the upstream API
+            Default: 30
+    """
+    def __init__(self, upstream=UPSTREAM_URL, ttl=300, max_stale=3600, precision=2,
+                 max_entries=256, timeout=30):
+        self.upstream = upstream
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.precision = precision
+        self.max_entries = max_entries
+        self.timeout = timeout
+        # Answers by key: (monotonic time fetched, body)
+        self.entries = {}
+        self.inflight = {}
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0
+        self.errors = 0
+
+    def key(self, query):
+        """
+        Return the cache key and the upstream parameters of a query string.
+
+        Raises
+            - ValueError: if the coordinates are missing or not numbers
+        """
+        params = dict(parse_qsl(query))
+        try:
+            latitude = round(float(params.pop("latitude")), self.precision)
+            longitude = round(float(params.pop("longitude")), self.precision)
+        except KeyError as e:
+            raise ValueError(f"Missing parameter {e}")
+        params["latitude"] = f"{latitude:.{self.precision}f}"
+        params["longitude"] = f"{longitude:.{self.precision}f}"
+        return tuple(sorted(params.items())), params
+
+    def get(self, query):
+        """
+        Answer a forecast query.
+
+        Returns:
+            - bytes: the JSON body
+            - str: where it came from (HIT, MISS, COALESCED or STALE)
+            - float: seconds since it was fetched
+
+        Raises
+            - ValueError: if the query is invalid
+            - OSError: if the upstream API failed and no answer is recent enough
+        """
+        key, params = self.key(query)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1], "HIT", monotonic() - entry[0]
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self.fetch(key, params, flight)
+        else:
+            flight.done.wait(self.timeout)
+
+        if flight.body is not None:
+            return flight.body, "MISS" if leader else "COALESCED", 0
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and monotonic() - entry[0] < self.max_stale:
+                self.stale += 1
+                return entry[1], "STALE", monotonic() - entry[0]
+            self.errors += 1
+        raise flight.error or TimeoutError("The upstream API didn't answer in time")
+
+    def fetch(self, key, params, flight):
+        """Fetch an answer from the upstream API and hand it to the waiting requests."""
+        try:
+            response = requests.get(self.upstream, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            # Don't cache error pages served with a 200
+            response.json()
+            flight.body = response.content
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error fetching weather data: {e}")
+            flight.error = OSError(f"Upstream API failed: {e}")
+        finally:
+            with self.lock:
+                if flight.body is not None:
+                    self.entries.pop(key, None)
+                    self.entries[key] = (monotonic(), flight.body)
+                    while len(self.entries) > self.max_entries:
+                        del self.entries[next(iter(self.entries))]
+                del self.inflight[key]
+            flight.done.set()
+
+    def stats(self):
+        """Return the counters of the cache."""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "stale": self.stale,
+                "errors": self.errors,
+            }
+
+
+class WeatherCacheHandler(BaseHTTPRequestHandler):
+    """Answers like the Open Meteo forecast API, from the server's WeatherCache."""
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            self.reply(200, json.dumps(self.server.cache.stats()).encode())
+            return
+        if url.path != urlsplit(self.server.cache.upstream).path:
+            self.reply(404, b'{"error": true, "reason": "Not found"}')
+            return
+        try:
+            body, source, age = self.server.cache.get(url.query)
+        except ValueError as e:
+            self.reply(400, json.dumps({"error": True, "reason": str(e)}).encode())
+        except OSError as e:
+            self.reply(502, json.dumps({"error": True, "reason": str(e)}).encode())
+        else:
+            self.reply(200, body, {"X-Cache": source, "Age": str(int(age))})
+
+    def reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_weather_cache(cache, host="127.0.0.1", port=0):
+    """
+    Serve a WeatherCache over HTTP from a background thread.
+
+    Returns:
+        - ThreadingHTTPServer: the server, with the cache as `cache`
+    """
+    server = ThreadingHTTPServer((host, port), WeatherCacheHandler)
+    server.cache = cache
+    Thread(target=server.serve_forever, name="weather-cache", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share weather API responses between dashboards")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8070, help="port to listen on")
+    parser.add_argument("--upstream", default=UPSTREAM_URL, help="the forecast API (default: %(default)s)")
+    parser.add_argument("--stub-upstream", action="store_true",
+                        help="answer from a local stub API instead, for trying the cache out")
+    parser.add_argument("--ttl", type=float, default=300, help="seconds answers are kept")
+    parser.add_argument("--precision", type=int, default=2,
+                        help="decimals the coordinates are rounded to")
+    args = parser.parse_args()
+
+    upstream = args.upstream
+    if args.stub_upstream:
+        from src.core.stub_weather import start_stub_weather
+        upstream = f"http://127.0.0.1:{start_stub_weather().server_port}/v1/forecast"
+
+    cache = WeatherCache(upstream, ttl=args.ttl, precision=args.precision)
+    server = ThreadingHTTPServer((args.host, args.port), WeatherCacheHandler)
+    server.cache = cache
+    print(f"caching {upstream} on http://{args.host}:{args.port}/v1/forecast")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExiting...")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
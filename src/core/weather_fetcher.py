@@ -0,0 +1,143 @@
+import configparser
+import json
+import os
+from pathlib import Path
+from threading import Event, Thread
+
+
+class WeatherFetcher:
+    """
+    A thread fetching weather data for the weather views and alerts.
+
+    New data is fetched from the Open Meteo API every 10 minutes and stored
+    in weather_data.json in the data directory. The data consists of
+    temperature and weather codes for current day and tomorrow. The fetcher
+    runs for as long as the dashboard does, whether or not a weather view
+    is loaded, so severe weather is noticed while another view is on screen.
+
+    Parameters
+        - data_directory (Path): where weather_data.json is written
+        - config_path (Path): config.ini with the location and weather URL
+    """
+    # Open Meteo forecast endpoint
+    WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+
+    # Seconds between two fetches
+    FETCH_INTERVAL = 600
+
+    def __init__(self, data_directory, config_path):
+        self.weather_filepath = Path(data_directory) / 'weather_data.json'
+        self.config_path = config_path
+        # Extract the users location from the config file
+        self.get_user_location()
+
+        # Set by `stop` to stop the background thread
+        self.stop_fetch = Event()
+        # Set to fetch right away instead of waiting for the next 10 minutes
+        self.fetch_now = Event()
+        self.thread = None
+
+    def start(self):
+        """Start fetching in a daemon thread."""
+        self.thread = Thread(target=self.background_fetch, name="weather", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self.stop_fetch.set()
+        self.fetch_now.set()
+
+    def background_fetch(self):
+        """Fetch weather data in the background every 10 minutes."""
+        while not self.stop_fetch.is_set():
+            self.fetch_weather()
+            self.fetch_now.wait(self.FETCH_INTERVAL)
+            self.fetch_now.clear()
+
+    def reload(self, filenames):
+        """Fetch new weather data right away when the location or weather URL changed."""
+        if 'config.ini' not in filenames:
+            return
+        old_location = (self.latitude, self.longitude, self.weather_url)
+        try:
+            self.get_user_location()
+        except (KeyError, configparser.Error) as e:
+            # Keep the old location while the file is being edited
+            print(f"Location not reloaded: {e}")
+            return
+        if (self.latitude, self.longitude, self.weather_url) != old_location:
+            self.fetch_now.set()
+
+    def get_user_location(self):
+        """Access the config file for latitude and longitude values and the weather URL"""
+        config = configparser.ConfigParser()
+        config.read(self.config_path)
+
+        # Both values are read before either is replaced, so a fetch running
+        # at the same time never mixes the old and the new location
+        latitude = config['DEFAULT']['latitude']
+        longitude = config['DEFAULT']['longitude']
+        self.latitude, self.longitude = latitude, longitude
+        # A site-local weather cache (see weather_cache.py) takes the place
+        # of the API when configured
+        self.weather_url = config.get('weather', 'url', fallback=self.WEATHER_URL)
+
+        print(f"Location: {self.latitude}, {self.longitude}")
+
+    def fetch_weather(self):
+        """
+        Fetch weather data from the Open Meteo API and store it in a JSON file.
+
+        The file is written to a temporary file which then replaces
+        weather_data.json, like `LCD_Interface.save_data` does, so the
+        views never read a half written file.
+
+        API Details:
+        - Base URL: https://api.open-meteo.com/v1/forecast, or the url in the
+            [weather] section of config.ini (e.g. a shared weather cache)
+        - Open Meteo is a free, open-source Weather API that doesn't require an API key.
+        - Parameters:
+            - latitude: Latitude of the location.
+            - longitude: Longitude of the location.
+            - current: Data points to fetch for current weather
+                (e.g., temperature, weather code).
+            - daily: Data points to fetch for forecasted weather
+                (e.g., max temperature, weather code)
+            - temperature_unit: Desired unit for temperature values.
+                (e.g., "fahrenheit")
+            - timezone: Timezone for the location. (e.g., "America/New_York")
+            - forecast_days: Number of days to forecast. (e.g., "3")
+
+        Returns:
+            - bool: whether new data was stored
+        """
+        # requests is slow to import, so keep it off the startup path
+        import requests
+
+        params = {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "current": "temperature_2m,weathercode",
+            "daily": "temperature_2m_max,weathercode",
+            "temperature_unit": "fahrenheit",
+            "timezone": "America/New_York",
+            "forecast_days": "2"
+        }
+        try:
+            response = requests.get(self.weather_url, params=params, timeout=30)
+            # Following line will raise exception if HTTP request returns error code
+            response.raise_for_status()
+            current_weather = response.json()
+        except (requests.RequestException, ValueError) as e:
+            # RequestException covers HTTPError, Timeout, TooManyRedirects, etc.
+            print(f"Error fetching weather data: {e}")
+            return False
+
+        tmp_path = self.weather_filepath.with_suffix('.json.tmp')
+        try:
+            tmp_path.write_text(json.dumps(current_weather))
+            os.replace(tmp_path, self.weather_filepath)
+        except OSError as e:
+            print(f"Error saving weather data: {e}")
+            return False
+        return True
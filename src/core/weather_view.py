@@ -1,119 +1,28 @@
-import configparser
-from datetime import datetime, timedelta
-import requests
-from threading import Thread, Lock
-from time import sleep
-
 from src.core.lcd_interface import LCD_Interface
+from src.core.weather_fetcher import WeatherFetcher
 
 
 class Weather(LCD_Interface):
     """
-    A class to fetch weather data and display the weather view.
+    A class to display the weather view.
 
-    New data is fetched from the Open Meteo API every 10 minutes in a seperate
-    thread. This data is stored inside of weather_data.json file in the
-    src/data directory. The data consists of temperature and weather codes
-    for current day and tomorrow. Weather codes are two digit integers which
-    translate to a condition (e.g., sun/clear skies, rain, snow, etc.).
+    The weather data is fetched by the `WeatherFetcher` of the dashboard,
+    which keeps running while this view isn't loaded, and is read from the
+    weather_data.json file in the src/data directory. The data consists of
+    temperature and weather codes for current day and tomorrow. Weather
+    codes are two digit integers which translate to a condition (e.g.,
+    sun/clear skies, rain, snow, etc.).
 
     There exists two functions for displaying data to the LCD display. One
     function displays current temperature and current condition. The other
     function displays the max temperature forecasted for tomorrow and the
     forecasted condition for tomorrow.
     """
-    def __init__(self, verbosity):
-        super().__init__(verbosity)
+    def __init__(self, verbosity, display=None):
+        super().__init__(verbosity, display)
         # Create a Pathlib Path for the JSON file containing weather data
         self.weather_filepath = self.data_directory / 'weather_data.json'
-        # Extract the users location from the config file
-        self.get_user_location()
-
-        # Initialize a threading lock for safely reading/writing to/from file
-        self.weather_lock = Lock()
-
-        # Start the background thread to fetch weather data
-        # Daemon threads are good for background processes and do not need
-        # to finish execution before exiting the program
-        self.weather_thread = Thread(target=self.background_fetch, daemon=True)
-        self.weather_thread.start()
-
-    def background_fetch(self):
-        """Fetch weather data in the background every 10 minutes."""
-        while True:
-            self.fetch_weather()
-            sleep(600) # Sleep for 10 minutes
-
-    def get_user_location(self):
-        """Access the config file for latitude and longitude values"""
-        config = configparser.ConfigParser()
-        config.read(self.current_path.parent / 'config.ini')
-
-        self.latitude = config['DEFAULT']['latitude']
-        self.longitude = config['DEFAULT']['longitude']
-
-        print(f"Location: {self.latitude}, {self.longitude}")
-
-    def fetch_weather(self):
-        """
-        Fetch weather data from the Open Meteo API and store it in a JSON file.
-
-        This method fetches the current weather data based on the latitude and
-        longitude specified in the class instance. The fetched data is then
-        saved to a JSON file for subsequent access.
-
-        API Details:
-        - Base URL: https://api.open-meteo.com/v1/forecast
-        - Open Meteo is a free, open-source Weather API that doesn't require an API key.
-        - Parameters:
-            - latitude: Latitude of the location.
-            - longitude: Longitude of the location.
-            - current: Data points to fetch for current weather
-                (e.g., temperature, weather code).
-            - daily: Data points to fetch for forecasted weather
-                (e.g., max temperature, weather code)
-            - temperature_unit: Desired unit for temperature values.
-                (e.g., "fahrenheit")
-            - timezone: Timezone for the location. (e.g., "America/New_York")
-            - forecast_days: Number of days to forecast. (e.g., "3")
 
-        Raises:
-            - requests.RequestException: If there's an issue with the HTTP request 
-                (e.g., server error, timeout, etc.).
-
-        Returns:
-            None. The fetched data is saved to 'weather_data.json' in the data directory.
-        """
-        # URL for the API
-        weather_url = "https://api.open-meteo.com/v1/forecast"
-        # Parameters for the API request
-        params = {
-            "latitude": self.latitude,
-            "longitude": self.longitude,
-            "current": "temperature_2m,weathercode",
-            "daily": "temperature_2m_max,weathercode",
-            "temperature_unit": "fahrenheit",
-            "timezone": "America/New_York",
-            "forecast_days": "2"
-        }
-        try:
-            # Fetch current weather data
-            current_response = requests.get(weather_url, params=params)
-            # Following line will raise exception if HTTP request returns error code
-            current_response.raise_for_status()
-
-            # Save the data to a json file
-            current_weather = current_response.json()
-            with self.weather_lock:
-                self.save_data(current_weather, self.weather_filepath)
-
-        except requests.RequestException as e:
-            # This will handle any type of RequestException
-            # like HTTPError, Timeout, TooManyRedirects, etc.)
-            print(f"Error fetching weather data: {e}")
-
-
-    
     def get_current_data(self):
         """
         Gets the current temp and weathercode from weather_data.json file.
@@ -127,8 +36,7 @@ class Weather(LCD_Interface):
                 stored as expected or missing
         """
         # Load the json file into a dict
-        with self.weather_lock:
-            data = self.load_data(self.weather_filepath)
+        data = self.load_data(self.weather_filepath)
 
         # Extract the temperature from the nested "current" dictionary
         current_temp = data.get("current", {}).get("temperature_2m", None)
@@ -185,13 +93,11 @@ class Weather(LCD_Interface):
         self.clear()
         temp, weathercode = self.get_current_data()
         condition = self.convert_wcode_to_condition(str(weathercode))
-        self.write_centered(0, f"{temp} F")
+        # '\x00' is the degree symbol stored in CGRAM
+        self.ensure_chars({0: self.degree_symbol})
+        self.write_centered(0, f"{temp}\x00F")
         self.write_centered(1, condition)
 
-        # Write the degree symbol
-        self.cursor_pos = (0, 9)
-        self.write_string('\x00')
-
     def get_forecast_data(self):
         """
         Gets the forecasted max temp and weathercode from weather_data.json file.
@@ -205,8 +111,7 @@ class Weather(LCD_Interface):
                 weather code is not stored as expected or missing
         """
         # Load the json file into a dict
-        with self.weather_lock:
-            data = self.load_data(self.weather_filepath)
+        data = self.load_data(self.weather_filepath)
 
         # Extract the temperature array from the nested "daily" dictionary
         forecast_temps = data.get("daily", {}).get("temperature_2m_max", None)
@@ -231,17 +136,17 @@ class Weather(LCD_Interface):
         self.clear()
         temp, weathercode = self.get_forecast_data()
         condition = self.convert_wcode_to_condition(str(weathercode))
-        self.write_centered(0, f"{temp} F")
+        # '\x00' is the degree symbol stored in CGRAM
+        self.ensure_chars({0: self.degree_symbol})
+        self.write_centered(0, f"{temp}\x00F")
         self.write_centered(1, condition)
 
-        # Write the degree symbol
-        self.cursor_pos = (0, 9)
-        self.write_string('\x00')
-
 
 
 def main():
     weather_view = Weather(1)
+    WeatherFetcher(weather_view.data_directory,
+                   weather_view.current_path.parent / 'config.ini').fetch_weather()
     weather_view.current_weather_display()
     weather_view.forecast_display()
     
@@ -0,0 +1,210 @@
+import argparse
+from collections import Counter
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+from threading import Lock, Thread
+from time import perf_counter, sleep
+from urllib.parse import urlencode, urlsplit
+
+
+def start_server(port, cpus, rate_limit=True):
+    """
+    Start the web interface in production mode in a child process.
+
+    Parameters
+        - port (int): the port to serve on
+        - cpus (int):
+            number of CPU cores the server may use, to mimic a Raspberry Pi
+            running the dashboard next to the web server. None uses all cores.
+        - rate_limit (bool):
+            whether the server limits the submissions per client
+            Default: True
+
+    Returns:
+        - Popen: the server process, once it accepts connections
+    """
+    def pin():
+        if cpus is not None:
+            os.sched_setaffinity(0, set(range(cpus)))
+
+    command = [sys.executable, "-m", "src.web_interface.web_interface", "--production",
+               "--port", str(port)]
+    if not rate_limit:
+        command.append("--no-rate-limit")
+    server = subprocess.Popen(
+        command, preexec_fn=pin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            sleep(0.1)
+    server.kill()
+    raise RuntimeError("The web server didn't start")
+
+
+def cpu_seconds(pid):
+    """Return the user + system CPU time of a process from /proc."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class LoadTest:
+    """
+    A class to send a mix of requests to the web interface from several threads.
+
+    Every client keeps its connection open and sends the requests of a
+    browser: the home page, the form, the stylesheet (revalidated with its
+    ETag after the first load) and now and then a message.
+
+    The web interface limits the submissions of every client address. With
+    `spread` each client connects from an address of its own in 127.0.0.0/8
+    (a server on the loopback interface only), so the clients don't share
+    a single rate limit like they would from 127.0.0.1.
+
+    Parameters
+        - host (str): the server address
+        - port (int): the server port
+        - clients (int): number of concurrent connections
+        - post_ratio (float): share of requests which submit a message
+        - spread (bool):
+            connect every client from its own loopback address
+            Default: False
+    """
+    def __init__(self, host, port, clients, post_ratio, spread=False):
+        self.host = host
+        self.port = port
+        self.clients = clients
+        self.post_ratio = post_ratio
+        self.spread = spread
+        self.lock = Lock()
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+
+    def connect(self, seed):
+        source = (f"127.0.{seed // 250}.{seed % 250 + 2}", 0) if self.spread else None
+        return http.client.HTTPConnection(self.host, self.port, timeout=10,
+                                          source_address=source)
+
+    def client(self, deadline, seed):
+        rng = random.Random(seed)
+        conn = self.connect(seed)
+        etag = None
+        latencies = []
+        statuses = Counter()
+        errors = 0
+        while perf_counter() < deadline:
+            headers = {}
+            body = None
+            if rng.random() < self.post_ratio:
+                method, path = "POST", "/save_text"
+                body = urlencode({"message": f"load test {rng.randrange(1000)}"})
+                headers["Content-Type"] = "application/x-www-form-urlencoded"
+            else:
+                method, path = "GET", rng.choice(("/", "/submit_msg", "/static/styles.css"))
+                if path.startswith("/static") and etag is not None:
+                    headers["If-None-Match"] = etag
+            start = perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = self.connect(seed)
+                continue
+            latencies.append(perf_counter() - start)
+            statuses[response.status] += 1
+            if path.startswith("/static") and response.getheader("ETag"):
+                etag = response.getheader("ETag")
+        conn.close()
+
+        with self.lock:
+            self.latencies.extend(latencies)
+            self.statuses.update(statuses)
+            self.errors += errors
+
+    def run(self, duration):
+        """
+        Send requests for `duration` seconds.
+
+        Returns:
+            - dict: requests, requests per second, p50/p99/max latency in seconds,
+                status code counts and connection errors
+        """
+        deadline = perf_counter() + duration
+        start = perf_counter()
+        threads = [Thread(target=self.client, args=(deadline, seed)) for seed in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - start
+
+        latencies = sorted(self.latencies)
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0
+        return {
+            "requests": len(latencies),
+            "rps": len(latencies) / elapsed,
+            "p50": percentile(0.50),
+            "p99": percentile(0.99),
+            "max": latencies[-1] if latencies else 0,
+            "statuses": dict(self.statuses),
+            "errors": self.errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the message board web interface")
+    parser.add_argument("--url", help="test a running server (e.g. http://pi.local:5000) "
+                                      "instead of starting one")
+    parser.add_argument("--port", type=int, default=5055, help="port of the server started for the test")
+    parser.add_argument("--server-cpus", type=int, default=1,
+                        help="CPU cores for the started server (Pi-class budget), 0 for all")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--post-ratio", type=float, default=0.05,
+                        help="share of requests which submit a message")
+    parser.add_argument("--single-address", action="store_true",
+                        help="send every client from 127.0.0.1, so they share one rate limit "
+                             "(clients of a local server get an address each otherwise)")
+    parser.add_argument("--no-rate-limit", action="store_true",
+                        help="turn the rate limit of the started server off")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", args.port
+        server = start_server(port, args.server_cpus or None, not args.no_rate_limit)
+    spread = host.startswith("127.") and not args.single_address
+
+    try:
+        cpu_start = cpu_seconds(server.pid) if server else None
+        stats = LoadTest(host, port, args.clients, args.post_ratio, spread).run(args.duration)
+        cpu = cpu_seconds(server.pid) - cpu_start if server else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"{stats['requests']} requests in {args.duration:.0f}s with {args.clients} clients: "
+          f"{stats['rps']:.0f} req/s")
+    print(f"latency p50 {stats['p50'] * 1000:.1f}ms, p99 {stats['p99'] * 1000:.1f}ms, "
+          f"max {stats['max'] * 1000:.1f}ms")
+    print(f"status codes: {stats['statuses']}, connection errors: {stats['errors']}")
+    if cpu is not None and stats["requests"]:
+        print(f"server CPU: {cpu:.2f}s ({cpu / stats['requests'] * 1000:.2f}ms per request)")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
-from flask import Flask, request, render_template
+import argparse
+from hashlib import sha1
+from pathlib import Path
+from threading import Lock, Timer
+from time import monotonic
+
+from flask import Flask, Response, abort, request, render_template
+
+from src.core.alerts import Alert, AlertChannel
 
 
 class WebApp: 
@@ -10,6 +18,14 @@ class WebApp:
     stores the last submitted message, and provides an interface to retrieve
     this message for display on an LCD.
 
+    In production mode (see `run`) the pages are rendered from templates
+    compiled once at startup, the home page is rendered only once, and the
+    stylesheet is served with an ETag and a one year max-age (its URL
+    carries a hash of its content, so a changed file gets a new URL).
+    Submissions are limited in size and, unless `rate_limit` is False, in
+    rate per client. A burst of submissions only shows the last message on
+    the LCD.
+
     Attributes:
         - app (Flask):
             The Flask application instance.
@@ -26,20 +42,91 @@ class WebApp:
 
     See https://flask.palletsprojects.com/en/2.3.x/  for Flask documentation.
     """
-    def __init__(self):
+    # Longest message accepted from the form
+    MAX_MESSAGE_LENGTH = 256
+
+    # Largest request body accepted, in bytes
+    MAX_CONTENT_LENGTH = 4096
+
+    # Submissions per client: `RATE_BURST` at once, one more every `RATE_REFILL` seconds
+    RATE_BURST = 5
+    RATE_REFILL = 2
+
+    # Submissions within this many seconds reach the LCD as one message
+    COALESCE_WINDOW = 0.5
+
+    # Max-age of static files, their URLs change with their content
+    STATIC_MAX_AGE = 365 * 24 * 3600
+
+    def __init__(self, rate_limit=True, on_message=None):
         self.app = Flask(__name__)
+        self.app.config["MAX_CONTENT_LENGTH"] = self.MAX_CONTENT_LENGTH
         self.message = ""
+        self.templates = {}
+        self.home_page = None
+        self.static_versions = {}
 
-    def run(self):
+        self.submit_lock = Lock()
+        self.pending_message = None
+        self.flush_timer = None
+        self.rate_limit = rate_limit
+        self.on_message = on_message
+        self.buckets = {}
+        self.coalesced = 0
+        self.rate_limited = 0
+
+    def run(self, production=False, host="127.0.0.1", port=5000):
         """
         Initialize routes for the Flask application and start the application server.
 
         This method serves two main purposes:
             1. Registers all the routes for the Flask application.
-            2. Starts the Flask application server in debug mode.
+            2. Starts the application server: the Flask debug server, or
+               in production mode waitress if it is installed and the
+               threaded werkzeug server otherwise.
+
+        Parameters
+            - production (bool):
+                serve without the debugger and with compiled templates
+                Default: False
+            - host (str): the address to listen on. Default: 127.0.0.1
+            - port (int): the port to listen on. Default: 5000
         """
         self.routes()
-        self.app.run(debug=True)
+        if not production:
+            self.app.run(debug=True, host=host, port=port)
+            return
+
+        self.prepare()
+        try:
+            from waitress import serve
+        except ImportError:
+            from werkzeug.serving import make_server
+            make_server(host, port, self.app, threaded=True).serve_forever()
+        else:
+            serve(self.app, host=host, port=port)
+
+    def prepare(self):
+        """
+        Compile the templates and hash the static files once, before serving.
+        """
+        self.app.config["TEMPLATES_AUTO_RELOAD"] = False
+        self.app.config["SEND_FILE_MAX_AGE_DEFAULT"] = self.STATIC_MAX_AGE
+
+        for path in sorted(Path(self.app.static_folder).iterdir()):
+            if path.is_file():
+                self.static_versions[path.name] = sha1(path.read_bytes()).hexdigest()[:12]
+        self.app.url_defaults(self.static_version)
+
+        with self.app.test_request_context():
+            for name in ("index.html", "submit_msg.html"):
+                self.templates[name] = self.app.jinja_env.get_template(name)
+            self.home_page = self.templates["index.html"].render()
+
+    def static_version(self, endpoint, values):
+        """Add the content hash of a static file to its URL."""
+        if endpoint == "static" and values.get("filename") in self.static_versions:
+            values["v"] = self.static_versions[values["filename"]]
 
     def routes(self):
         # Define routes
@@ -47,21 +134,102 @@ class WebApp:
         self.app.add_url_rule("/submit_msg", "submit_msg", self.submit_msg)
         self.app.add_url_rule("/save_text", "save_text", self.save_text, methods=["POST"])
 
+    def render(self, name, **context):
+        """Render a template, compiled once if `prepare` ran."""
+        template = self.templates.get(name)
+        if template is None:
+            return render_template(name, **context)
+        return template.render(**context)
+
     def home(self):
         """Render the home page."""
+        if self.home_page is not None:
+            return Response(self.home_page, mimetype="text/html")
         return render_template("index.html")
     
     def submit_msg(self, message=None):
         """Render the message submission page with an optional message"""
-        return render_template("submit_msg.html", message=message)
-    
+        return self.render("submit_msg.html", message=message)
+
+    def allow_submission(self, client):
+        """Take a token from the client's bucket, False if there is none left."""
+        if not self.rate_limit:
+            return True
+        now = monotonic()
+        with self.submit_lock:
+            tokens, last = self.buckets.get(client, (self.RATE_BURST, now))
+            tokens = min(self.RATE_BURST, tokens + (now - last) / self.RATE_REFILL)
+            if tokens < 1:
+                self.rate_limited += 1
+                return False
+            self.buckets[client] = (tokens - 1, now)
+            # Forget clients which have been quiet long enough to have a full bucket
+            if len(self.buckets) > 1024:
+                full = self.RATE_BURST * self.RATE_REFILL
+                self.buckets = {c: b for c, b in self.buckets.items() if now - b[1] < full}
+            return True
+
+    def queue_message(self, message):
+        """
+        Show a message on the LCD once the current burst of submissions ends.
+
+        Only the last message of a burst reaches `message` and is handed
+        to `on_message` (the dashboard saves it for the message board).
+        """
+        with self.submit_lock:
+            if self.pending_message is not None:
+                self.coalesced += 1
+            self.pending_message = message
+            if self.flush_timer is None:
+                self.flush_timer = Timer(self.COALESCE_WINDOW, self.flush_message)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+
+    def flush_message(self):
+        with self.submit_lock:
+            self.message = message = self.pending_message
+            self.pending_message = None
+            self.flush_timer = None
+        if self.on_message is not None:
+            self.on_message(message)
+
     def save_text(self):
-        """Save the text submitted via the form and display a message on submission"""
-        self.message = request.form.get("message")
-        feedback_message = f"{self.message} received."
+        """
+        Save the text submitted via the form and display a message on submission.
+
+        Messages marked as urgent are also posted as an alert, which
+        interrupts the view on the LCD display.
+        """
+        # Reading the form refuses a body over MAX_CONTENT_LENGTH (413)
+        # before the submission costs the client a token
+        message = (request.form.get("message") or "").strip()
+        if not self.allow_submission(request.remote_addr):
+            abort(429)
+        if not message or len(message) > self.MAX_MESSAGE_LENGTH or not message.isprintable():
+            return self.submit_msg(
+                message=f"Messages must be 1 to {self.MAX_MESSAGE_LENGTH} printable characters."), 400
+
+        self.queue_message(message)
+        feedback_message = f"{message} received."
+        if request.form.get("urgent"):
+            alert = Alert(f"msg-{message}", ("Urgent message", message))
+            if not AlertChannel.default().post(alert):
+                feedback_message = f"{message} received, but too many alerts were sent recently."
         return self.submit_msg(message=feedback_message)
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Serve the message board web interface")
+    parser.add_argument("--production", action="store_true",
+                        help="serve without the debugger, with compiled templates and cache headers")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=5000, help="port to listen on")
+    parser.add_argument("--no-rate-limit", action="store_true",
+                        help="accept any number of submissions per client (for load tests)")
+    args = parser.parse_args()
+
+    web_app = WebApp(rate_limit=not args.no_rate_limit)
+    web_app.run(args.production, args.host, args.port)
+
 if __name__ == "__main__":
-    web_app = WebApp()
-    web_app.run()
\ No newline at end of file
+    main()
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+# The LCD driver needs an SMBus implementation, even for a simulated panel
+pytest.importorskip("RPLCD.i2c")
+
+from src.core.compositor import Compositor, Widget
+from src.core.display_config import DisplayConfig
+from src.core.lcd_interface import LCD_Interface
+from src.core.split_view import SplitView
+
+
+@pytest.fixture
+def simulated(tmp_path, monkeypatch):
+    """Create views of simulated panels, dropping the panels afterwards."""
+    monkeypatch.setattr(LCD_Interface, "DATA_DIRECTORY", tmp_path)
+    keys = []
+
+    def create(view_class, address, cols=16, rows=2):
+        display = DisplayConfig(name=f"test-{address:x}", port=-1, address=address,
+                                cols=cols, rows=rows, simulated=True)
+        keys.append((display.port, display.address))
+        return view_class(0, display)
+
+    yield create
+    for key in keys:
+        LCD_Interface.panels.pop(key, None)
+
+
+def text_of(lcd):
+    lcd.wait_for_writes()
+    return [row.decode() for row in lcd.bus.snapshot()[0]]
+
+
+def test_budget_must_fit_a_cursor_move_and_a_character(simulated):
+    lcd = simulated(LCD_Interface, 0x60)
+    for budget in (-1, 0, 1):
+        with pytest.raises(ValueError):
+            Compositor(lcd, [], budget=budget)
+    Compositor(lcd, [], budget=2)
+
+
+def test_dirty_runs_bridge_single_clean_cells(simulated):
+    lcd = simulated(LCD_Interface, 0x61)
+    compositor = Compositor(lcd, [])
+    compositor.back[0][2:4] = b"ab"
+    # One clean cell in between is rewritten, two are skipped with a cursor move
+    compositor.back[0][5] = ord("c")
+    compositor.back[0][8] = ord("d")
+    compositor.back[1][0] = ord("e")
+    assert compositor.dirty_runs() == [
+        (0, 2, list(b"ab c")), (0, 8, list(b"d")), (1, 0, list(b"e"))]
+
+    compositor.flush()
+    assert compositor.dirty_runs() == []
+    assert text_of(lcd) == ["  ab c  d       ", "e               "]
+
+
+def test_flush_stays_within_the_budget(simulated):
+    lcd = simulated(LCD_Interface, 0x62)
+    compositor = Compositor(lcd, [
+        Widget(0, 0, 16, lambda: "A" * 16),
+        Widget(1, 0, 16, lambda: "B" * 16),
+    ], budget=10)
+    compositor.update_widgets(0)
+
+    sent = [compositor.flush() for _ in range(4)]
+    # 32 characters, and a cursor move for every run and every cut
+    assert sent == [10, 10, 10, 7]
+    assert compositor.flush() == 0
+    assert text_of(lcd) == ["A" * 16, "B" * 16]
+
+
+def test_flush_resumes_with_the_row_that_was_cut_off(simulated):
+    lcd = simulated(LCD_Interface, 0x63)
+    compositor = Compositor(lcd, [
+        Widget(0, 0, 4, lambda: "AAAA"),
+        Widget(1, 0, 4, lambda: "BBBB"),
+    ], budget=8)
+    compositor.update_widgets(0)
+
+    assert compositor.flush() == 8
+    assert text_of(lcd)[1][:4] == "BB  "
+    assert compositor.first_row == 1
+
+    # The rest of the cut off row goes first, then the new content above it
+    compositor.back[0][:4] = b"CCCC"
+    compositor.back[1][5:9] = b"DDDD"
+    assert compositor.flush() == 8
+    assert text_of(lcd) == ["AAAA" + " " * 12, "BBBB DDDD" + " " * 7]
+    assert compositor.flush() == 5
+    assert text_of(lcd) == ["CCCC" + " " * 12, "BBBB DDDD" + " " * 7]
+
+
+def test_overlapping_widgets_are_rejected(simulated):
+    lcd = simulated(LCD_Interface, 0x64)
+    compositor = Compositor(lcd, [Widget(0, 0, 8, str)])
+    with pytest.raises(ValueError):
+        compositor.add(Widget(0, 7, 4, str))
+    with pytest.raises(ValueError):
+        compositor.add(Widget(1, 14, 4, str))
+
+
+@pytest.mark.parametrize("cols, rows, temperature", [(16, 2, True), (20, 4, True),
+                                                     (8, 2, False), (12, 2, False),
+                                                     (16, 1, False)])
+def test_split_view_fits_the_panel(simulated, cols, rows, temperature):
+    split = simulated(SplitView, 0x65, cols=cols, rows=rows)
+    assert (split.temperature is not None) == temperature
+    assert len(split.compositor.owned) <= cols * rows
+
+
+def test_split_view_scrolls_the_last_message(simulated, tmp_path):
+    split = simulated(SplitView, 0x66)
+    assert split.message == SplitView.DEFAULT_MESSAGE
+
+    (tmp_path / "message_data.json").write_text(
+        json.dumps({"message": "Hi", "received": "2024-03-11T18:00:00"}))
+    split.reload("message_data.json")
+    split.split_display()
+    assert text_of(split)[1] == "Hi" + " " * 14
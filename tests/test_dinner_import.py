@@ -0,0 +1,159 @@
+from datetime import date
+import json
+import time
+
+import pytest
+
+from src.core.dinner_import import DinnerImporter
+
+
+# A monday
+START = date(2024, 3, 11)
+
+
+@pytest.fixture
+def importer(tmp_path):
+    importer = DinnerImporter(START, verbosity=0)
+    importer.data_directory = tmp_path
+    return importer
+
+
+@pytest.fixture
+def local_time(monkeypatch):
+    """Pin the local time zone of the process."""
+    def set_zone(zone):
+        monkeypatch.setenv("TZ", zone)
+        time.tzset()
+    yield set_zone
+    monkeypatch.undo()
+    time.tzset()
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return path
+
+
+def test_window_starts_on_monday_and_covers_52_weeks():
+    importer = DinnerImporter(date(2024, 3, 14), verbosity=0)
+    assert importer.start == START
+    assert importer.end == date(2025, 3, 10)
+    with pytest.raises(ValueError):
+        DinnerImporter(START, weeks=53)
+    with pytest.raises(ValueError):
+        DinnerImporter(START, weeks=0)
+
+
+def test_rows_outside_of_the_window_are_skipped(importer, tmp_path):
+    source = write(tmp_path / "plan.csv",
+                   "date,main\n"
+                   "2024-03-10,Too early\n"
+                   "2024-03-11,First day\n"
+                   "2025-03-09,Last day\n"
+                   "2025-03-10,Too late\n")
+    plan = importer.import_file(source)
+    assert (importer.imported, importer.skipped, importer.invalid) == (2, 2, 0)
+    assert plan["3/11"]["monday"]["main"] == "First day"
+    assert plan["3/3"]["sunday"]["main"] == "Last day"
+
+
+def test_invalid_rows_are_counted_but_only_the_first_are_kept(importer, tmp_path):
+    rows = "".join(f"not a date {i},Soup\n" for i in range(DinnerImporter.MAX_ERRORS + 10))
+    source = write(tmp_path / "plan.csv", "date,main\n" + rows + "2024-03-12,Pasta\n")
+    importer.import_file(source)
+    assert importer.invalid == DinnerImporter.MAX_ERRORS + 10
+    assert len(importer.errors) == DinnerImporter.MAX_ERRORS
+    assert importer.errors[0] == (2, "invalid date 'not a date 0'")
+    assert importer.imported == 1
+
+
+def test_csv_rows_are_normalized(importer, tmp_path):
+    source = write(tmp_path / "plan.csv",
+                   "Date,Main,Sides,Prep,Cook\n"
+                   "03/13/2024, Tacos ,Rice;Beans,15,20\n"
+                   "2024-03-14,Stew,a;b;c;d,,\n"
+                   "2024-03-15,Pie,,-5,\n")
+    plan = importer.import_file(source)
+    assert plan["3/11"]["wednesday"] == {
+        "main": "Tacos", "side 1": "Rice", "side 2": "Beans", "side 3": "None",
+        "prep time": 15, "cook time": 20}
+    assert [message for line, message in importer.errors] == [
+        "at most 3 sides are supported, got 4", "prep time can't be negative"]
+
+
+def test_ics_events_are_parsed(importer, tmp_path, local_time):
+    local_time("UTC")
+    source = write(tmp_path / "plan.ics",
+                   "BEGIN:VCALENDAR\r\n"
+                   "BEGIN:VEVENT\r\n"
+                   "DTSTART;VALUE=DATE:20240312\r\n"
+                   "SUMMARY:Chicken\\, roasted\r\n"
+                   "DESCRIPTION:Sides: Potatoes, Green\r\n"
+                   "  beans\\nPrep: 10\\nCook: 45\r\n"
+                   "END:VEVENT\r\n"
+                   "BEGIN:VEVENT\r\n"
+                   "DTSTART:20240313T180000\r\n"
+                   "SUMMARY:Weekly fish\r\n"
+                   "RRULE:FREQ=WEEKLY\r\n"
+                   "END:VEVENT\r\n"
+                   "BEGIN:VEVENT\r\n"
+                   "SUMMARY:No date\r\n"
+                   "END:VEVENT\r\n"
+                   "END:VCALENDAR\r\n")
+    plan = importer.import_file(source)
+    assert plan == {"3/11": {"tuesday": {
+        "main": "Chicken, roasted", "side 1": "Potatoes", "side 2": "Green beans",
+        "side 3": "None", "prep time": 10, "cook time": 45}}}
+    assert importer.errors == [(8, "recurring events are not supported"),
+                               (13, "event has no DTSTART")]
+
+
+def test_ics_times_are_converted_to_local_time(importer, tmp_path, local_time):
+    local_time("America/New_York")
+    source = write(tmp_path / "plan.ics",
+                   "BEGIN:VCALENDAR\n"
+                   # 01:30 UTC on wednesday is tuesday evening in New York
+                   "BEGIN:VEVENT\nDTSTART:20240313T013000Z\nSUMMARY:Late tacos\nEND:VEVENT\n"
+                   # 06:00 in Tokyo on thursday is still wednesday in New York
+                   "BEGIN:VEVENT\nDTSTART;TZID=Asia/Tokyo:20240314T060000\n"
+                   "SUMMARY:Ramen\nEND:VEVENT\n"
+                   # Floating times are local already
+                   "BEGIN:VEVENT\nDTSTART:20240315T233000\nSUMMARY:Pizza\nEND:VEVENT\n"
+                   "BEGIN:VEVENT\nDTSTART;TZID=Nowhere/Town:20240316T180000\n"
+                   "SUMMARY:Lost\nEND:VEVENT\n"
+                   "END:VCALENDAR\n")
+    plan = importer.import_file(source)
+    week = plan["3/11"]
+    assert week["tuesday"]["main"] == "Late tacos"
+    assert week["wednesday"]["main"] == "Ramen"
+    assert week["friday"]["main"] == "Pizza"
+    assert "saturday" not in week
+    assert importer.errors == [(14, "unknown time zone 'Nowhere/Town'")]
+
+
+def test_import_merges_into_the_existing_plan(importer, tmp_path):
+    existing = {"3/11": {"monday": {"main": "Old monday"},
+                         "tuesday": {"main": "Old tuesday"}},
+                "3/4": {"friday": {"main": "Last week"}}}
+    (tmp_path / "dinner_data.json").write_text(json.dumps(existing))
+    source = write(tmp_path / "plan.csv", "date,main\n2024-03-12,New tuesday\n")
+
+    importer.import_file(source)
+    plan = json.loads((tmp_path / "dinner_data.json").read_text())
+    assert plan["3/11"]["monday"]["main"] == "Old monday"
+    assert plan["3/11"]["tuesday"]["main"] == "New tuesday"
+    assert plan["3/4"] == existing["3/4"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+    replaced = DinnerImporter(START, verbosity=0)
+    replaced.data_directory = tmp_path
+    replaced.import_file(source, replace=True)
+    assert json.loads((tmp_path / "dinner_data.json").read_text()) == {
+        "3/11": {"tuesday": plan["3/11"]["tuesday"]}}
+
+
+def test_dry_run_leaves_the_plan_alone(importer, tmp_path):
+    source = write(tmp_path / "plan.csv", "date,main\n2024-03-12,Soup\n")
+    plan = importer.import_file(source, dry_run=True)
+    assert plan["3/11"]["tuesday"]["main"] == "Soup"
+    assert not (tmp_path / "dinner_data.json").exists()
@@ -0,0 +1,85 @@
+from threading import Thread
+
+import pytest
+from RPLCD.codecs import A00Codec
+
+from src.core.encoding_cache import EncodingCache
+
+
+class CountingCodec(A00Codec):
+    """The A00 character map, counting the strings it encodes."""
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return super().encode(text)
+
+
+def test_repeated_strings_are_encoded_once():
+    codec = CountingCodec()
+    cache = EncodingCache(codec)
+    first = cache.encode("Main: ")
+    assert cache.encode("Main: ") is first
+    assert first == bytes(A00Codec().encode("Main: "))
+    assert codec.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_string_is_evicted():
+    codec = CountingCodec()
+    cache = EncodingCache(codec, size=2)
+    cache.encode("Jan")
+    cache.encode("Feb")
+    # Using "Jan" again makes "Feb" the least recently used string
+    cache.encode("Jan")
+    cache.encode("Mar")
+    assert list(cache.entries) == ["Jan", "Mar"]
+
+    cache.encode("Jan")
+    assert codec.calls == 3
+    cache.encode("Feb")
+    assert codec.calls == 4
+    assert list(cache.entries) == ["Jan", "Feb"]
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_strings_with_newlines_are_not_cached():
+    cache = EncodingCache(CountingCodec())
+    for text in ("two\nlines", "carriage\rreturn"):
+        with pytest.raises(ValueError):
+            cache.encode(text)
+    assert not cache.entries
+
+
+def test_size_must_be_positive():
+    with pytest.raises(ValueError):
+        EncodingCache(A00Codec(), size=0)
+
+
+def test_clear_empties_the_cache():
+    codec = CountingCodec()
+    cache = EncodingCache(codec)
+    cache.encode("Sunny")
+    cache.clear()
+    cache.encode("Sunny")
+    assert codec.calls == 2
+
+
+def test_concurrent_encodes_stay_within_the_size():
+    cache = EncodingCache(A00Codec(), size=8)
+    words = [f"word {i}" for i in range(32)]
+
+    def encode():
+        for _ in range(50):
+            for word in words:
+                assert cache.encode(word) == word.encode()
+
+    threads = [Thread(target=encode) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache.entries) == 8
+    assert cache.hits + cache.misses == 4 * 50 * len(words)
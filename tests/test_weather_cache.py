@@ -0,0 +1,135 @@
+import json
+import socket
+from threading import Barrier, Thread
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from src.core.stub_weather import StubWeatherHandler, start_stub_weather
+from src.core.weather_cache import WeatherCache, start_weather_cache
+
+
+QUERY = "latitude=43.9276&longitude=-69.9759&current=temperature_2m,weathercode"
+
+
+@pytest.fixture
+def upstream():
+    """The stub forecast API, with its request counter reset."""
+    StubWeatherHandler.requests = 0
+    StubWeatherHandler.delay = 0
+    server = start_stub_weather()
+    yield server
+    server.shutdown()
+    server.server_close()
+    StubWeatherHandler.delay = 0
+
+
+def stub_url(server):
+    return f"http://127.0.0.1:{server.server_port}/v1/forecast"
+
+
+def closed_url():
+    """Return the URL of a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1/forecast"
+
+
+def test_concurrent_gets_make_one_upstream_call(upstream):
+    # Slow answers, so every request arrives while the first is in flight
+    StubWeatherHandler.delay = 0.3
+    cache = WeatherCache(stub_url(upstream))
+    count = 20
+    barrier = Barrier(count)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(cache.get(QUERY))
+
+    threads = [Thread(target=get) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert StubWeatherHandler.requests == 1
+    assert len({body for body, source, age in results}) == 1
+    assert sorted(source for body, source, age in results) == ["COALESCED"] * (count - 1) + ["MISS"]
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == count - 1
+
+    body, source, age = cache.get(QUERY)
+    assert source == "HIT"
+    assert StubWeatherHandler.requests == 1
+
+
+def test_nearby_coordinates_share_an_entry(upstream):
+    cache = WeatherCache(stub_url(upstream), precision=2)
+    first, _, _ = cache.get("latitude=43.9276&longitude=-69.9759")
+    second, source, _ = cache.get("latitude=43.9301&longitude=-69.9812")
+    assert source == "HIT"
+    assert first == second
+    assert StubWeatherHandler.requests == 1
+
+
+def test_upstream_failure_serves_stale_answer(upstream):
+    cache = WeatherCache(stub_url(upstream), ttl=0, max_stale=3600)
+    body, source, _ = cache.get(QUERY)
+    assert source == "MISS"
+
+    upstream.shutdown()
+    upstream.server_close()
+    stale, source, age = cache.get(QUERY)
+    assert source == "STALE"
+    assert stale == body
+    assert age >= 0
+    assert cache.stats()["stale"] == 1
+
+
+def test_upstream_failure_past_max_stale_raises(upstream):
+    cache = WeatherCache(stub_url(upstream), ttl=0, max_stale=0)
+    cache.get(QUERY)
+
+    upstream.shutdown()
+    upstream.server_close()
+    with pytest.raises(OSError):
+        cache.get(QUERY)
+    assert cache.stats()["errors"] == 1
+
+
+def test_upstream_failure_without_entry_raises():
+    cache = WeatherCache(closed_url(), timeout=2)
+    with pytest.raises(OSError):
+        cache.get(QUERY)
+    stats = cache.stats()
+    assert stats["errors"] == 1
+    assert stats["entries"] == 0
+
+
+def test_missing_coordinates_are_rejected():
+    cache = WeatherCache(closed_url())
+    with pytest.raises(ValueError):
+        cache.get("latitude=43.9")
+
+
+def test_server_answers_from_the_cache(upstream):
+    server = start_weather_cache(WeatherCache(stub_url(upstream)))
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with urlopen(f"{base}/v1/forecast?{QUERY}", timeout=5) as response:
+            assert response.headers["X-Cache"] == "MISS"
+            assert "current" in json.load(response)
+        with urlopen(f"{base}/v1/forecast?{QUERY}", timeout=5) as response:
+            assert response.headers["X-Cache"] == "HIT"
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"{base}/v1/forecast?latitude=1", timeout=5)
+        assert error.value.code == 400
+        with urlopen(f"{base}/stats", timeout=5) as response:
+            assert json.load(response)["hits"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert StubWeatherHandler.requests == 1